@@ -1,101 +1,161 @@
 #!/usr/bin/env python3
 
 from typing import List, Union, Optional, Dict, Any, Tuple, Callable, defaultdict, Set
-from directory_tree import DisplayTree
 from typing import Optional
-import glob
 import os
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
-from langchain_core.output_parsers import JsonOutputParser
 import json
 import ast
-import inspect
+import time
 import sys
+import threading
 import os
-import importlib
-import pkgutil
-import markdown
-from jinja2 import Environment, FileSystemLoader
-from graphviz import Digraph, Graph
-from uuid import uuid4
-import tempfile
 import base64
+import functools
+import mimetypes
+from uuid import uuid4
+from llm_runner import invoke_all, report_failure, LLM_MAX_CONCURRENCY
+from project_index import ProjectIndex
+from vfs import ProjectFS, open_fs
+from import_extractor import extract_imports, content_key, ImportStats
+from incremental import IncrementalRun, ANALYZER_INCREMENTAL
+from ignore_rules import summarize
+from import_graph import ImportGraph
+from diagrams import Diagram, render_diagrams
+from prompt_budget import overview_inputs, review_description
+from metrics import metrics
+from feature_extractors.registry import Rule, load_rules, rules_by
+from feature_extractors.path_index import PathIndex
+from concurrent.futures import ThreadPoolExecutor, Future
 
 
 COMPRESSA_API_DEMO_KEY = os.getenv('COMPRESSA_KEY')
-llm = ChatOpenAI(
-		openai_api_key=COMPRESSA_API_DEMO_KEY, 
-		model="Compressa-Qwen2.5-14B-Instruct",
-		temperature=0,
-		openai_api_base='https://api.qdrant.mil-team.ru/chat-1/v1',
-		max_retries=3,
-		request_timeout=120,
-		max_tokens=10000,
-	)
-
-
-def _project_files(path) -> str:
-	return DisplayTree(path, stringRep=True, showHidden=True)
-
-def _parse_file_tree(path: str) -> Dict[str, List[str]]:
-	return [ i.replace(path + '/', '') for i in glob.glob(path + '/**', recursive=True) if os.path.isfile(i) ]
-
-def _project_readmes(path) -> Optional[str]:
-	txts = []
-	basepath = path.split('/')[-1]
-	for rp in glob.glob(path + '/**/README*') + glob.glob(path + '/README*'):
-		with open(rp, 'r') as f:
-			txts.append(rp.replace('/'.join(path.split('/')[0:-1]), '') + ':\n\n' + f.read())
-	return '\n\n\n'.join(txts)
-
-def _get_imports_from_file(file_path: str) -> List[str]:
-	with open(file_path, 'r') as file:
-		try:
-			tree = ast.parse(file.read(), filename=file_path)
-		except Exception as e:
-			print(f"Error parsing file {file_path}: {e}", file=sys.stderr)
-			return []
-	imports = []
-	for node in ast.walk(tree):
-		if isinstance(node, ast.Import):
-			for alias in node.names:
-				imports.append(alias.name)
-		elif isinstance(node, ast.ImportFrom):
-			if node.module:
-				imports.append(node.module)
-	return imports
-
-def _get_component_imports(root_path: str, component_base_path: str) -> List[Tuple[str, List[str]]]:
-	imports = {}
-	for component_path in glob.glob(root_path + '/' + component_base_path + '/**/*.py') + glob.glob(root_path + '/' + component_base_path + '/*.py'):
-		if not os.path.isfile(component_path):
-			continue
-		imports[component_path.replace(root_path + '/', '')] = _get_imports_from_file(component_path)
-	return imports
-
-def _build_module_dependencies(component_imports: Dict[str, List[str]], root_dir: str) -> Dict[str, List[str]]:
+# Адрес и модель OpenAI-совместимого API можно переопределить, например, для локального сервера бенчмарков
+LLM_API_BASE = os.getenv('LLM_API_BASE', 'https://api.qdrant.mil-team.ru/chat-1/v1')
+LLM_MODEL = os.getenv('LLM_MODEL', 'Compressa-Qwen2.5-14B-Instruct')
+# Несколько OpenAI-совместимых серверов одной модели через запятую, между ними распределяется
+# нагрузка; формат и лимиты эндпоинтов описаны в llm_gateway.parse_endpoints
+LLM_ENDPOINTS = os.getenv('LLM_ENDPOINTS', LLM_API_BASE)
+
+# LangChain, клиент LLM и окружение Jinja тяжелые: они создаются при первом использовании
+# и переиспользуются, поэтому импорт модуля (запуск cli.py, перезапуск скрипта Streamlit) быстрый
+_llm = None
+_jinja_env = None
+_lock = threading.Lock()
+
+
+def get_llm():
+	"""
+	Возвращает общий клиент LLM, создавая его при первом вызове.
+	"""
+	global _llm
+	with _lock:
+		if _llm is None:
+			from llm_gateway import LLMGateway, parse_endpoints
+			from llm_cache import llm_cache
+			from llm_metrics import metrics_callback
+
+			_llm = LLMGateway(
+				parse_endpoints(LLM_ENDPOINTS),
+				api_key=COMPRESSA_API_DEMO_KEY,
+				model=LLM_MODEL,
+				temperature=0,
+				request_timeout=120,
+				max_tokens=10000,
+				cache=llm_cache,
+				callbacks=[metrics_callback],
+			)
+		return _llm
+
+
+def llm_stats() -> Optional[Dict[str, Any]]:
+	"""
+	Возвращает статистику эндпоинтов LLM или None, если клиент еще не создавался.
+	"""
+	return _llm.stats() if _llm is not None else None
+
+
+def __getattr__(name: str) -> Any:
+	# Совместимость с обращениями к analytics.llm
+	if name == 'llm':
+		return get_llm()
+	raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Оценка времени извлечения импортов из одного файла, пока в анализе не разобран ни один файл
+IMPORT_FILE_SECONDS = float(os.getenv('IMPORT_FILE_SECONDS', '0.002'))
+
+# Количество потоков для дешевых статических правил
+RULE_WORKERS = int(os.getenv('RULE_WORKERS', '4'))
+
+# Стадии анализа в порядке выполнения, о начале каждой сообщается через колбэк progress
+ANALYSIS_STAGES = ['overview', 'imports', 'rules', 'data_layer', 'reviews', 'rendering']
+
+
+def _project_files(index: ProjectIndex) -> str:
+	return index.tree
+
+def _parse_file_tree(index: ProjectIndex) -> List[str]:
+	return list(index.files)
+
+def _project_readmes(index: ProjectIndex) -> Optional[str]:
+	return '\n\n\n'.join(f'/{index.name}/{rp}:\n\n{text}' for rp, text in index.readmes.items())
+
+def _get_component_imports(index: ProjectIndex, component_base_path: str, stats: Optional[ImportStats] = None) -> Dict[str, List[str]]:
+	return extract_imports(index.python_files_under(component_base_path), index.read_bytes, stats, index.fs.content_id)
+
+def _build_module_dependencies(component_imports: Dict[str, List[str]], root_dir: str) -> ImportGraph:
 	"""
 	Строит граф зависимостей модулей.
 	"""
-	module_dependencies = defaultdict(set)
+	modules, edges = [], []
 	for file_path, imports in component_imports.items():
 		rel_path = os.path.relpath(file_path, root_dir)
 		module_name = rel_path.replace('/', '.')[:-3]
+		modules.append(module_name)
 		for imported_module in imports:
-			module_dependencies[module_name].add(imported_module)
-		if len(imports) == 0:
-			module_dependencies[module_name] = set([])
+			edges.append((module_name, imported_module))
+
+	return ImportGraph.from_edges(modules, edges)
+
+def _json_default(value: Any) -> Any:
+	if isinstance(value, ImportGraph):
+		return value.to_dict()
+	raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+def _python_file_hashes(index: ProjectIndex) -> Dict[str, str]:
+	# Идентификатор содержимого из файловой системы (хэш объекта git) не требует чтения файла
+	return {rel_path: index.fs.content_id(rel_path) or content_key(index.read_bytes(rel_path)) for rel_path in index.python_files_under('')}
 
-	module_dependencies = {module: list(dependencies) for module, dependencies in module_dependencies.items()}
+def _ignored_stats(index: ProjectIndex, import_stats: ImportStats, imports_seconds: float) -> Dict[str, Any]:
+	"""
+	Сводка пропущенного при обходе проекта и оценка сэкономленного времени извлечения импортов.
+	"""
+	summary = summarize(index.skipped)
+	parsed = import_stats.parsed + import_stats.cached
+	per_file = imports_seconds / parsed if parsed else IMPORT_FILE_SECONDS
+	summary['walk_seconds'] = round(index.walk_seconds, 3)
+	summary['import_seconds_saved'] = round(summary['python_files'] * per_file, 3)
+	for reason, count in summary['by_reason'].items():
+		metrics.inc('ignored_paths', count, reason=reason)
+	return summary
+
+def _notify(progress: Optional[Callable[[str], None]], stage: str) -> None:
+	"""
+	Сообщает о начале стадии анализа (см. ANALYSIS_STAGES).
+	"""
+	if progress is not None:
+		progress(stage)
 
-	return module_dependencies
+def project_overview_info(path, index: Optional[ProjectIndex] = None, run: Optional[IncrementalRun] = None, progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+	from langchain_core.prompts import ChatPromptTemplate
+	from langchain_core.output_parsers import JsonOutputParser
 
-def project_overview_info(path) -> Dict[str, Any]:
+	_notify(progress, 'overview')
+	if index is None:
+		with metrics.span('stage', stage='walk'):
+			index = ProjectIndex.build(path)
 	parser = JsonOutputParser()
-	file_tree = _project_files(path)
-	readmes = _project_readmes(path)
+	prompt_inputs, prompt_tokens = overview_inputs(index.name, _parse_file_tree(index), _project_files(index), index.readmes)
 
 	chain_answ = ChatPromptTemplate.from_template(
 		'''THERE IS PROJECT FILE STRUCTURE:
@@ -138,157 +198,206 @@ Use the following rules for your answer:
 - if you don't know the answer to the question, put null (without quotes) in the appropriate JSON key.
 
 Your JSON answer:
-	'''.strip()) | llm | parser
+	'''.strip()) | get_llm() | parser
 	
-	report = chain_answ.invoke({'file_tree': file_tree, 'readmes': readmes})
-	report['project_files'] = _parse_file_tree(path)
-
+	with metrics.span('stage', stage='overview'):
+		if run is not None:
+			report = run.overview(lambda: chain_answ.invoke(prompt_inputs))
+		else:
+			report = chain_answ.invoke(prompt_inputs)
+	report['project_files'] = PathIndex(_parse_file_tree(index))
+
+	_notify(progress, 'imports')
+	import_stats = ImportStats()
 	components = []
-	for component in report['components']:
-		imports = _get_component_imports(path, component['path'])
-		import_dependencies_graph = _build_module_dependencies(imports, component['path'])
-		component_with_imports = {**component, 'import_dependencies_graph': import_dependencies_graph}
-		components.append(component_with_imports)
+	imports_started = time.perf_counter()
+	with metrics.span('stage', stage='imports'):
+		for component in report['components']:
+			cached = run.cached_component(component['path'], index.python_files_under(component['path'])) if run is not None else None
+			if cached is not None:
+				import_dependencies_graph = ImportGraph.from_dict(cached['import_graph'])
+			else:
+				imports = _get_component_imports(index, component['path'], import_stats)
+				import_dependencies_graph = _build_module_dependencies(imports, component['path'])
+			component_with_imports = {**component, 'import_dependencies_graph': import_dependencies_graph}
+			components.append(component_with_imports)
+	for name, value in import_stats.as_dict().items():
+		metrics.inc('import_files', value, result=name)
 	report['components'] = components
+	report['analysis_stats'] = {
+		'imports': import_stats.as_dict(),
+		'prompt_tokens': {'overview': prompt_tokens},
+		'ignored': _ignored_stats(index, import_stats, time.perf_counter() - imports_started),
+	}
 
 	return report
 
-def _get_rule_functions(package_path: str) -> List[Callable]:
+def _get_rules(package_path: str) -> Tuple[Rule, ...]:
 	"""
-	Получает список функций-правил из всех модулей пакета feature_extractors.
+	Получает правила, зарегистрированные в модулях пакета feature_extractors. Реестр строится один раз.
 	"""
+	return load_rules(package_path)
 
-	# Получаем путь к текущему пакету
-	package_name = os.path.basename(package_path)
-
-	rule_functions = []
-
-	# Импортируем все модули из пакета
-	for _, module_name, _ in pkgutil.iter_modules([package_path]):
-		module = importlib.import_module(f"{package_name}.{module_name}")
-		
-		# Получаем функции из каждого модуля
-		functions = inspect.getmembers(module, inspect.isfunction)
-		
-		# Отбираем функции с одним аргументом file_paths
-		module_rules = [f for name, f in functions 
-					   if len(inspect.signature(f).parameters) >= 1 
-					   and not name.startswith('_')]
-		
-		rule_functions.extend(module_rules)
-
-	return rule_functions
-
-def _apply_overall_rules(overview: Dict[str, Any], rule_functions: List[Callable]) -> Dict[str, Any]:
+def _run_rules(calls: List[Tuple[Rule, Dict[str, Any]]], max_workers: int) -> List[Tuple[Any, float]]:
 	"""
-	Применяет все правила из модуля к переданному обзору проекта.
+	Выполняет независимые правила в пуле потоков. Возвращает пары (результат, секунды) в порядке вызовов.
 	"""
-	project_files = overview['project_files']
+	def timed(rule: Rule, values: Dict[str, Any]) -> Tuple[Any, float]:
+		started = time.perf_counter()
+		result = rule(values)
+		seconds = time.perf_counter() - started
+		metrics.observe('rule', seconds, rule=rule.name, cost=rule.cost)
+		return result, seconds
+
+	if not calls:
+		return []
+	with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(calls)))) as executor:
+		futures = [executor.submit(timed, rule, values) for rule, values in calls]
+		return [future.result() for future in futures]
+
+def _apply_overall_rules(overview: Dict[str, Any], rules: Tuple[Rule, ...]) -> Dict[str, Any]:
+	"""
+	Применяет все правила уровня проекта к переданному обзору проекта.
+	"""
+	project_rules = rules_by(rules, 'project')
+	values = {'file_paths': PathIndex.of(overview['project_files']), 'llm': get_llm()}
+	timings = overview.setdefault('analysis_stats', {}).setdefault('rule_timings', {'project': {}, 'components': {}})
 
 	overview['project_properties'] = {}
-	# Применяем каждую функцию и сохраняем результат
-	for func in rule_functions:
-		if len(inspect.signature(func).parameters) == 1 and list(inspect.signature(func).parameters.keys())[0] == 'file_paths':
-			rule_name = func.__name__.replace('is_', '')
-			overview['project_properties'][rule_name] = func(project_files)
+	for rule, (result, seconds) in zip(project_rules, _run_rules([(rule, values) for rule in project_rules], RULE_WORKERS)):
+		(overview.setdefault(rule.target, {}) if rule.target else overview['project_properties'])[rule.name] = result
+		timings['project'][rule.name] = round(seconds, 6)
 
 	return overview
 
-from graphviz import Digraph
-from typing import Dict, List
-
-from graphviz import Digraph
-from typing import Dict, List
-
-def _generate_graphviz_dependencies(component_imports: Dict[str, List[str]], output_dir: str) -> None:
-    """
-    Generates an SVG image of module dependencies using Graphviz with optimized layout and size constraints.
-
-    :param component_imports: dict - A map of module dependencies in the format {'module': ['dependency1', 'dependency2']}
-    :param output_dir: str - The output directory for the generated SVG file.
-    :param width: float - The width of the SVG canvas in inches (default is A4 width, 8.27 inches).
-    :param height: float - The height of the SVG canvas in inches (default is A4 height, 11.69 inches).
-    :return: None - Saves an SVG file.
-    """
-    # Create a directed graph
-    dot = Digraph(format='png')
-    
-    # Configure graph attributes
-    dot.attr(
-        rankdir='LR',  # Left-to-right layout
-        splines='ortho',  # Orthogonal edges for better readability
-        size=f"11.7,8.3",  # Limit canvas size
-        ratio="fill"  # Compress to fit within the defined size
-    )
-    dot.attr('node', shape='box', style='rounded,filled', fillcolor='#f2f2f2', fontname='Arial', fontsize='8')
-
-    # Add nodes and edges
-    modules = set(component_imports.keys()) | {dep for deps in component_imports.values() for dep in deps}
-    for module in modules:
-        dot.node(module)
-
-    for module, dependencies in component_imports.items():
-        for dep in dependencies:
-            dot.edge(module, dep)
-
-    # Render the graph to SVG
-    return dot.render(output_dir + 'graph', format='png')
-
-
-
-def _render_plantuml_diagram(component_imports: Dict[str, List[str]]) -> str:
+def _render_diagrams(overview: Dict[str, Any]) -> List[Diagram]:
 	"""
-	Рендерит диаграмму PlantUML в изображение.
+	Рендерит диаграммы структуры компонентов и сохраняет время рендеринга в analysis_stats.
 	"""
-
-	with tempfile.TemporaryDirectory() as tmpdir:
-		graph_svg_path = _generate_graphviz_dependencies(component_imports, tmpdir)
-		convert = open(graph_svg_path, 'rb').read()
-		convert = base64.b64encode(convert).decode('utf-8')
-	return convert
-
-def _apply_component_rules(overview: Dict[str, Any], rule_functions: List[Callable], base_dir: str) -> List[Dict[str, Any]]:
+	with metrics.span('stage', stage='diagrams'):
+		diagrams = render_diagrams([c['import_dependencies_graph'] for c in overview['components']])
+	overview['analysis_stats']['diagrams'] = {c['path']: diagram.stats() for c, diagram in zip(overview['components'], diagrams)}
+	for diagram in diagrams:
+		if not diagram.cached:
+			metrics.observe('diagram', diagram.seconds)
+		metrics.inc('diagrams', cached=diagram.cached)
+	return diagrams
+
+def _apply_component_rules(overview: Dict[str, Any], rules: Tuple[Rule, ...], base_dir: Union[str, ProjectFS], index: Optional[ProjectIndex] = None, run: Optional[IncrementalRun] = None, progress: Optional[Callable[[str], None]] = None) -> List[Dict[str, Any]]:
 	"""
-	Применяет все правила из модуля к переданному списку компонентов.
+	Применяет все правила уровня компонента к переданному списку компонентов.
+
+	Сначала ко всем компонентам применяются дешевые статические правила, затем правила, использующие LLM.
 	"""
 
 	components = overview['components']
-	project_files = overview['project_files']
+	fs = open_fs(base_dir)
+	file_paths = PathIndex.of(overview['project_files'])
+	timings = overview.setdefault('analysis_stats', {}).setdefault('rule_timings', {'project': {}, 'components': {}})
 
+	component_files, cached, outputs, values = [], [], [], []
 	for component in components:
 		component['architecture_notes'] = {}
-		imports = component['import_dependencies_graph']
-		for func in rule_functions:
-			if list(inspect.signature(func).parameters.keys())[0] == 'component_imports':
-				rule_name = func.__name__.replace('is_', '')
-				# TODO: invent a better way to handle tricky rules
-				if len(inspect.signature(func).parameters) == 2:
-					if 'hexagonal_architecture' in rule_name:
-						component['architecture_notes'][rule_name] = func(imports, component['path'])
-					else:
-						component[rule_name] = func(imports, project_files)
-				elif len(inspect.signature(func).parameters) == 1:
-					component[rule_name] = func(imports)
-				elif len(inspect.signature(func).parameters) == 3:
-					component[rule_name] = func(imports, base_dir + '/' + component['path'], llm)
+		files = index.python_files_under(component['path']) if index is not None else []
+		component_files.append(files)
+		cached.append(run.cached_component(component['path'], files) if run is not None else None)
+		outputs.append({})
+		values.append({
+			'component_imports': component['import_dependencies_graph'],
+			'component_path': component['path'],
+			'component_fs': fs.sub(component['path']),
+			'file_paths': file_paths,
+			'llm': get_llm(),
+			'component_stats': {},
+		})
+		timings['components'][component['path']] = {}
+
+	def apply(calls: List[Tuple[int, Rule]], max_workers: int) -> None:
+		results = _run_rules([(rule, values[i]) for i, rule in calls], max_workers)
+		for (i, rule), (result, seconds) in zip(calls, results):
+			component = components[i]
+			(component.setdefault(rule.target, {}) if rule.target else component)[rule.name] = outputs[i][rule.name] = result
+			timings['components'][component['path']][rule.name] = round(seconds, 6)
+
+	apply([(i, rule) for i in range(len(components)) for rule in rules_by(rules, 'component', 'cheap')], RULE_WORKERS)
+
+	_notify(progress, 'data_layer')
+	llm_calls = []
+	for i, component in enumerate(components):
+		for rule in rules_by(rules, 'component', 'llm'):
+			# LLM-правила переиспользуем из манифеста, если файлы компонента не изменились
+			if cached[i] is not None and rule.name in cached[i]['rules']:
+				result = cached[i]['rules'][rule.name]
+				(component.setdefault(rule.target, {}) if rule.target else component)[rule.name] = outputs[i][rule.name] = result
+			else:
+				llm_calls.append((i, rule))
+	apply(llm_calls, LLM_MAX_CONCURRENCY)
+
+	rule_stats = overview['analysis_stats'].setdefault('rule_stats', {})
+	for component_values in values:
+		for key, value in component_values['component_stats'].items():
+			rule_stats[key] = round(rule_stats.get(key, 0) + value, 6)
+
+	if run is not None:
+		for component, files, component_cached, component_outputs in zip(components, component_files, cached, outputs):
+			run.record_component(component['path'], files, component['import_dependencies_graph'], component_outputs, reused=component_cached is not None)
 
 	overview['components'] = components
 	return overview
 
 
-def _raw_analytics(path):
-	overview = project_overview_info(path)
+def _raw_analytics(path, project_id: Optional[str] = None, incremental: bool = ANALYZER_INCREMENTAL, index: Optional[ProjectIndex] = None, progress: Optional[Callable[[str], None]] = None):
+	if index is not None:
+		return _analyze_index(path, project_id, incremental, index, progress)
+	with metrics.span('stage', stage='walk'):
+		index = ProjectIndex.build(path)
+	# Архив, открытый здесь, закрываем сразу после анализа: отчету содержимое файлов не нужно
+	try:
+		return _analyze_index(path, project_id, incremental, index, progress)
+	finally:
+		index.close()
+
+def _analyze_index(path, project_id: Optional[str], incremental: bool, index: ProjectIndex, progress: Optional[Callable[[str], None]]) -> Dict[str, Any]:
+	run = None
+	if incremental:
+		run = IncrementalRun(project_id or index.name, _project_files(index), _project_readmes(index), _python_file_hashes(index))
+	overview = project_overview_info(path, index, run, progress)
+
+	_notify(progress, 'rules')
+	with metrics.span('stage', stage='rules'):
+		rules = _get_rules('./feature_extractors')
+		overview = _apply_overall_rules(overview, rules)
+		overview = _apply_component_rules(overview, rules, index.fs, index, run, progress)
+
+	if run is not None:
+		run.save()
+		overview['analysis_stats']['incremental'] = run.summary()
+	return overview
 
-	rule_functions = _get_rule_functions('./feature_extractors')
-	overview = _apply_overall_rules(overview, rule_functions)
-	overview = _apply_component_rules(overview, rule_functions, path)
+def _review_or_placeholder(reviewer: str, summary: Union[Dict[str, Any], BaseException]) -> Dict[str, Any]:
+	"""
+	Возвращает ответ ревьюера или заглушку, если вызов LLM завершился ошибкой.
+	"""
+	if isinstance(summary, BaseException):
+		report_failure(reviewer, summary)
+		return {'summary': 'Не удалось получить обзор.', 'maintainability': 0}
+	return summary
 
-	overview['project_files'] = [ f.replace(path + '/', '') for f in overview['project_files'] ]
-	return overview
+def _diagram_fields(diagram: Diagram) -> Dict[str, Any]:
+	return {'data': diagram.data, 'mime': diagram.mime, 'stats': diagram.stats()}
 
-def apply_analytics(path):
-	overview = _raw_analytics(path)
-	
+def _review_overview(overview: Dict[str, Any], progress: Optional[Callable[[str], None]] = None, deferred: bool = False, on_wait: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+	"""
+	Запрашивает обзоры ревьюеров и собирает данные для шаблона отчета.
+
+	При deferred=True функция не ждет ни ответов LLM, ни рендеринга диаграмм: обзоры
+	и диаграммы компонентов в данных шаблона вычисляются при первом обращении, перед
+	ожиданием вызывается on_wait('diagrams') или on_wait('reviews').
+	"""
+	from langchain_core.prompts import ChatPromptTemplate
+	from langchain_core.output_parsers import JsonOutputParser
+
+	_notify(progress, 'reviews')
 	fowler_prompt = ChatPromptTemplate.from_template(
 		'''
 You are Martin Fowler, a famous software architect. Your task is to write a review of the project principles of architecture based on the JSON description.
@@ -314,7 +423,7 @@ Project description:
 {json_description}
 
 JSON ответ:
-		'''.strip()) | llm | JsonOutputParser()
+		'''.strip()) | get_llm() | JsonOutputParser()
 
 	pepe_prompt = ChatPromptTemplate.from_template(
 		'''
@@ -342,38 +451,180 @@ Project description:
 {json_description}
 
 JSON ответ:
-		'''.strip()) | llm | JsonOutputParser()
+		'''.strip()) | get_llm() | JsonOutputParser()
+
+	json_description, overview['analysis_stats']['prompt_tokens']['review'] = review_description(overview, _json_default)
+
+	def reviews() -> Dict[str, Any]:
+		import markdown
+
+		with metrics.span('stage', stage='reviews'):
+			fowler_summary, pepe_summary = [
+				_review_or_placeholder(name, summary) for name, summary in zip(
+					['fowler', 'pepe'],
+					invoke_all([(fowler_prompt, {'json_description': json_description}), (pepe_prompt, {'json_description': json_description})]),
+				)
+			]
+		_notify(progress, 'rendering')
+		return {
+			"architect": {
+				"review": markdown.markdown(fowler_summary['summary']),
+				"evaluation": fowler_summary['maintainability'],
+			},
+			"developer": {
+				"review": markdown.markdown(pepe_summary['summary']),
+				"evaluation": pepe_summary['maintainability'],
+			},
+		}
+
+	# Обзоры и диаграммы запускаются в двух потоках одновременно: пока идут запросы к LLM,
+	# поток диаграмм ждет их рендеринга в пуле процессов diagrams.py
+	executor = ThreadPoolExecutor(max_workers=2)
+	reviews_future = executor.submit(reviews)
+	diagrams_future = executor.submit(_render_diagrams, overview)
+	executor.shutdown(wait=False)
+
+	def wait(section: str, future: Future) -> Any:
+		if on_wait is not None:
+			on_wait(section)
+		return future.result()
+
+	if deferred:
+		# Шаблон дождется диаграмм и обзоров только там, где они выводятся
+		resolved_diagrams = _Deferred(lambda: dict(enumerate(map(_diagram_fields, wait('diagrams', diagrams_future)))))
+		diagrams = [_Deferred(lambda i=i: resolved_diagrams[i]) for i in range(len(overview['components']))]
+	else:
+		diagrams = [_diagram_fields(diagram) for diagram in diagrams_future.result()]
 
-	fowler_summary = fowler_prompt.invoke({'json_description': json.dumps(overview, ensure_ascii=False, indent=4)})
-	pepe_summary = pepe_prompt.invoke({'json_description': json.dumps(overview, ensure_ascii=False, indent=4)})
-	
 	desc = {
 		"project_name": overview['project_name'],
 		"project_issues": overview.get('architecture_issues', []),
-		"architect": {
-			"review": markdown.markdown(fowler_summary['summary']),
-			"evaluation": fowler_summary['maintainability'],
-		},
-		"developer": {
-			"review": markdown.markdown(pepe_summary['summary']),
-			"evaluation": pepe_summary['maintainability'],
-		},
 		"project_summary": overview['project_properties'],
+		"incremental": overview['analysis_stats'].get('incremental'),
+		"ignored": overview['analysis_stats'].get('ignored'),
+		"rule_stats": overview['analysis_stats'].get('rule_stats'),
 		"components": [ {
 			"name": c['path'],
-			"structure_diagram": _render_plantuml_diagram(c['import_dependencies_graph']),
+			"diagram": diagram,
 			"summary": c['purpose'],
 			"stack": c['stack'],
 			"patterns":  list({ i["pattern"] for i in c["check_data_layer"] }),
 			"issues": dict([ ((i["issue"] + " " + i["location"]), i["how_to_fix"]) for i in c.get('issues', []) ] + [ ("Поддержка Swagger документации", c['have_swagger_endpoint']), ("Поддержка JWT-авторизации", c['have_jwt_authorization']) ]),
-		} for c in overview['components'] ],
+		} for c, diagram in zip(overview['components'], diagrams) ],
 	}
+	if deferred:
+		resolved = _Deferred(lambda: wait('reviews', reviews_future))
+		desc['architect'] = _Deferred(lambda: resolved['architect'])
+		desc['developer'] = _Deferred(lambda: resolved['developer'])
+	else:
+		desc.update(reviews_future.result())
+	return desc
+
+class _Deferred:
+	"""
+	Значение для шаблона отчета, которое вычисляется при первом обращении к его ключам.
+	"""
+
+	def __init__(self, resolve: Callable[[], Dict[str, Any]]):
+		self._resolve = resolve
+		self._value: Optional[Dict[str, Any]] = None
+		self._lock = threading.Lock()
+
+	def __getitem__(self, key: str) -> Any:
+		with self._lock:
+			if self._value is None:
+				self._value = self._resolve()
+		return self._value[key]
+
+def _report_template():
+	"""
+	Возвращает шаблон отчета. Окружение Jinja создается один раз; измененный файл шаблона
+	перечитывается самим Jinja (auto_reload), скомпилированный шаблон берется из его кэша.
+	"""
+	global _jinja_env
+	with _lock:
+		if _jinja_env is None:
+			from jinja2 import Environment, FileSystemLoader
+
+			_jinja_env = Environment(loader=FileSystemLoader('.'))
+			_jinja_env.globals['static_data_uri'] = _static_data_uri
+	return _jinja_env.get_template('report_template.html')
 
-	env = Environment(loader=FileSystemLoader('.'))
-	template = env.get_template('report_template.html')
-	output_html = template.render(desc)
+@functools.lru_cache(maxsize=None)
+def _static_data_uri(name: str) -> str:
+	"""
+	Возвращает файл из static/ как data URI. Отчет открывается по разным адресам (хранилище,
+	сервис, временный файл), поэтому картинки встраиваются в него, а не ссылаются на static/;
+	хранилище выносит их в общие ресурсы /assets/.
+	"""
+	mime = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+	with open(os.path.join('static', name), 'rb') as f:
+		return f'data:{mime};base64,{base64.b64encode(f.read()).decode("ascii")}'
+
+def _render_report(desc: Dict[str, Any]) -> str:
+	template = _report_template()
+	with metrics.span('stage', stage='rendering'):
+		output_html = template.render(desc)
 
 	return output_html
 
+def apply_analytics(path, project_id: Optional[str] = None, incremental: bool = ANALYZER_INCREMENTAL, progress: Optional[Callable[[str], None]] = None):
+	overview = _raw_analytics(path, project_id, incremental, progress=progress)
+	return _render_report(_review_overview(overview, progress))
+
+# Как часто (в секундах) передавать частично отрендеренный отчет в on_content
+STREAM_UPDATE_INTERVAL = float(os.getenv('STREAM_UPDATE_INTERVAL', '0.5'))
+
+def apply_analytics_streaming(path, report_path: str, project_id: Optional[str] = None, incremental: bool = ANALYZER_INCREMENTAL, progress: Optional[Callable[[str], None]] = None, on_content: Optional[Callable[[str], None]] = None) -> Dict[str, float]:
+	"""
+	Анализирует проект и записывает отчет в report_path по мере готовности его частей.
+
+	Статические разделы (свойства проекта, проблемы, описания компонентов) записываются
+	в файл и передаются в on_content, не дожидаясь диаграмм и обзоров ревьюеров; диаграммы
+	и обзоры выводятся в конце документа и переносятся скриптом на свое место. После
+	получения обзоров файл заменяется обычным отчетом. Возвращает время до первого полезного
+	содержимого (всех разделов, кроме обзоров) и до готового отчета в секундах от начала анализа.
+	"""
+	started = time.perf_counter()
+	timings: Dict[str, float] = {}
+	parts: List[str] = []
+	last_update = 0.0
+
+	def publish() -> None:
+		nonlocal last_update
+		last_update = time.perf_counter()
+		if on_content is not None:
+			on_content(''.join(parts))
+
+	def on_wait(section: str) -> None:
+		# Первое полезное содержимое - все разделы, кроме обзоров; диаграммы выводятся до них
+		if section == 'reviews':
+			timings['first_content_seconds'] = round(time.perf_counter() - started, 3)
+		report_file.flush()
+		publish()
+
+	overview = _raw_analytics(path, project_id, incremental, progress=progress)
+	template = _report_template()
+	with open(report_path, 'w') as report_file:
+		desc = _review_overview(overview, progress, deferred=True, on_wait=on_wait)
+		for chunk in template.generate(desc, streaming=True):
+			parts.append(chunk)
+			report_file.write(chunk)
+			if time.perf_counter() - last_update >= STREAM_UPDATE_INTERVAL:
+				report_file.flush()
+				publish()
+		publish()
+
+	tmp_path = report_path + '.tmp'
+	with open(tmp_path, 'w') as report_file, metrics.span('stage', stage='rendering'):
+		report_file.write(template.render(desc, streaming=False))
+	os.replace(tmp_path, report_path)
+	timings['total_seconds'] = round(time.perf_counter() - started, 3)
+	timings.setdefault('first_content_seconds', timings['total_seconds'])
+	metrics.observe('report_first_content', timings['first_content_seconds'])
+	metrics.observe('report_complete', timings['total_seconds'])
+	print(f"Report {report_path}: first content after {timings['first_content_seconds']}s, complete after {timings['total_seconds']}s", file=sys.stderr)
+	return timings
+
 if __name__ == "__main__":
 	print(apply_analytics(sys.argv[1]))
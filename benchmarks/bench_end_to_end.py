@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Сквозной бенчмарк анализа на синтетических проектах с локальным LLM-сервером.
+
+	python benchmarks/bench_end_to_end.py [--sizes 50 200 1000] [--latency 0.2] [--batch-projects 8]
+		[--save-baseline benchmarks/baseline.json] [--compare benchmarks/baseline.json]
+
+Для каждого размера проекта измеряются _raw_analytics и apply_analytics: холодный запуск
+(пустые кэши) и повторный (с кэшами). Затем пакетный режим cli.py --batch анализирует
+--batch-projects ZIP-архивов. Записываются время, проекты в минуту и пиковая память (RSS).
+Результаты можно сохранить как базовые и сравнивать с ними следующие запуски.
+"""
+
+import os
+import sys
+import json
+import time
+import resource
+import tempfile
+import argparse
+import subprocess
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_project import ProjectSpec, generate_project, zip_project
+from fake_llm_server import start_server
+
+
+def _peak_rss_bytes(who: int = resource.RUSAGE_SELF) -> int:
+	return resource.getrusage(who).ru_maxrss * 1024
+
+
+def _measure(func: Callable[[], Any]) -> Dict[str, float]:
+	tracemalloc.start()
+	started = time.perf_counter()
+	func()
+	seconds = time.perf_counter() - started
+	_, peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	return {'seconds': round(seconds, 3), 'python_peak_bytes': peak, 'process_peak_rss_bytes': _peak_rss_bytes()}
+
+
+def bench_analytics(sizes: List[int], work_dir: str) -> Dict[str, Any]:
+	# Импорт после настройки окружения: адрес LLM и каталоги кэшей читаются при импорте
+	from analytics import _raw_analytics, apply_analytics, get_llm
+
+	# Клиент LLM и LangChain загружаются лениво; холодный запуск измеряет пустые кэши, а не импорт
+	get_llm()
+	results = {}
+	for size in sizes:
+		project = generate_project(os.path.join(work_dir, f'project_{size}'), ProjectSpec(files=size))
+		results[f'raw_analytics_{size}_cold'] = _measure(lambda: _raw_analytics(project))
+		results[f'raw_analytics_{size}_warm'] = _measure(lambda: _raw_analytics(project))
+		results[f'apply_analytics_{size}'] = _measure(lambda: apply_analytics(project))
+		print(f'{size} files: ' + ', '.join(f"{name.split('_', 2)[-1]} {result['seconds']}s" for name, result in results.items() if f'_{size}' in name), file=sys.stderr)
+	return results
+
+
+def bench_batch(projects: int, size: int, workers: int, work_dir: str, env: Dict[str, str]) -> Dict[str, Any]:
+	archives_dir = os.path.join(work_dir, 'archives')
+	os.makedirs(archives_dir, exist_ok=True)
+	for i in range(projects):
+		root = generate_project(os.path.join(work_dir, 'batch', f'project_{i}'), ProjectSpec(files=size, seed=i))
+		zip_project(root, os.path.join(archives_dir, f'project_{i}.zip'))
+	output = os.path.join(work_dir, 'batch.jsonl')
+	started = time.perf_counter()
+	subprocess.run(
+		[sys.executable, os.path.join(ROOT, 'cli.py'), archives_dir, '--batch', output, '--workers', str(workers)],
+		cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL,
+	)
+	seconds = time.perf_counter() - started
+	with open(output) as f:
+		records = [json.loads(line) for line in f]
+	return {'batch': {
+		'seconds': round(seconds, 3),
+		'projects': len(records),
+		'failed': sum(record['status'] != 'ok' for record in records),
+		'projects_per_minute': round(len(records) / seconds * 60, 2),
+		'children_peak_rss_bytes': _peak_rss_bytes(resource.RUSAGE_CHILDREN),
+	}}
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> bool:
+	"""
+	Печатает изменения относительно базовых результатов. Возвращает False при регрессии больше threshold.
+	"""
+	ok = True
+	for name, result in results.items():
+		for metric, value in result.items():
+			base = baseline.get(name, {}).get(metric)
+			if not base or not isinstance(value, (int, float)):
+				continue
+			change = (value - base) / base
+			# Для пропускной способности регрессия - уменьшение
+			regression = -change if metric == 'projects_per_minute' else change
+			mark = 'REGRESSION' if regression > threshold else ''
+			ok = ok and not mark
+			print(f'{name}.{metric}: {base} -> {value} ({change:+.1%}) {mark}')
+	return ok
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='End-to-end analysis benchmark on synthetic projects with a local fake LLM.')
+	parser.add_argument('--sizes', type=int, nargs='+', default=[50, 200, 1000], help='project sizes (Python modules)')
+	parser.add_argument('--latency', type=float, default=0.2, help='fake LLM response delay in seconds')
+	parser.add_argument('--batch-projects', type=int, default=8, help='archives for the cli.py batch benchmark (0 - skip)')
+	parser.add_argument('--batch-size', type=int, default=100, help='modules in each batch project')
+	parser.add_argument('--workers', type=int, default=4)
+	parser.add_argument('--save-baseline', metavar='PATH')
+	parser.add_argument('--compare', metavar='PATH')
+	parser.add_argument('--threshold', type=float, default=0.2, help='relative slowdown reported as a regression')
+	args = parser.parse_args()
+
+	server, url = start_server(latency=args.latency)
+	with tempfile.TemporaryDirectory() as work_dir:
+		env = {
+			**os.environ,
+			'LLM_API_BASE': url,
+			'COMPRESSA_KEY': 'fake',
+			'ANALYZER_CACHE_DIR': os.path.join(work_dir, 'cache'),
+			# Кэш ответов LLM выключен: измеряем запросы к серверу, а не чтение кэша
+			'LLM_CACHE_MODE': 'off',
+		}
+		os.environ.update(env)
+		# Шаблон отчета загружается из текущего каталога
+		os.chdir(ROOT)
+
+		results = bench_analytics(args.sizes, work_dir)
+		if args.batch_projects:
+			results.update(bench_batch(args.batch_projects, args.batch_size, args.workers, work_dir, env))
+	server.shutdown()
+
+	print(json.dumps(results, indent=4))
+	if args.save_baseline:
+		with open(args.save_baseline, 'w') as f:
+			json.dump(results, f, indent=4)
+	if args.compare:
+		with open(args.compare) as f:
+			if not compare(results, json.load(f), args.threshold):
+				sys.exit(1)
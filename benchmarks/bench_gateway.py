@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк шлюза LLM на нескольких локальных фейковых серверах.
+
+	python benchmarks/bench_gateway.py [--latencies 0.05 0.2 0.5] [--rpm 0 0 60] [--requests 200]
+		[--duplicates 0.2] [--concurrency 32]
+
+Запускает по серверу на каждую задержку (с лимитом запросов в минуту из --rpm) и выполняет
+--requests запросов через LLMGateway: сначала только через первый сервер, затем через все.
+Доля --duplicates запросов повторяет уже отправленные промпты и должна объединяться шлюзом.
+Печатает время, распределение запросов по серверам, ошибки, 429 и объединенные запросы.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.prompts import ChatPromptTemplate
+
+import llm_runner
+from fake_llm_server import start_server
+from llm_gateway import LLMGateway, parse_endpoints
+from llm_runner import invoke_all
+
+
+def run(spec: str, prompts: List[str], concurrency: int) -> Dict[str, Any]:
+	gateway = LLMGateway(parse_endpoints(spec), api_key='fake', model='fake')
+	chain = ChatPromptTemplate.from_template('Review the module {module}') | gateway
+	started = time.perf_counter()
+	results = invoke_all([(chain, {'module': prompt}) for prompt in prompts], max_concurrency=concurrency)
+	return {
+		'seconds': round(time.perf_counter() - started, 3),
+		'failed': sum(isinstance(result, BaseException) for result in results),
+		**gateway.stats(),
+	}
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='LLM gateway benchmark on local fake OpenAI-compatible servers.')
+	parser.add_argument('--latencies', type=float, nargs='+', default=[0.05, 0.2, 0.5], help='response delay of each server in seconds')
+	parser.add_argument('--rpm', type=int, nargs='*', default=[], help='requests per minute of each server before 429 (0 - unlimited)')
+	parser.add_argument('--requests', type=int, default=200)
+	parser.add_argument('--duplicates', type=float, default=0.2, help='fraction of requests repeating an earlier prompt')
+	parser.add_argument('--concurrency', type=int, default=32)
+	parser.add_argument('--seed', type=int, default=0)
+	args = parser.parse_args()
+	# Общий лимит процесса не должен быть меньше параллелизма бенчмарка
+	llm_runner.LLM_MAX_CONCURRENCY = args.concurrency
+
+	urls = []
+	for i, latency in enumerate(args.latencies):
+		rpm = args.rpm[i] if i < len(args.rpm) else 0
+		urls.append(start_server(latency=latency, rpm=rpm)[1])
+
+	rng = random.Random(args.seed)
+	prompts = []
+	for i in range(args.requests):
+		prompts.append(rng.choice(prompts) if prompts and rng.random() < args.duplicates else f'module_{i}')
+
+	results = {
+		'single_endpoint': run(urls[0], prompts, args.concurrency),
+		'gateway': run(','.join(urls), prompts, args.concurrency),
+	}
+	print(json.dumps(results, indent=4))
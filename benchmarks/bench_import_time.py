@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Проверка времени импорта точек входа (регрессионный тест быстрого запуска).
+
+	python benchmarks/bench_import_time.py [--modules analytics cli ui] [--repeat 5] [--max-ms 500]
+		[--save-baseline benchmarks/import_baseline.json] [--compare benchmarks/import_baseline.json]
+
+Каждый модуль импортируется в отдельном процессе с `python -X importtime`, из нескольких
+запусков берется минимальное кумулятивное время. Проверка не проходит (код возврата 1), если
+при импорте загружается тяжелая зависимость из HEAVY_MODULES (они должны загружаться при
+первом использовании), время превышает --max-ms или ухудшилось относительно базового больше
+--threshold. Модули, которые нельзя импортировать в текущем окружении (например, без streamlit),
+пропускаются.
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+from typing import Any, Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Зависимости, которые не должны загружаться при импорте точек входа
+HEAVY_MODULES = ('langchain', 'langchain_core', 'langchain_openai', 'openai', 'tiktoken', 'graphviz', 'markdown', 'jinja2', 'pyunpack', 'xhtml2pdf')
+
+
+def import_profile(module: str) -> Tuple[Optional[float], List[str], str]:
+	"""
+	Импортирует модуль в новом процессе. Возвращает (кумулятивное время в мс или None при ошибке,
+	импортированные модули, текст ошибки).
+	"""
+	result = subprocess.run(
+		[sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+		cwd=ROOT, capture_output=True, text=True,
+	)
+	if result.returncode != 0:
+		return None, [], result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f'exit code {result.returncode}'
+	cumulative, imported = None, []
+	for line in result.stderr.splitlines():
+		if not line.startswith('import time:') or '|' not in line:
+			continue
+		_, total, name = line.split('|', 2)
+		if not total.strip().isdigit():
+			# Строка заголовка
+			continue
+		imported.append(name.strip())
+		if name.strip() == module:
+			cumulative = int(total) / 1000
+	return cumulative, imported, ''
+
+
+def check_module(module: str, repeat: int) -> Dict[str, Any]:
+	timings, heavy, error = [], [], ''
+	for _ in range(repeat):
+		milliseconds, imported, error = import_profile(module)
+		if milliseconds is None:
+			return {'skipped': error}
+		timings.append(milliseconds)
+		heavy = sorted({name.split('.')[0] for name in imported} & set(HEAVY_MODULES))
+	return {'milliseconds': round(min(timings), 1), 'heavy_modules': heavy}
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Import time regression check for analytics.py, cli.py and ui.py.')
+	parser.add_argument('--modules', nargs='+', default=['analytics', 'cli', 'ui'])
+	parser.add_argument('--repeat', type=int, default=5, help='imports per module, the fastest one is reported')
+	parser.add_argument('--max-ms', type=float, default=500, help='import time budget per module in milliseconds')
+	parser.add_argument('--save-baseline', metavar='PATH')
+	parser.add_argument('--compare', metavar='PATH')
+	parser.add_argument('--threshold', type=float, default=0.5, help='relative slowdown reported as a regression')
+	args = parser.parse_args()
+
+	baseline = {}
+	if args.compare:
+		with open(args.compare) as f:
+			baseline = json.load(f)
+
+	results, ok = {}, True
+	for module in args.modules:
+		result = results[module] = check_module(module, args.repeat)
+		if 'skipped' in result:
+			print(f'{module}: skipped ({result["skipped"]})')
+			continue
+		problems = []
+		if result['heavy_modules']:
+			problems.append('imports ' + ', '.join(result['heavy_modules']))
+		if result['milliseconds'] > args.max_ms:
+			problems.append(f'over budget {args.max_ms} ms')
+		base = baseline.get(module, {}).get('milliseconds')
+		change = ''
+		if base:
+			change = f' (baseline {base} ms, {(result["milliseconds"] - base) / base:+.1%})'
+			if result['milliseconds'] > base * (1 + args.threshold):
+				problems.append('REGRESSION')
+		ok = ok and not problems
+		print(f'{module}: {result["milliseconds"]} ms{change}' + (' - ' + '; '.join(problems) if problems else ''))
+
+	if args.save_baseline:
+		with open(args.save_baseline, 'w') as f:
+			json.dump(results, f, indent=4)
+	if not ok:
+		sys.exit(1)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк правил feature_extractors/project_summary.py: построчный перебор file_paths против PathIndex.
+
+	python benchmarks/bench_path_rules.py [--sizes 1000 10000 100000] [--components 10]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from feature_extractors import project_summary
+from feature_extractors.path_index import PathIndex
+
+
+# Исходные реализации правил (до PathIndex) - для сравнения результатов и времени
+def _legacy_rules() -> Dict[str, Callable[[List[str]], bool]]:
+	name = lambda path: path.split('/')[-1]
+	return {
+		'monorepository': lambda fp: len([i for i in fp if name(i) not in ['.git', '.gitignore', 'README.md']]) > 1,
+		'have_gitignore_file': lambda fp: '.gitignore' in [name(i) for i in fp],
+		'have_editorconfig_file': lambda fp: '.editorconfig' in [name(i) for i in fp],
+		'have_gitattributes_file': lambda fp: '.gitattributes' in [name(i) for i in fp],
+		'have_deployment_files': lambda fp: any('deployment' in p.split('/') for p in fp),
+		'have_docs_directory': lambda fp: len([p for p in fp if 'docs/' in p]) > 0,
+		'have_plantuml_diagrams': lambda fp: any(p.endswith('.puml') or p.endswith('.plantuml') for p in fp if 'docs/' in p),
+		'have_source_code_directory': lambda fp: any(d in p for d in ['src/', 'app/', 'backend/'] for p in fp),
+		'have_formatter_configs': lambda fp: any(c in p for c in ['.style.yapf', 'setup.cfg', 'pyproject.toml', 'tox.ini'] for p in fp),
+		'have_swagger_endpoint': lambda fp: any(f in fp for f in ['swagger.yaml', 'swagger.json']),
+	}
+
+
+def _indexed_rules() -> Dict[str, Callable[[List[str]], bool]]:
+	rules = {name.replace('is_', ''): getattr(project_summary, name) for name in dir(project_summary) if name.startswith('is_')}
+	swagger = rules.pop('have_swagger_endpoint')
+	rules.pop('have_jwt_authorization')
+	rules['have_swagger_endpoint'] = lambda fp: swagger({}, fp)
+	return rules
+
+
+def synthetic_paths(count: int, seed: int = 0) -> List[str]:
+	rnd = random.Random(seed)
+	dirs = ['lib', 'pkg', 'core', 'utils', 'models', 'services', 'api', 'handlers', 'tests', 'internal']
+	exts = ['.py', '.py', '.py', '.txt', '.json', '.yaml', '.md', '.html']
+	paths = []
+	for i in range(count):
+		depth = rnd.randint(1, 5)
+		parts = [rnd.choice(dirs) + str(rnd.randint(0, 30)) for _ in range(depth)]
+		paths.append('/'.join(parts + [f'file_{i}{rnd.choice(exts)}']))
+	return paths
+
+
+# Пути, на которых срабатывает каждое правило: без них сравнение реализаций ничего не проверяет
+MATCHING_PATHS = [
+	'.gitignore', '.editorconfig', '.gitattributes', 'swagger.yaml', 'svc/pyproject.toml',
+	'deployment/helm/values.yaml', 'docs/architecture.puml', 'src/main.py',
+]
+
+
+# Граничные случаи: подстроки имен, имена из одного расширения, похожие каталоги.
+# Проверяются по одному, чтобы срабатывание других правил их не маскировало
+EDGE_CASES = [
+	['svc/setup.cfg.example'], ['templates/pyproject.toml.j2'], ['old.tox.ini'], ['cfg/.style.yapf.bak'],
+	['docs/.puml'], ['mydocs/a.plantuml'], ['docs.old/a.puml'], ['docs/a.puml.txt'],
+	['project_src/main.py'], ['webapp/x.py'], ['srcs/x.py'], ['backend'],
+	['deployment'], ['x/deployments/a.yaml'], ['api/swagger.json'], ['swagger.yaml.bak'],
+	['a/.gitignore'], ['.gitignore.bak'], ['.git', 'README.md'], ['.git', 'README.md', 'x.py'],
+]
+
+
+def seeded_paths(count: int, seed: int = 0) -> List[str]:
+	"""
+	Синтетические пути, часть которых заменена путями из MATCHING_PATHS.
+	"""
+	paths = synthetic_paths(count, seed)
+	rnd = random.Random(seed)
+	for path in MATCHING_PATHS:
+		paths[rnd.randrange(len(paths))] = path
+	return paths
+
+
+def check_equal(legacy: Dict[str, Callable], indexed: Dict[str, Callable], size: int) -> None:
+	"""
+	Сравнивает результаты исходных и индексированных правил на обычных и засеянных путях и граничных случаях.
+	"""
+	for file_paths in (synthetic_paths(size), seeded_paths(size)):
+		expected = {n: f(file_paths) for n, f in legacy.items()}
+		actual = {n: f(PathIndex(file_paths)) for n, f in indexed.items()}
+		assert expected == actual, {n: (expected[n], actual[n]) for n in expected if expected[n] != actual[n]}
+	not_triggered = [n for n, result in actual.items() if not result]
+	assert not not_triggered, f"Seeded paths do not trigger rules: {not_triggered}"
+	for file_paths in EDGE_CASES:
+		expected = {n: f(file_paths) for n, f in legacy.items()}
+		actual = {n: f(PathIndex(file_paths)) for n, f in indexed.items()}
+		assert expected == actual, (file_paths, {n: (expected[n], actual[n]) for n in expected if expected[n] != actual[n]})
+
+
+def _measure(rules: Dict[str, Callable], file_paths: List[str], components: int) -> float:
+	started = time.perf_counter()
+	for name, func in rules.items():
+		# Правило swagger выполняется для каждого компонента
+		for _ in range(components if name == 'have_swagger_endpoint' else 1):
+			func(file_paths)
+	return time.perf_counter() - started
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+	parser.add_argument('--components', type=int, default=10)
+	args = parser.parse_args()
+
+	legacy, indexed = _legacy_rules(), _indexed_rules()
+	print(f"{'files':>8} {'legacy, s':>10} {'index build, s':>15} {'indexed rules, s':>17} {'speedup':>8}")
+	for size in args.sizes:
+		file_paths = synthetic_paths(size)
+		started = time.perf_counter()
+		index = PathIndex(file_paths)
+		build = time.perf_counter() - started
+		check_equal(legacy, indexed, size)
+		legacy_time = _measure(legacy, file_paths, args.components)
+		indexed_time = _measure(indexed, PathIndex(file_paths), args.components)
+		print(f"{size:>8} {legacy_time:>10.4f} {build:>15.4f} {indexed_time:>17.6f} {legacy_time / (build + indexed_time):>7.1f}x")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Локальный OpenAI-совместимый сервер с заготовленными ответами для бенчмарков.
+
+	python benchmarks/fake_llm_server.py [--port 8900] [--latency 0.5] [--jitter 0.1] [--rpm 0]
+	LLM_API_BASE=http://127.0.0.1:8900/v1 COMPRESSA_KEY=fake python cli.py DIR
+
+Отвечает на POST /v1/chat/completions. Ответ выбирается по тексту промпта: обзор проекта
+(компоненты - каталоги component_<i> из дерева файлов, см. synthetic_project.py), выбор модулей
+слоя данных, анализ файла и обзоры ревьюеров. Задержка ответа настраивается. При --rpm сервер,
+как и настоящий API, отвечает 429 с заголовком Retry-After на запросы сверх лимита в минуту.
+"""
+
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+
+def _overview_answer(prompt: str) -> Dict[str, Any]:
+	components = sorted(set(re.findall(r'\b(component_\d+)/', prompt))) or ['.']
+	return {
+		'project_name': 'synthetic',
+		'purpose': 'Synthetic project for benchmarks.',
+		'build_system': 'pyproject.toml',
+		'tests': True,
+		'documentation': 'Generated README files.',
+		'components': [
+			{'dependency_config': f'{c}/pyproject.toml', 'path': c, 'purpose': 'Synthetic component', 'stack': 'Python, FastAPI, SQLAlchemy', 'entry_point': None}
+			for c in components
+		],
+		'architecture_issues': ['Components share a single database.'],
+	}
+
+
+def _data_layer_answer(prompt: str) -> Any:
+	modules = re.findall(r"'([\w.]+)': \[", prompt)
+	return [module for module in modules if 'model' in module or 'repositor' in module]
+
+
+def _file_answer(prompt: str) -> Dict[str, Any]:
+	match = re.search(r'"file_path": "([^"]*)"', prompt)
+	return {
+		'file_path': match.group(1) if match else None,
+		'datasource_types': ['PostgreSQL'],
+		'pattern': 'Repository',
+		'issues': [{'description': 'Session is passed explicitly', 'location': 'method_0', 'how_to_fix': 'Use Unit of Work'}],
+	}
+
+
+def _review_answer(prompt: str) -> Dict[str, Any]:
+	return {'summary': 'Синтетический обзор: **слои** разделены, но есть что улучшить.', 'maintainability': 3}
+
+
+def answer(prompt: str) -> str:
+	if 'THERE IS PROJECT FILE STRUCTURE' in prompt:
+		result = _overview_answer(prompt)
+	elif 'responsible for data access' in prompt:
+		result = _data_layer_answer(prompt)
+	elif 'analyze the content of the file' in prompt:
+		result = _file_answer(prompt)
+	else:
+		result = _review_answer(prompt)
+	return json.dumps(result, ensure_ascii=False)
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+	latency = 0.0
+	jitter = 0.0
+	rpm = 0
+	protocol_version = 'HTTP/1.1'
+
+	def do_POST(self) -> None:
+		body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+		if not self.path.rstrip('/').endswith('/chat/completions'):
+			self._send(404, {'error': {'message': f'Unknown path {self.path}'}})
+			return
+		retry_after = self._rate_limit()
+		if retry_after:
+			self._send(429, {'error': {'message': 'Rate limit exceeded', 'type': 'rate_limit_error'}}, {'Retry-After': str(retry_after)})
+			return
+		prompt = '\n'.join(str(message.get('content', '')) for message in body.get('messages', []))
+		time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+		content = answer(prompt)
+		prompt_tokens, completion_tokens = len(prompt) // 4, len(content) // 4
+		self._send(200, {
+			'id': f'chatcmpl-{time.time_ns()}',
+			'object': 'chat.completion',
+			'created': int(time.time()),
+			'model': body.get('model', 'fake'),
+			'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+			'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens, 'total_tokens': prompt_tokens + completion_tokens},
+		})
+
+	def _rate_limit(self) -> int:
+		"""
+		Учитывает запрос в окне последней минуты. Возвращает 0 или секунды до освобождения лимита.
+		"""
+		if not self.rpm:
+			return 0
+		now = time.monotonic()
+		with self.lock:
+			while self.sent and now - self.sent[0] >= 60:
+				self.sent.popleft()
+			if len(self.sent) >= self.rpm:
+				return max(1, int(60 - (now - self.sent[0])) + 1)
+			self.sent.append(now)
+		return 0
+
+	def _send(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+		data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+		self.send_response(status)
+		for name, value in (headers or {}).items():
+			self.send_header(name, value)
+		self.send_header('Content-Type', 'application/json')
+		self.send_header('Content-Length', str(len(data)))
+		self.end_headers()
+		self.wfile.write(data)
+
+	def log_message(self, format: str, *args: Any) -> None:
+		pass
+
+
+def start_server(port: int = 0, latency: float = 0.0, jitter: float = 0.0, rpm: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+	"""
+	Запускает сервер в фоновом потоке. Возвращает (сервер, базовый URL API).
+	"""
+	handler = type('Handler', (FakeLLMHandler,), {'latency': latency, 'jitter': jitter, 'rpm': rpm, 'lock': threading.Lock(), 'sent': deque()})
+	server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+	server.daemon_threads = True
+	threading.Thread(target=server.serve_forever, daemon=True).start()
+	return server, f'http://127.0.0.1:{server.server_address[1]}/v1'
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='OpenAI-compatible fake LLM server for benchmarks.')
+	parser.add_argument('--port', type=int, default=8900)
+	parser.add_argument('--latency', type=float, default=0.5, help='response delay in seconds')
+	parser.add_argument('--jitter', type=float, default=0.1, help='random delay deviation in seconds')
+	parser.add_argument('--rpm', type=int, default=0, help='requests per minute before answering 429 (0 - unlimited)')
+	args = parser.parse_args()
+
+	server, url = start_server(args.port, args.latency, args.jitter, args.rpm)
+	print(f'Fake LLM API: {url}')
+	try:
+		threading.Event().wait()
+	except KeyboardInterrupt:
+		server.shutdown()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Генератор синтетических Python-проектов для бенчмарков.
+
+	python benchmarks/synthetic_project.py OUTPUT_DIR [--files 200] [--components 3] [--imports 4] [--readme-kb 4] [--zip]
+
+Проект состоит из компонентов component_<i>/ со своим pyproject.toml, пакетами и модулями.
+Часть модулей - репозитории и модели (импортируют SQLAlchemy/redis), остальные - сервисы и API.
+Генерация детерминирована при одинаковом --seed.
+"""
+
+import os
+import random
+import shutil
+import zipfile
+import argparse
+from dataclasses import dataclass
+from typing import List
+
+
+EXTERNAL_IMPORTS = ['os', 'sys', 'json', 'logging', 'typing', 'dataclasses', 'fastapi', 'pydantic', 'requests']
+DATA_IMPORTS = ['sqlalchemy', 'sqlalchemy.orm', 'redis', 'psycopg2']
+PACKAGES = ['api', 'services', 'domain', 'repositories', 'models', 'utils']
+
+
+@dataclass
+class ProjectSpec:
+	files: int = 200
+	components: int = 3
+	# Среднее количество импортов модулей компонента в одном файле
+	imports: int = 4
+	readme_kb: int = 4
+	# Количество строк функций в одном модуле (определяет размер файлов)
+	functions: int = 5
+	seed: int = 0
+
+
+def _module_source(rng: random.Random, module: str, internal: List[str], spec: ProjectSpec) -> str:
+	package = module.split('.')[0]
+	lines = []
+	for name in rng.sample(EXTERNAL_IMPORTS, 3):
+		lines.append(f'import {name}')
+	if package in ('repositories', 'models'):
+		lines.append(f'import {rng.choice(DATA_IMPORTS)}')
+	for name in rng.sample(internal, min(len(internal), spec.imports)):
+		if name != module:
+			lines.append(f'from {name} import *')
+	lines.append('')
+	class_name = ''.join(part.capitalize() for part in module.split('.')[-1].split('_'))
+	lines.append(f'class {class_name}:')
+	lines.append(f'\t"""{package} module {module}."""')
+	for i in range(spec.functions):
+		lines.append('')
+		lines.append(f'\tdef method_{i}(self, session, value):')
+		if package == 'repositories':
+			lines.append(f'\t\treturn session.query(value).filter_by(id={i}).all()')
+		else:
+			lines.append(f'\t\tresult = [value * {i} for _ in range(10)]')
+			lines.append('\t\treturn sum(result)')
+	lines.append('')
+	return '\n'.join(lines)
+
+
+def _readme(rng: random.Random, title: str, size_kb: int) -> str:
+	words = ['service', 'data', 'layer', 'deploy', 'docker', 'config', 'module', 'test', 'api', 'database']
+	text = [f'# {title}', '', '[![build](https://ci/badge.svg)](https://ci)', '']
+	size = 0
+	while size < size_kb * 1024:
+		line = ' '.join(rng.choice(words) for _ in range(12)) + '.'
+		text.append(line)
+		size += len(line) + 1
+	return '\n'.join(text) + '\n'
+
+
+def generate_project(root: str, spec: ProjectSpec) -> str:
+	"""
+	Создает синтетический проект в каталоге root (существующий каталог перезаписывается).
+	"""
+	rng = random.Random(spec.seed)
+	if os.path.exists(root):
+		shutil.rmtree(root)
+	os.makedirs(root)
+	name = os.path.basename(os.path.normpath(root))
+
+	def write(rel_path: str, text: str) -> None:
+		path = os.path.join(root, rel_path)
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		with open(path, 'w') as f:
+			f.write(text)
+
+	write('README.md', _readme(rng, name, spec.readme_kb))
+	write('.gitignore', '__pycache__/\n.venv/\n')
+	write('docker-compose.yml', 'services:\n' + ''.join(f'  component_{i}:\n    build: ./component_{i}\n' for i in range(spec.components)))
+
+	per_component = max(1, spec.files // spec.components)
+	for c in range(spec.components):
+		component = f'component_{c}'
+		write(f'{component}/pyproject.toml', f'[project]\nname = "{component}"\ndependencies = ["fastapi", "sqlalchemy"]\n')
+		write(f'{component}/README.md', _readme(rng, component, max(1, spec.readme_kb // 2)))
+		modules = [f'{PACKAGES[i % len(PACKAGES)]}.module_{i}' for i in range(per_component)]
+		for package in PACKAGES:
+			write(f'{component}/{package}/__init__.py', '')
+		for module in modules:
+			write(f'{component}/{module.replace(".", "/")}.py', _module_source(rng, module, modules, spec))
+		write(f'{component}/tests/test_{component}.py', 'def test_smoke():\n\tassert True\n')
+	return root
+
+
+def zip_project(root: str, zip_path: str) -> str:
+	with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+		for dir_path, _, file_names in os.walk(root):
+			for file_name in file_names:
+				path = os.path.join(dir_path, file_name)
+				archive.write(path, os.path.relpath(path, os.path.dirname(root)))
+	return zip_path
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Generate a synthetic Python project for benchmarks.')
+	parser.add_argument('output_dir')
+	parser.add_argument('--files', type=int, default=ProjectSpec.files, help='number of Python modules')
+	parser.add_argument('--components', type=int, default=ProjectSpec.components)
+	parser.add_argument('--imports', type=int, default=ProjectSpec.imports, help='internal imports per module')
+	parser.add_argument('--readme-kb', type=int, default=ProjectSpec.readme_kb, help='size of the root README in KB')
+	parser.add_argument('--functions', type=int, default=ProjectSpec.functions, help='methods per module')
+	parser.add_argument('--seed', type=int, default=ProjectSpec.seed)
+	parser.add_argument('--zip', action='store_true', help='also pack the project into OUTPUT_DIR.zip')
+	args = parser.parse_args()
+
+	spec = ProjectSpec(args.files, args.components, args.imports, args.readme_kb, args.functions, args.seed)
+	root = generate_project(args.output_dir, spec)
+	print(zip_project(root, root.rstrip('/') + '.zip') if args.zip else root)
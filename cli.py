@@ -5,10 +5,18 @@ import glob
 import os
 import sys
 from zipfile import ZipFile 
-from pyunpack import Archive
 from tempfile import TemporaryDirectory
 import json
-from analytics import apply_analytics
+import time
+import argparse
+from typing import List, Dict, Any, Set
+from analytics import apply_analytics, _raw_analytics, _review_overview, _render_report, llm_stats
+from incremental import ANALYZER_INCREMENTAL
+import ignore_rules
+from vfs import is_7z_supported
+from project_index import ProjectIndex
+from pipeline import Stage, run_pipeline
+import metrics
 
 
 def unpack_zip(zip_file_path: str, output_dir: str):
@@ -17,21 +25,140 @@ def unpack_zip(zip_file_path: str, output_dir: str):
 	return output_dir
 
 def unpack_7z(zip_file_path: str, output_dir: str):
+	from pyunpack import Archive
+
 	Archive(zip_file_path).extractall(output_dir)
 	return output_dir
 
+def _project_dir(temp_dir: str, project_archive: str) -> str:
+	# Имя каталога не должно быть случайным: оно попадает в промпты и ключи кэшей
+	return os.path.join(temp_dir, os.path.basename(project_archive))
+
+def _find_archives(dir_path: str) -> List[str]:
+	return [
+		*glob.glob(f"{dir_path}/**/*.zip"), *glob.glob(f"{dir_path}/*.zip"),
+		*glob.glob(f"{dir_path}/**/*.7z"), *glob.glob(f"{dir_path}/*.7z"),
+	]
+
+def _needs_extraction(project_archive: str) -> bool:
+	# ZIP-архивы (и 7z при наличии py7zr) анализируются без распаковки на диск
+	return project_archive.endswith('.7z') and not is_7z_supported()
+
 def extract_projects(dir_path: str):
-	for project_archive in glob.glob(f"{dir_path}/**/*.zip") + glob.glob(f"{dir_path}/*.zip"):
+	for project_archive in _find_archives(dir_path):
+		if not _needs_extraction(project_archive):
+			yield project_archive, project_archive
+			continue
 		with TemporaryDirectory() as temp_dir:
-			yield project_archive, unpack_zip(project_archive, temp_dir)
+			yield project_archive, unpack_7z(project_archive, _project_dir(temp_dir, project_archive))
 
-	for project_archive in glob.glob(f"{dir_path}/**/*.7z") + glob.glob(f"{dir_path}/*.7z"):
-		with TemporaryDirectory() as temp_dir:
-			yield project_archive, unpack_7z(project_archive, temp_dir)
+def _completed_archives(output_path: str) -> Set[str]:
+	"""
+	Возвращает архивы, которые уже успешно проанализированы в предыдущих запусках.
+	"""
+	completed = set()
+	if not os.path.exists(output_path):
+		return completed
+	with open(output_path, 'r') as f:
+		for line in f:
+			try:
+				record = json.loads(line)
+			except json.JSONDecodeError:
+				# Последняя строка могла быть записана не полностью
+				continue
+			if record.get('status') == 'ok':
+				completed.add(record['archive'])
+	return completed
+
+def _open_stage(job: Dict[str, Any]) -> Dict[str, Any]:
+	source = job['archive']
+	if _needs_extraction(source):
+		job['temp_dir'] = TemporaryDirectory()
+		source = unpack_7z(source, _project_dir(job['temp_dir'].name, source))
+	job['index'] = ProjectIndex.build(source)
+	return job
+
+def _render_stage(job: Dict[str, Any]) -> Dict[str, Any]:
+	job['report'] = _render_report(_review_overview(job['overview']))
+	return job
+
+def run_batch(dir_path: str, output_path: str, workers: int, incremental: bool) -> None:
+	"""
+	Пакетный анализ архивов: открытие, анализ и рендеринг отчетов разных проектов идут одновременно.
+
+	Результаты дописываются в output_path (JSONL) по мере готовности, при повторном запуске
+	успешно проанализированные архивы пропускаются.
+	"""
+	completed = _completed_archives(output_path)
+	archives = [a for a in _find_archives(dir_path) if a not in completed]
+	jobs = ({'archive': a, 'project_id': os.path.relpath(a, dir_path), 'started': time.time()} for a in archives)
+
+	def analyze_stage(job: Dict[str, Any]) -> Dict[str, Any]:
+		job['overview'] = _raw_analytics(None, job['project_id'], incremental, job['index'])
+		return job
+
+	stages = [
+		Stage('open', _open_stage, workers=2),
+		Stage('analyze', analyze_stage, workers=workers),
+		Stage('render', _render_stage, workers=max(1, workers // 2)),
+	]
+
+	started, ok, failed = time.time(), 0, 0
+	with open(output_path, 'a') as output:
+		for job in run_pipeline(jobs, stages, queue_size=workers * 2):
+			if 'index' in job:
+				job['index'].close()
+			if 'temp_dir' in job:
+				job['temp_dir'].cleanup()
+			record = {'archive': job['archive'], 'project_id': job['project_id'], 'seconds': round(time.time() - job['started'], 3)}
+			if 'error' in job:
+				failed += 1
+				record.update({'status': 'error', 'stage': job['failed_stage'], 'error': job['error']})
+			else:
+				ok += 1
+				record.update({'status': 'ok', 'report': job['report'], 'diagrams': job['overview']['analysis_stats'].get('diagrams')})
+			output.write(json.dumps(record, ensure_ascii=False) + '\n')
+			output.flush()
+			print(f"[{ok + failed}/{len(archives)}] {record['status']} {job['archive']} ({record['seconds']}s)", file=sys.stderr)
+
+	elapsed = time.time() - started
+	print(f"Projects: {ok + failed} (ok: {ok}, failed: {failed}, skipped as completed: {len(completed)}), elapsed: {elapsed:.1f}s, throughput: {(ok + failed) / elapsed * 60 if elapsed else 0:.2f} projects/min", file=sys.stderr)
+
+def _positive_int(value: str) -> int:
+	number = int(value)
+	if number < 1:
+		raise argparse.ArgumentTypeError(f"must be at least 1: {value}")
+	return number
 
 
 if __name__ == "__main__":
-	for project_archive, project_dir in extract_projects(sys.argv[1]):
-		print(project_archive)
-		print(json.dumps(apply_analytics(project_dir), indent=4, ensure_ascii=False))
-		print()
+	parser = argparse.ArgumentParser(description='Static analysis of zipped Python projects.')
+	parser.add_argument('dir_path', help='directory with .zip/.7z project archives')
+	parser.add_argument('--incremental', action='store_true', default=ANALYZER_INCREMENTAL, help='reuse results of the previous analysis of the same archive')
+	parser.add_argument('--batch', metavar='OUTPUT_JSONL', help='analyze archives in a parallel pipeline and append results to a JSONL file (resumable)')
+	parser.add_argument('--workers', type=_positive_int, default=4, help='number of projects analyzed at once in batch mode')
+	parser.add_argument('--ignore', metavar='PATTERN', action='append', default=[], help='skip paths matching a .gitignore-style pattern (repeatable, "!PATTERN" re-includes)')
+	parser.add_argument('--metrics', metavar='PATH_PREFIX', help='collect stage, rule and LLM metrics and write them to PATH_PREFIX.json and PATH_PREFIX.prom (Prometheus textfile)')
+	args = parser.parse_args()
+
+	if args.metrics:
+		metrics.enable()
+	ignore_rules.IGNORE_PATTERNS.extend(args.ignore)
+
+	if args.batch:
+		run_batch(args.dir_path, args.batch, args.workers, args.incremental)
+	else:
+		for project_archive, project_dir in extract_projects(args.dir_path):
+			print(project_archive)
+			project_id = os.path.relpath(project_archive, args.dir_path)
+			print(json.dumps(apply_analytics(project_dir, project_id, args.incremental), indent=4, ensure_ascii=False))
+			print()
+	from llm_cache import llm_cache
+
+	print(f"LLM cache: {json.dumps(llm_cache.stats())}", file=sys.stderr)
+	if llm_stats() is not None:
+		print(f"LLM endpoints: {json.dumps(llm_stats())}", file=sys.stderr)
+	if args.metrics:
+		metrics.metrics.write_json(args.metrics + '.json')
+		metrics.metrics.write_prometheus(args.metrics + '.prom')
+		print(f"Metrics: {args.metrics}.json, {args.metrics}.prom", file=sys.stderr)
@@ -0,0 +1,211 @@
+import os
+import sys
+import time
+import base64
+import hashlib
+import threading
+from dataclasses import dataclass, asdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple
+
+from sqlite_store import SqliteStore, CACHE_DIR
+from import_graph import ImportGraph
+from graph_analytics import analyze_graph
+from metrics import metrics
+
+
+DIAGRAM_CACHE_PATH = os.getenv('DIAGRAM_CACHE_PATH', os.path.join(CACHE_DIR, 'diagrams.sqlite'))
+DIAGRAM_CACHE_MAX_BYTES = int(os.getenv('DIAGRAM_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+# Формат диаграмм: png или svg
+DIAGRAM_FORMAT = os.getenv('DIAGRAM_FORMAT', 'png')
+DIAGRAM_WORKERS = int(os.getenv('DIAGRAM_WORKERS', os.cpu_count() or 1))
+# Графы больше этого количества узлов сворачиваются
+DIAGRAM_MAX_NODES = int(os.getenv('DIAGRAM_MAX_NODES', '150'))
+# Ортогональные ребра (splines=ortho) только для небольших графов: на больших dot работает минутами
+DIAGRAM_ORTHO_MAX_NODES = int(os.getenv('DIAGRAM_ORTHO_MAX_NODES', '40'))
+
+DIAGRAM_MIME_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+
+@dataclass
+class Diagram:
+	# Изображение в base64 (пустая строка, если рендеринг не удался)
+	data: str
+	mime: str
+	seconds: float = 0.0
+	cached: bool = False
+	# Узлы исходного графа и узлы на диаграмме после сворачивания
+	nodes: int = 0
+	rendered_nodes: int = 0
+	# Способ сворачивания: None, 'scc', 'packages:<глубина>' или 'top:<узлов>'
+	condensed: Optional[str] = None
+
+	def stats(self) -> Dict[str, Any]:
+		stats = asdict(self)
+		del stats['data']
+		stats['seconds'] = round(self.seconds, 6)
+		return stats
+
+
+def _graph_edges(graph: ImportGraph) -> Tuple[List[str], Dict[str, Set[str]]]:
+	nodes = [graph.node_name(node) for node in range(graph.node_count)]
+	edges = {name: set(graph.successors(name)) for name in nodes}
+	return nodes, edges
+
+
+def _merge(nodes: List[str], edges: Dict[str, Set[str]], group_of: Dict[str, str]) -> Tuple[List[str], Dict[str, Set[str]]]:
+	"""
+	Сворачивает узлы в группы, ребра внутри группы отбрасываются.
+	"""
+	merged_nodes = list(dict.fromkeys(group_of[node] for node in nodes))
+	merged_edges: Dict[str, Set[str]] = {node: set() for node in merged_nodes}
+	for source, targets in edges.items():
+		for target in targets:
+			if group_of[source] != group_of[target]:
+				merged_edges[group_of[source]].add(group_of[target])
+	return merged_nodes, merged_edges
+
+
+def condense(graph: Mapping, max_nodes: int = DIAGRAM_MAX_NODES) -> Tuple[List[str], Dict[str, Set[str]], Optional[str]]:
+	"""
+	Уменьшает граф до max_nodes узлов для диаграммы.
+
+	Сначала циклы (сильно связные компоненты) сворачиваются в один узел, затем модули
+	сворачиваются в пакеты все меньшей глубины. Если и пакетов верхнего уровня слишком
+	много, на диаграмме остаются max_nodes узлов с наибольшим числом связей.
+	Возвращает (узлы, ребра, способ сворачивания).
+	"""
+	graph = ImportGraph.from_dict(graph)
+	nodes, edges = _graph_edges(graph)
+	if len(nodes) <= max_nodes:
+		return nodes, edges, None
+
+	report = analyze_graph(graph, reachability=False)
+	if report.cycles:
+		group_of = {name: name for name in nodes}
+		for cycle in report.cycle_names():
+			label = f"{cycle[0]} (+{len(cycle) - 1})" if len(cycle) > 1 else cycle[0]
+			for name in cycle:
+				group_of[name] = label
+		nodes, edges = _merge(nodes, edges, group_of)
+		if len(nodes) <= max_nodes:
+			return nodes, edges, 'scc'
+
+	max_depth = max(name.count('.') + 1 for name in nodes)
+	packed_nodes, packed_edges = nodes, edges
+	for depth in range(max_depth - 1, 0, -1):
+		group_of = {name: '.'.join(name.split('.')[:depth]) for name in nodes}
+		packed_nodes, packed_edges = _merge(nodes, edges, group_of)
+		if len(packed_nodes) <= max_nodes:
+			return packed_nodes, packed_edges, f'packages:{depth}'
+	nodes, edges = packed_nodes, packed_edges
+
+	degree = {name: len(edges[name]) for name in nodes}
+	for targets in edges.values():
+		for target in targets:
+			degree[target] += 1
+	kept = set(sorted(nodes, key=lambda name: degree[name], reverse=True)[:max_nodes])
+	nodes = [name for name in nodes if name in kept]
+	edges = {name: edges[name] & kept for name in nodes}
+	return nodes, edges, f'top:{max_nodes}'
+
+
+def diagram_source(nodes: List[str], edges: Dict[str, Set[str]]) -> str:
+	"""
+	Строит описание диаграммы зависимостей на языке DOT.
+	"""
+	from graphviz import Digraph
+
+	dot = Digraph()
+	dot.attr(
+		rankdir='LR',
+		# Ортогональные ребра читаются лучше, но их раскладка на больших графах очень медленная
+		splines='ortho' if len(nodes) <= DIAGRAM_ORTHO_MAX_NODES else 'spline',
+		size="11.7,8.3",
+		ratio="fill"
+	)
+	dot.attr('node', shape='box', style='rounded,filled', fillcolor='#f2f2f2', fontname='Arial', fontsize='8')
+	# Сортировка делает описание, а значит и ключ кэша, независимым от порядка обхода
+	for node in sorted(nodes):
+		dot.node(node)
+	for node in sorted(nodes):
+		for target in sorted(edges[node]):
+			dot.edge(node, target)
+	return dot.source
+
+
+def _render_job(job: Tuple[str, str]) -> Tuple[bytes, float]:
+	from graphviz import Source
+
+	source, fmt = job
+	started = time.perf_counter()
+	image = Source(source).pipe(format=fmt)
+	return image, time.perf_counter() - started
+
+
+_store: Optional[SqliteStore] = None
+_pool: Optional[ProcessPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def _get_store() -> SqliteStore:
+	global _store
+	with _lock:
+		if _store is None:
+			_store = SqliteStore(DIAGRAM_CACHE_PATH, table='diagrams', max_bytes=DIAGRAM_CACHE_MAX_BYTES)
+		return _store
+
+
+def _get_pool() -> ProcessPoolExecutor:
+	global _pool
+	with _lock:
+		if _pool is None:
+			_pool = ProcessPoolExecutor(max_workers=DIAGRAM_WORKERS)
+			metrics.watch_pool('diagrams', _pool)
+		return _pool
+
+
+def render_diagrams(graphs: List[Mapping], fmt: str = DIAGRAM_FORMAT, max_nodes: int = DIAGRAM_MAX_NODES) -> List[Diagram]:
+	"""
+	Рендерит диаграммы зависимостей для списка графов импортов.
+
+	Большие графы предварительно сворачиваются (см. condense). Готовые изображения кэшируются
+	на диске по хэшу DOT-описания и формата, промахи кэша рендерятся параллельно в пуле
+	процессов. Ошибка рендеринга одной диаграммы не прерывает остальные.
+	"""
+	if fmt not in DIAGRAM_MIME_TYPES:
+		raise ValueError(f"Unsupported diagram format: {fmt}")
+	store = _get_store()
+
+	diagrams = []
+	misses = []
+	for graph in graphs:
+		graph = ImportGraph.from_dict(graph)
+		nodes, edges, condensed = condense(graph, max_nodes)
+		diagram = Diagram(data='', mime=DIAGRAM_MIME_TYPES[fmt], nodes=graph.node_count, rendered_nodes=len(nodes), condensed=condensed)
+		source = diagram_source(nodes, edges)
+		key = hashlib.sha256(f'{fmt}\0{source}'.encode('utf-8')).hexdigest()
+		cached = store.get(key)
+		if cached is not None:
+			diagram.data = base64.b64encode(cached).decode('utf-8')
+			diagram.cached = True
+		else:
+			misses.append((diagram, key, (source, fmt)))
+		diagrams.append(diagram)
+
+	if len(misses) > 1 and DIAGRAM_WORKERS > 1:
+		futures = [_get_pool().submit(_render_job, job) for _, _, job in misses]
+	else:
+		futures = None
+
+	for i, (diagram, key, job) in enumerate(misses):
+		try:
+			image, seconds = futures[i].result() if futures else _render_job(job)
+		except Exception as e:
+			print(f"Error rendering diagram: {type(e).__name__}: {e}", file=sys.stderr)
+			continue
+		diagram.data = base64.b64encode(image).decode('utf-8')
+		diagram.seconds = seconds
+		store.set(key, image)
+
+	return diagrams
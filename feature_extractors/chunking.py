@@ -0,0 +1,195 @@
+import os
+import re
+import ast
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from feature_extractors.data_layer import DATA_LAYER_IMPORTS
+
+
+# Максимальный размер фрагмента файла в символах
+CHUNK_MAX_CHARS = int(os.getenv('CHUNK_MAX_CHARS', '6000'))
+# Максимальный размер заголовка модуля (импорты), добавляемого к каждому фрагменту
+CHUNK_HEADER_MAX_CHARS = int(os.getenv('CHUNK_HEADER_MAX_CHARS', '1500'))
+
+# Признаки кода доступа к данным: фрагменты без них не отправляются в LLM.
+# Ищутся вызовы API баз данных, объявления ORM, SQL в строках и импорты библиотек из DATA_LAYER_IMPORTS,
+# а не отдельные слова вроде update или model, которые встречаются в любом коде.
+DATA_ACCESS_RE = re.compile(
+	r'\.(?:execute|executemany|executescript|query|cursor|commit|rollback|begin|'
+	r'fetch(?:one|all|many|row|val)|scalars?|bulk_create|bulk_update|get_or_create|update_or_create|filter_by|'
+	r'find_one|insert_one|insert_many|update_one|update_many|delete_one|delete_many|aggregate|'
+	r'hget|hset|hgetall|lpush|rpush|pipeline)\s*\(|'
+	r'\.objects\.|\.save\(\)|'
+	r'\b(?:create_engine|create_async_engine|sessionmaker|async_sessionmaker|declarative_base|DeclarativeBase|'
+	r'mapped_column|relationship|ForeignKey|Column|__tablename__|models\.Model|transaction\.atomic)\b|'
+	r'\bSELECT\s[^;]{0,500}?\bFROM\s|\bINSERT\s+INTO\s|\bUPDATE\s+\w+\s+SET\s|\bDELETE\s+FROM\s|\bCREATE\s+TABLE\s|'
+	r'^\s*(?:from|import)\s+(?:' + '|'.join(re.escape(prefix) for prefix in sorted(DATA_LAYER_IMPORTS, key=len, reverse=True)) + r')\b',
+	re.MULTILINE,
+)
+
+
+@dataclass
+class Chunk:
+	# Номера строк фрагмента (с 1, включительно)
+	start: int
+	end: int
+	text: str
+
+	def is_relevant(self) -> bool:
+		return DATA_ACCESS_RE.search(self.text) is not None
+
+
+def _node_start(node: ast.AST) -> int:
+	decorators = getattr(node, 'decorator_list', [])
+	return min([node.lineno] + [decorator.lineno for decorator in decorators])
+
+
+def _line_chunks(lines: List[str], start: int, end: int, max_chars: int) -> List[Chunk]:
+	"""
+	Делит строки start..end на фрагменты не больше max_chars (если строка не длиннее).
+	"""
+	chunks = []
+	chunk_start, size = start, 0
+	for line_no in range(start, end + 1):
+		length = len(lines[line_no - 1])
+		if size and size + length > max_chars:
+			chunks.append(Chunk(chunk_start, line_no - 1, ''.join(lines[chunk_start - 1:line_no - 1])))
+			chunk_start, size = line_no, 0
+		size += length
+	if chunk_start <= end:
+		chunks.append(Chunk(chunk_start, end, ''.join(lines[chunk_start - 1:end])))
+	return chunks
+
+
+def _span_chunks(lines: List[str], spans: List[Any], max_chars: int) -> List[Chunk]:
+	"""
+	Объединяет соседние узлы AST (spans - список (начало, конец, дочерние узлы)) во фрагменты.
+	Узлы больше max_chars делятся по дочерним узлам, а если их нет - по строкам.
+	"""
+	chunks: List[Chunk] = []
+	group: Optional[List[int]] = None
+
+	def flush() -> None:
+		if group is not None:
+			chunks.append(Chunk(group[0], group[1], ''.join(lines[group[0] - 1:group[1]])))
+
+	for start, end, children in spans:
+		size = sum(len(line) for line in lines[start - 1:end])
+		if size > max_chars:
+			flush()
+			group = None
+			if children:
+				# Заголовок класса (строки до первого метода) идет отдельным фрагментом
+				first = children[0][0]
+				if first > start:
+					chunks.extend(_line_chunks(lines, start, first - 1, max_chars))
+				chunks.extend(_span_chunks(lines, children, max_chars))
+				last = children[-1][1]
+				if last < end:
+					chunks.extend(_line_chunks(lines, last + 1, end, max_chars))
+			else:
+				chunks.extend(_line_chunks(lines, start, end, max_chars))
+			continue
+		if group is not None and sum(len(line) for line in lines[group[0] - 1:end]) <= max_chars:
+			group[1] = end
+			continue
+		flush()
+		group = [start, end]
+	flush()
+	return chunks
+
+
+def _spans(nodes: List[ast.stmt]) -> List[Any]:
+	spans = []
+	for node in nodes:
+		children = []
+		if isinstance(node, ast.ClassDef):
+			children = _spans([child for child in node.body if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))])
+		# Комментарии и пустые строки между узлами относятся к следующему узлу
+		start = spans[-1][1] + 1 if spans else _node_start(node)
+		spans.append((start, node.end_lineno, children))
+	return spans
+
+
+def chunk_source(source: str, max_chars: int = CHUNK_MAX_CHARS) -> List[Chunk]:
+	"""
+	Делит исходный код модуля на фрагменты по границам классов и функций.
+
+	Соседние небольшие определения объединяются в один фрагмент, большие классы делятся
+	по методам, большие функции - по строкам. Если модуль не разбирается, он делится по строкам.
+	"""
+	lines = source.splitlines(keepends=True)
+	if not lines:
+		return []
+	try:
+		tree = ast.parse(source)
+	except (SyntaxError, ValueError):
+		return _line_chunks(lines, 1, len(lines), max_chars)
+	spans = _spans(tree.body)
+	if not spans:
+		return _line_chunks(lines, 1, len(lines), max_chars)
+	chunks = _span_chunks(lines, spans, max_chars)
+	# Комментарии и строки вне узлов AST (в начале и в конце модуля)
+	if spans[0][0] > 1:
+		chunks = _line_chunks(lines, 1, spans[0][0] - 1, max_chars) + chunks
+	if spans[-1][1] < len(lines):
+		chunks += _line_chunks(lines, spans[-1][1] + 1, len(lines), max_chars)
+	return chunks
+
+
+def module_header(source: str, max_chars: int = CHUNK_HEADER_MAX_CHARS) -> str:
+	"""
+	Возвращает импорты модуля верхнего уровня - контекст для каждого фрагмента.
+	"""
+	try:
+		tree = ast.parse(source)
+	except (SyntaxError, ValueError):
+		return ''
+	lines = source.splitlines(keepends=True)
+	header = ''.join(
+		''.join(lines[node.lineno - 1:node.end_lineno])
+		for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))
+	)
+	return header[:max_chars]
+
+
+def file_chunks(source: str, max_chars: int = CHUNK_MAX_CHARS) -> List[str]:
+	"""
+	Возвращает содержимое файла для анализа: файл целиком, если он помещается в max_chars,
+	иначе - фрагменты с признаками доступа к данным, каждый с импортами модуля и номерами строк.
+	"""
+	if len(source) <= max_chars:
+		return [source]
+	chunks = chunk_source(source, max_chars)
+	relevant = [chunk for chunk in chunks if chunk.is_relevant()] or chunks[:1]
+	header = module_header(source)
+	return [f'{header}\n# ... lines {chunk.start}-{chunk.end}:\n{chunk.text}' for chunk in relevant]
+
+
+def merge_analyses(file_path: str, analyses: List[Dict[str, Any]]) -> Dict[str, Any]:
+	"""
+	Объединяет результаты анализа фрагментов файла в один результат того же формата.
+	"""
+	datasource_types = []
+	patterns = Counter()
+	issues = []
+	seen_issues = set()
+	for analysis in analyses:
+		for datasource_type in analysis.get('datasource_types') or []:
+			if datasource_type not in datasource_types:
+				datasource_types.append(datasource_type)
+		if analysis.get('pattern') and isinstance(analysis['pattern'], str):
+			patterns[analysis['pattern']] += 1
+		for issue in analysis.get('issues') or []:
+			key = (issue.get('description'), issue.get('location'))
+			if key not in seen_issues:
+				seen_issues.add(key)
+				issues.append(issue)
+	return {
+		'file_path': file_path,
+		'datasource_types': datasource_types,
+		'pattern': patterns.most_common(1)[0][0] if patterns else None,
+		'issues': issues,
+	}
@@ -0,0 +1,99 @@
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Mapping
+
+
+# Сигнатуры доступа к данным: префикс импортируемого модуля -> тип источника данных.
+# Модуль, импортирующий такую библиотеку, относится к слою данных без вопроса к LLM.
+DATA_LAYER_IMPORTS: Dict[str, str] = {
+	'sqlalchemy': 'SQL (SQLAlchemy)',
+	'sqlmodel': 'SQL (SQLModel)',
+	'alembic': 'SQL (Alembic)',
+	'django.db': 'SQL (Django ORM)',
+	'peewee': 'SQL (peewee)',
+	'pony.orm': 'SQL (Pony ORM)',
+	'tortoise': 'SQL (Tortoise ORM)',
+	'databases': 'SQL (databases)',
+	'psycopg2': 'PostgreSQL',
+	'psycopg': 'PostgreSQL',
+	'asyncpg': 'PostgreSQL',
+	'aiopg': 'PostgreSQL',
+	'pymysql': 'MySQL',
+	'MySQLdb': 'MySQL',
+	'mysql.connector': 'MySQL',
+	'aiomysql': 'MySQL',
+	'sqlite3': 'SQLite',
+	'aiosqlite': 'SQLite',
+	'cx_Oracle': 'Oracle',
+	'oracledb': 'Oracle',
+	'pyodbc': 'ODBC',
+	'clickhouse_driver': 'ClickHouse',
+	'clickhouse_connect': 'ClickHouse',
+	'pymongo': 'MongoDB',
+	'motor': 'MongoDB',
+	'mongoengine': 'MongoDB',
+	'beanie': 'MongoDB',
+	'redis': 'Redis',
+	'aioredis': 'Redis',
+	'cassandra': 'Cassandra',
+	'neo4j': 'Neo4j',
+	'elasticsearch': 'Elasticsearch',
+	'influxdb_client': 'InfluxDB',
+}
+
+# Части имени модуля, однозначно указывающие на слой данных
+DATA_LAYER_NAMES = {'repository', 'repositories', 'repo', 'repos', 'dao', 'daos', 'crud', 'orm', 'migrations'}
+
+# Части имени модуля, которые могут указывать на слой данных: такие модули уточняются у LLM
+AMBIGUOUS_NAMES = {'models', 'model', 'db', 'database', 'storage', 'store', 'stores', 'persistence', 'dal', 'datasource', 'datasources', 'dataaccess', 'data', 'queries', 'entities', 'tables', 'schemas', 'cache'}
+
+# Дополнительные сигнатуры импортов через запятую, например 'mycompany.db,legacy_orm'
+for _prefix in filter(None, os.getenv('DATA_LAYER_EXTRA_IMPORTS', '').split(',')):
+	DATA_LAYER_IMPORTS.setdefault(_prefix.strip(), 'custom')
+
+
+@dataclass
+class DataLayerDetection:
+	# Модули слоя данных и типы источников, найденные по импортам
+	modules: Dict[str, List[str]] = field(default_factory=dict)
+	# Модули с неоднозначными именами, которые нужно уточнить у LLM
+	ambiguous: List[str] = field(default_factory=list)
+	# Модули без признаков слоя данных: к слою данных не относятся
+	unmatched: List[str] = field(default_factory=list)
+
+
+def import_signature(imported_module: str) -> str:
+	"""
+	Возвращает тип источника данных для импортируемого модуля или пустую строку.
+	"""
+	parts = imported_module.split('.')
+	for i in range(len(parts), 0, -1):
+		datasource = DATA_LAYER_IMPORTS.get('.'.join(parts[:i]))
+		if datasource:
+			return datasource
+	return ''
+
+
+def detect_data_layer(component_imports: Mapping) -> DataLayerDetection:
+	"""
+	Статически классифицирует модули компонента по импортам и именам.
+
+	Модуль относится к слою данных, если импортирует библиотеку из DATA_LAYER_IMPORTS
+	или его имя содержит часть из DATA_LAYER_NAMES. Модули с частями имени из AMBIGUOUS_NAMES
+	(например, models) уточняются у LLM, остальные к слою данных не относятся.
+	"""
+	detection = DataLayerDetection()
+	for module in component_imports:
+		datasources = []
+		for imported_module in component_imports[module]:
+			datasource = import_signature(imported_module)
+			if datasource and datasource not in datasources:
+				datasources.append(datasource)
+		parts = {part.lower() for part in module.split('.')}
+		if datasources or parts & DATA_LAYER_NAMES:
+			detection.modules[module] = datasources
+		elif parts & AMBIGUOUS_NAMES:
+			detection.ambiguous.append(module)
+		else:
+			detection.unmatched.append(module)
+	return detection
@@ -0,0 +1,66 @@
+from collections import Counter
+from typing import Dict, Iterable, List, Set
+
+
+class PathIndex(list):
+	"""
+	Список путей к файлам проекта с предвычисленными индексами для правил.
+
+	Является обычным списком (правила по-прежнему принимают file_paths: List[str]),
+	но дополнительно хранит множество путей, счетчик имен файлов, множество имен каталогов
+	и корзины по расширениям. Проверки по индексу выполняются за O(1) или за проход
+	по уникальным именам, которых намного меньше, чем путей.
+	"""
+
+	def __init__(self, file_paths: Iterable[str] = ()):
+		super().__init__(file_paths)
+		self.paths: Set[str] = set(self)
+		split = [path.rpartition('/') for path in self]
+		self.basenames: Counter = Counter(name for _, _, name in split)
+		# Уникальных каталогов намного меньше, чем файлов
+		dirs = {head for head, _, _ in split if head}
+		self.dir_names: Set[str] = set()
+		for head in dirs:
+			self.dir_names.update(head.split('/'))
+		self.suffixes: Dict[str, List[str]] = {}
+		for path, (_, _, name) in zip(self, split):
+			# Имя из одного расширения ('.puml') тоже попадает в корзину: правила проверяют endswith
+			dot = name.rfind('.')
+			if dot >= 0:
+				self.suffixes.setdefault(name[dot:], []).append(path)
+		self.names: Set[str] = set(self.basenames) | self.dir_names
+		self._memo: Dict[tuple, bool] = {}
+
+	@classmethod
+	def of(cls, file_paths: List[str]) -> 'PathIndex':
+		return file_paths if isinstance(file_paths, PathIndex) else cls(file_paths)
+
+	def has_basename(self, name: str) -> bool:
+		return name in self.basenames
+
+	def has_path(self, path: str) -> bool:
+		return path in self.paths
+
+	def with_suffix(self, suffix: str) -> List[str]:
+		"""
+		Эквивалентно [path for path in file_paths if path.endswith(suffix)] для суффиксов с одной точкой.
+		"""
+		return self.suffixes.get(suffix, [])
+
+	def has_dir_ending_with(self, suffix: str) -> bool:
+		"""
+		Эквивалентно any((suffix + '/') in path for path in file_paths).
+		"""
+		key = ('dir_suffix', suffix)
+		if key not in self._memo:
+			self._memo[key] = any(name.endswith(suffix) for name in self.dir_names)
+		return self._memo[key]
+
+	def any_name_contains(self, substring: str) -> bool:
+		"""
+		Эквивалентно any(substring in path for path in file_paths) для подстрок без '/'.
+		"""
+		key = ('contains', substring)
+		if key not in self._memo:
+			self._memo[key] = any(substring in name for name in self.names)
+		return self._memo[key]
@@ -1,5 +1,8 @@
 import os
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
+from feature_extractors.registry import rule
+from import_graph import ImportGraph
+from graph_analytics import GraphReport, analyze_graph
 
 
 def _get_layer_modules(component_imports: Dict[str, List[str]], root_dir: str) -> Dict[str, str]:
@@ -35,6 +38,20 @@ def _get_layer_modules(component_imports: Dict[str, List[str]], root_dir: str) -
 	return module_layers
 
 
+# Запрещенные зависимости между слоями: модуль доменного слоя не должен зависеть от внешних слоев
+HEXAGONAL_FORBIDDEN_LAYERS = {'domain': {'application', 'adapters', 'config'}}
+COUPLING_TOP = 5
+
+
+def _graph_report(component_imports: Dict[str, List[str]], root_dir: str) -> GraphReport:
+	"""
+	Анализирует граф импортов компонента один раз для всех правил этого модуля.
+	"""
+	graph = ImportGraph.from_dict(component_imports)
+	return graph.memo(('graph_report', root_dir), lambda: analyze_graph(graph, _get_layer_modules(graph, root_dir), HEXAGONAL_FORBIDDEN_LAYERS))
+
+
+@rule('component', inputs=('component_imports', 'component_path'), target='architecture_notes')
 def hexagonal_architecture_comments(component_imports: Dict[str, List[str]], root_dir: str) -> List[str]:
 	"""
 	Проверяет, построен ли проект по принципам гексагональной архитектуры.
@@ -49,18 +66,43 @@ def hexagonal_architecture_comments(component_imports: Dict[str, List[str]], roo
 	- True, если проект соответствует принципам гексагональной архитектуры, иначе False.
 	"""
 
-	module_layers = _get_layer_modules(component_imports, root_dir)
-	# Анализируем зависимости
-	hex_architecture_errors = []
-	is_hexagonal_architecture_threats = 'domain' in module_layers.values() and 'application' in module_layers.values() and 'adapters' in module_layers.values()
-	for module, imports in component_imports.items():
-		module_layer = module_layers.get(module, 'other')
-		for imported_module in imports:
-			imported_layer = module_layers.get(imported_module, 'other')
-			if module_layer == 'domain':
-				if imported_layer in ['application', 'adapters', 'config']:
-					# Модуль доменного слоя зависит от внешнего слоя
-					hex_architecture_errors.append(f"Hexagonal Architecture Violation: domain module '{module}' depends on '{imported_module}' from layer '{imported_layer}'")
-					
+	report = _graph_report(component_imports, root_dir)
+	graph = report.graph
+	layers = set(report.layers)
+	is_hexagonal_architecture_threats = 'domain' in layers and 'application' in layers and 'adapters' in layers
+	# Нарушения найдены при обходе графа по предвычисленному индексу слоев
+	hex_architecture_errors = [
+		f"Hexagonal Architecture Violation: {module_layer} module '{graph.node_name(module)}' depends on '{graph.node_name(imported_module)}' from layer '{imported_layer}'"
+		for module, imported_module, module_layer, imported_layer in report.layer_violations
+	]
 	return hex_architecture_errors if is_hexagonal_architecture_threats else []
 
+
+@rule('component', inputs=('component_imports', 'component_path'), target='architecture_notes')
+def dependency_cycles_comments(component_imports: Dict[str, List[str]], root_dir: str) -> List[str]:
+	"""
+	Находит циклические зависимости между модулями компонента.
+	"""
+	report = _graph_report(component_imports, root_dir)
+	return [f"Cyclic dependency between modules: {', '.join(cycle)}" for cycle in report.cycle_names()]
+
+
+@rule('component', inputs=('component_imports', 'component_path'))
+def coupling_metrics(component_imports: Dict[str, List[str]], root_dir: str) -> Dict[str, Any]:
+	"""
+	Считает метрики связности модулей компонента: fan-in, fan-out, нестабильность, транзитивные зависимости.
+	"""
+	report = _graph_report(component_imports, root_dir)
+	graph = report.graph
+	# Метрики считаем только для модулей компонента, а не для внешних библиотек
+	modules = [graph.node_id(module) for module in graph]
+	top = lambda key: [graph.node_name(node) for node in sorted(modules, key=key, reverse=True)[:COUPLING_TOP] if key(node)]
+	return {
+		'modules': len(modules),
+		'import_edges': graph.edge_count,
+		'cycles': len(report.cycles),
+		'max_transitive_dependencies': max((report.reach_count[node] for node in modules), default=0),
+		'most_depended_on': top(lambda node: report.fan_in[node]),
+		'most_dependencies': top(lambda node: report.fan_out[node]),
+		'most_unstable': top(report.instability),
+	}
@@ -1,4 +1,6 @@
 from typing import Dict, Any, List
+from feature_extractors.registry import rule
+from feature_extractors.path_index import PathIndex
 
 def _get_filename_from_path(path: str) -> str:
 	"""
@@ -6,69 +8,79 @@ def _get_filename_from_path(path: str) -> str:
 	"""
 	return path.split('/')[-1]
 
+@rule('project', inputs=('file_paths',))
 def is_monorepository(file_paths: List[str]) -> bool:
 	"""
 	Проверяет, используется ли монорепозиторий.
 	"""
 	# Проверяем, есть ли несколько проектов в корне репозитория
-	project_dirs = [item for item in file_paths if _get_filename_from_path(item) not in ['.git', '.gitignore', 'README.md']]
-	return len(project_dirs) > 1
+	index = PathIndex.of(file_paths)
+	return len(index) - sum(index.basenames[name] for name in ['.git', '.gitignore', 'README.md']) > 1
 
+@rule('project', inputs=('file_paths',))
 def is_have_gitignore_file(file_paths: List[str]) -> bool:
 	"""
 	Проверяет наличие файла .gitignore в корне проекта.
 	"""
-	return '.gitignore' in [ _get_filename_from_path(item) for item in file_paths ]
+	return PathIndex.of(file_paths).has_basename('.gitignore')
 
+@rule('project', inputs=('file_paths',))
 def is_have_editorconfig_file(file_paths: List[str]) -> bool:
 	"""
 	Проверяет наличие файла .editorconfig в корне проекта.
 	"""
-	return '.editorconfig' in [ _get_filename_from_path(item) for item in file_paths ]
+	return PathIndex.of(file_paths).has_basename('.editorconfig')
 
+@rule('project', inputs=('file_paths',))
 def is_have_gitattributes_file(file_paths: List[str]) -> bool:
 	"""
 	Проверяет наличие файла .gitattributes в корне проекта.
 	"""
-	return '.gitattributes' in [ _get_filename_from_path(item) for item in file_paths ]
+	return PathIndex.of(file_paths).has_basename('.gitattributes')
 
+@rule('project', inputs=('file_paths',))
 def is_have_deployment_files(file_paths: List[str]) -> bool:
 	"""
 	Проверяет наличие файлов для CI/CD в каталоге deployment.
 	"""
-	return any('deployment' in path.split('/') for path in file_paths)
+	index = PathIndex.of(file_paths)
+	return 'deployment' in index.dir_names or index.has_basename('deployment')
 
+@rule('project', inputs=('file_paths',))
 def is_have_docs_directory(file_paths: List[str]) -> bool:
 	"""
 	Проверяет наличие технической документации в каталоге docs.
 	"""
-	docs_files = [path for path in file_paths if 'docs/' in path]
-	return len(docs_files) > 0
+	return PathIndex.of(file_paths).has_dir_ending_with('docs')
 
+@rule('project', inputs=('file_paths',))
 def is_have_plantuml_diagrams(file_paths: List[str]) -> bool:
 	"""
 	Проверяет наличие диаграмм PlantUML в документации.
 	"""
-	docs_files = [path for path in file_paths if 'docs/' in path]
-	for file_name in docs_files:
-		if file_name.endswith('.puml') or file_name.endswith('.plantuml'):
-			return True
-	return False
+	index = PathIndex.of(file_paths)
+	diagrams = index.with_suffix('.puml') + index.with_suffix('.plantuml')
+	return any('docs/' in path for path in diagrams)
 
+@rule('project', inputs=('file_paths',))
 def is_have_source_code_directory(file_paths: List[str]) -> bool:
 	"""
 	Проверяет, что каталог с исходным кодом имеет лаконичное имя.
 	"""
-	source_dirs = ['src/', 'app/', 'backend/']
-	return any(dir_name in path for dir_name in source_dirs for path in file_paths)
+	source_dirs = ['src', 'app', 'backend']
+	index = PathIndex.of(file_paths)
+	return any(index.has_dir_ending_with(dir_name) for dir_name in source_dirs)
 
+@rule('project', inputs=('file_paths',))
 def is_have_formatter_configs(file_paths: List[str]) -> bool:
 	"""
 	Проверяет наличие конфигурационных файлов для yapf и isort.
 	"""
 	configs = ['.style.yapf', 'setup.cfg', 'pyproject.toml', 'tox.ini']
-	return any(config in path for config in configs for path in file_paths)
+	index = PathIndex.of(file_paths)
+	return any(index.any_name_contains(config) for config in configs)
 
+@rule('component', inputs=('component_imports',))
 def is_have_jwt_authorization(component_imports: Dict[str, List[str]]) -> bool:
 	"""
 	Проверяет реализацию авторизации с использованием JWT и PyJWT.
@@ -78,13 +90,15 @@ def is_have_jwt_authorization(component_imports: Dict[str, List[str]]) -> bool:
 			return True
 	return False
 
+@rule('component', inputs=('component_imports', 'file_paths'))
 def is_have_swagger_endpoint(component_imports: Dict[str, List[str]], file_paths: List[str]) -> bool:
 	"""
 	Проверяет наличие использования Swagger в проекте по файлам и импортам.
 	"""
 	# Проверяем наличие файлов, связанных с Swagger
 	swagger_files = ['swagger.yaml', 'swagger.json']
-	if any(file in file_paths for file in swagger_files):
+	index = PathIndex.of(file_paths)
+	if any(index.has_path(file) for file in swagger_files):
 		return True
 
 	# Проверяем наличие импортов, связанных с Swagger и FastAPI
@@ -0,0 +1,79 @@
+import os
+import pkgutil
+import importlib
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+# Входные данные, которые движок правил умеет передавать в правила
+RULE_INPUTS = {
+	'file_paths': 'список путей к файлам проекта',
+	'component_imports': 'граф импортов компонента { модуль: [импорты] }',
+	'component_path': 'путь компонента от корня проекта',
+	'component_fs': 'файловая система компонента (vfs.ProjectFS)',
+	'llm': 'клиент LLM',
+	'component_stats': 'словарь счетчиков компонента, которые правило может увеличивать; суммы попадают в analysis_stats.rule_stats',
+}
+
+# Классы стоимости: дешевые правила выполняются в пуле потоков, LLM-правила - одновременно после них
+RULE_COSTS = ('cheap', 'llm')
+
+
+@dataclass(frozen=True)
+class Rule:
+	name: str
+	func: Callable
+	scope: str  # project | component
+	inputs: Tuple[str, ...]
+	cost: str = 'cheap'
+	target: Optional[str] = None  # ключ, под который кладется результат (по умолчанию - в сам объект)
+
+	def __call__(self, values: Dict[str, object]):
+		return self.func(*[values[name] for name in self.inputs])
+
+
+_RULES: Dict[str, Rule] = {}
+
+
+def rule(scope: str, inputs: Tuple[str, ...], cost: str = 'cheap', target: Optional[str] = None, name: Optional[str] = None) -> Callable[[Callable], Callable]:
+	"""
+	Регистрирует функцию как правило.
+
+	Параметры:
+	- scope: 'project' - правило применяется к проекту, 'component' - к каждому компоненту.
+	- inputs: входные данные правила из RULE_INPUTS в порядке аргументов функции.
+	- cost: класс стоимости из RULE_COSTS.
+	- target: ключ, под который кладется результат (например, 'architecture_notes').
+	- name: имя результата, по умолчанию - имя функции без префикса 'is_'.
+	"""
+	if scope not in ('project', 'component'):
+		raise ValueError(f"Unknown rule scope: {scope}")
+	if cost not in RULE_COSTS:
+		raise ValueError(f"Unknown rule cost: {cost}")
+	if isinstance(inputs, str):
+		raise TypeError(f"Rule inputs must be a tuple of names, not a string: {inputs!r}")
+	unknown = set(inputs) - set(RULE_INPUTS)
+	if unknown:
+		raise ValueError(f"Unknown rule inputs: {unknown}")
+
+	def decorator(func: Callable) -> Callable:
+		rule_name = name or func.__name__.replace('is_', '')
+		_RULES[f'{func.__module__}.{func.__qualname__}'] = Rule(rule_name, func, scope, tuple(inputs), cost, target)
+		return func
+	return decorator
+
+
+@lru_cache(maxsize=None)
+def load_rules(package_path: str = os.path.dirname(__file__)) -> Tuple[Rule, ...]:
+	"""
+	Импортирует все модули пакета и возвращает зарегистрированные правила. Выполняется один раз.
+	"""
+	package_name = os.path.basename(os.path.abspath(package_path))
+	for _, module_name, _ in pkgutil.iter_modules([package_path]):
+		importlib.import_module(f"{package_name}.{module_name}")
+	return tuple(_RULES.values())
+
+
+def rules_by(rules: Tuple[Rule, ...], scope: str, cost: Optional[str] = None) -> List[Rule]:
+	return [r for r in rules if r.scope == scope and (cost is None or r.cost == cost)]
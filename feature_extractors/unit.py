@@ -1,12 +1,33 @@
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Union
 import os
+import time
+import threading
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import ChatOpenAI
 from langchain_core.output_parsers import JsonOutputParser
+from llm_runner import batch_invoke, report_failure
+from vfs import ProjectFS, open_fs
+from feature_extractors.registry import rule
+from feature_extractors.chunking import file_chunks, merge_analyses
+from feature_extractors.data_layer import detect_data_layer
 
 
-def check_data_layer(component_imports: Dict[str, List[str]], base_dir: str, llm: ChatOpenAI) -> Optional[List[str]]:
+# Оценка длительности запроса к LLM для выбора модулей, пока не измерен ни один запрос
+DATA_LAYER_CALL_SECONDS = float(os.getenv('DATA_LAYER_CALL_SECONDS', '10'))
+# Суммарная длительность и количество выполненных запросов выбора модулей - для оценки сэкономленного времени
+_selection_seconds = 0.0
+_selection_calls = 0
+_lock = threading.Lock()
+
+
+def _count(stats: Dict[str, float], key: str, value: float = 1) -> None:
+	stats[key] = stats.get(key, 0) + value
+
+
+@rule('component', inputs=('component_imports', 'component_fs', 'llm', 'component_stats'), cost='llm')
+def check_data_layer(component_imports: Dict[str, List[str]], base_dir: Union[str, ProjectFS], llm: ChatOpenAI, stats: Dict[str, float]) -> Optional[List[str]]:
+	fs = open_fs(base_dir)
 	db_files_pr = ChatPromptTemplate.from_template('''
 Your task is to find modules that are responsible for data access on the code of the service (datalayer). 
 Use the following format (JSON) for the answer:
@@ -22,8 +43,32 @@ There are python project import map (key is a module name, value is a list of im
 Your JSON list:
 	'''.strip()) | llm | JsonOutputParser()
 
-	modules = db_files_pr.invoke({'component_imports': component_imports})
-	files = [os.path.join(base_dir, module.replace('.', '/') + '.py') for module in modules]
+	global _selection_seconds, _selection_calls
+
+	# Модули слоя данных определяются по импортам и именам, LLM уточняет только модули с неоднозначными именами
+	detection = detect_data_layer(component_imports)
+	modules = list(detection.modules)
+	ambiguous = detection.ambiguous
+	_count(stats, 'data_layer_static_modules', len(modules))
+	_count(stats, 'data_layer_unmatched_modules', len(detection.unmatched))
+	if ambiguous:
+		started = time.perf_counter()
+		# Через batch_invoke запрос учитывается в общем лимите одновременных запросов к LLM
+		selected, = batch_invoke(db_files_pr, [{'component_imports': {module: component_imports[module] for module in ambiguous}}])
+		if isinstance(selected, BaseException):
+			raise selected
+		with _lock:
+			_selection_seconds += time.perf_counter() - started
+			_selection_calls += 1
+		modules.extend(module for module in selected if module in ambiguous)
+		_count(stats, 'data_layer_llm_calls')
+		_count(stats, 'data_layer_ambiguous_modules', len(ambiguous))
+	else:
+		with _lock:
+			mean_seconds = _selection_seconds / _selection_calls if _selection_calls else DATA_LAYER_CALL_SECONDS
+		_count(stats, 'data_layer_llm_calls_saved')
+		_count(stats, 'data_layer_seconds_saved', mean_seconds)
+	files = [module.replace('.', '/') + '.py' for module in modules]
 
 	file_analysis_ch = ChatPromptTemplate.from_template('''
 Your task is to analyze the content of the file by the following criteria:
@@ -55,12 +100,21 @@ File content:
 Your JSON answer:
 	'''.strip()) | llm | JsonOutputParser()
 
-	analyses = []
+	# Большие файлы делятся на фрагменты по классам и функциям, фрагменты всех файлов анализируются параллельно
+	inputs = []
 	for file in files:
-		if not os.path.exists(file):
+		if not fs.exists(file):
+			continue
+		file_path = fs.display_path(file)
+		inputs.extend({'file_path': file_path, 'file_content': chunk} for chunk in file_chunks(fs.read_text(file)))
+
+	chunk_analyses: Dict[str, List[Dict]] = {}
+	for file_input, analysis in zip(inputs, batch_invoke(file_analysis_ch, inputs)):
+		if isinstance(analysis, BaseException):
+			report_failure(file_input['file_path'], analysis)
 			continue
-		with open(file, 'r') as f:
-			content = f.read()
-			analysis = file_analysis_ch.invoke({'file_path': file, 'file_content': content[:10000]})
-			analyses.append(analysis)
-	return analyses
+		chunk_analyses.setdefault(file_input['file_path'], []).append(analysis)
+	return [
+		analyses[0] if len(analyses) == 1 else merge_analyses(file_path, analyses)
+		for file_path, analyses in chunk_analyses.items()
+	]
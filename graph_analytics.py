@@ -0,0 +1,129 @@
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, List, Mapping, Optional, Set, Tuple
+
+from import_graph import ImportGraph
+
+
+@dataclass
+class GraphReport:
+	"""
+	Результаты анализа графа импортов. Узлы задаются номерами ImportGraph.
+	"""
+	graph: ImportGraph
+	# Слой каждого узла
+	layers: List[str] = field(default_factory=list)
+	# Сильно связные компоненты из нескольких узлов или с петлей - циклы импортов
+	cycles: List[List[int]] = field(default_factory=list)
+	# Номер SCC для каждого узла; SCC пронумерованы в обратном топологическом порядке
+	scc_of: array = field(default_factory=lambda: array('I'))
+	fan_in: array = field(default_factory=lambda: array('I'))
+	fan_out: array = field(default_factory=lambda: array('I'))
+	# Количество модулей, от которых узел зависит транзитивно (без него самого)
+	reach_count: array = field(default_factory=lambda: array('I'))
+	# Нарушения слоев: (модуль, импортируемый модуль, слой модуля, слой импорта)
+	layer_violations: List[Tuple[int, int, str, str]] = field(default_factory=list)
+
+	def instability(self, node: int) -> float:
+		"""
+		Нестабильность по Мартину: I = Ce / (Ca + Ce).
+		"""
+		total = self.fan_in[node] + self.fan_out[node]
+		return self.fan_out[node] / total if total else 0.0
+
+	def cycle_names(self) -> List[List[str]]:
+		return [[self.graph.node_name(node) for node in cycle] for cycle in self.cycles]
+
+
+def analyze_graph(graph: Mapping, layer_of: Optional[Dict[str, str]] = None, forbidden: Optional[Dict[str, Set[str]]] = None, reachability: bool = True) -> GraphReport:
+	"""
+	Анализирует граф импортов за один проход итеративного алгоритма Тарьяна.
+
+	При обходе ребер считаются fan-in/fan-out и нарушения слоев (layer_of - слой модуля,
+	forbidden - { слой: запрещенные для импорта слои }). Тарьян выдает SCC в обратном
+	топологическом порядке, поэтому к моменту завершения SCC множества достижимости всех
+	ее потомков уже готовы, и достижимость считается объединением битовых множеств (int).
+	Время O(V + E) плюс O(V * E / 64) на операции с битовыми множествами, память под
+	битовые множества - до V^2 / 8 байт в худшем случае (reachability=False отключает их).
+	"""
+	graph = ImportGraph.from_dict(graph)
+	n = graph.node_count
+	layer_of = layer_of or {}
+	forbidden = forbidden or {}
+	# Предвычисленный индекс слоев по номерам узлов
+	layers = [layer_of.get(graph.node_name(node), 'other') for node in range(n)]
+
+	report = GraphReport(graph=graph, layers=layers)
+	fan_in, fan_out = array('I', bytes(4 * n)), array('I', bytes(4 * n))
+	index_of = array('i', [-1]) * n
+	lowlink = array('I', bytes(4 * n))
+	on_stack = bytearray(n)
+	scc_of = array('I', bytes(4 * n))
+	scc_reach: List[int] = []
+	reach_count = array('I', bytes(4 * n))
+	stack: List[int] = []
+	counter = 0
+
+	for root in range(n):
+		if index_of[root] != -1:
+			continue
+		# Итеративный DFS: (узел, его соседи, позиция следующего ребра)
+		work = [(root, graph.successor_ids(root), 0)]
+		index_of[root] = lowlink[root] = counter
+		counter += 1
+		stack.append(root)
+		on_stack[root] = 1
+		while work:
+			node, successors, position = work[-1]
+			if position == 0:
+				fan_out[node] = len(successors)
+				for target in successors:
+					fan_in[target] += 1
+					if layers[target] in forbidden.get(layers[node], ()):
+						report.layer_violations.append((node, target, layers[node], layers[target]))
+			if position < len(successors):
+				work[-1] = (node, successors, position + 1)
+				target = successors[position]
+				if index_of[target] == -1:
+					index_of[target] = lowlink[target] = counter
+					counter += 1
+					stack.append(target)
+					on_stack[target] = 1
+					work.append((target, graph.successor_ids(target), 0))
+				elif on_stack[target]:
+					lowlink[node] = min(lowlink[node], index_of[target])
+				continue
+			work.pop()
+			if work:
+				parent = work[-1][0]
+				lowlink[parent] = min(lowlink[parent], lowlink[node])
+			if lowlink[node] != index_of[node]:
+				continue
+			# node - корень SCC
+			members = []
+			while True:
+				member = stack.pop()
+				on_stack[member] = 0
+				scc_of[member] = len(scc_reach)
+				members.append(member)
+				if member == node:
+					break
+			self_loop = len(members) == 1 and node in successors
+			if len(members) > 1 or self_loop:
+				report.cycles.append(sorted(members))
+			reach = 0
+			if reachability:
+				current = len(scc_reach)
+				for member in members:
+					reach |= 1 << member
+					for target in graph.successor_ids(member):
+						# Все потомки вне текущей SCC уже завершены
+						if scc_of[target] != current:
+							reach |= scc_reach[scc_of[target]]
+				count = bin(reach).count('1') - 1
+				for member in members:
+					reach_count[member] = count
+			scc_reach.append(reach)
+
+	report.scc_of, report.fan_in, report.fan_out, report.reach_count = scc_of, fan_in, fan_out, reach_count
+	return report
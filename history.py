@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Set
+
+from analytics import _raw_analytics, llm_stats
+from project_index import ProjectIndex
+from vfs import GitFS, GitObjects
+
+
+def list_commits(objects: GitObjects, rev_range: str, first_parent: bool = True, max_count: Optional[int] = None, every: int = 1) -> List[Dict[str, Any]]:
+	"""
+	Возвращает коммиты диапазона (например, 'v1.0..main' или 'HEAD') от старых к новым.
+
+	every - брать каждый every-й коммит (последний коммит диапазона берется всегда).
+	"""
+	args = ['log', '--reverse', '--format=%H%x1f%T%x1f%ct%x1f%an%x1f%s']
+	if first_parent:
+		args.append('--first-parent')
+	if max_count:
+		args.append(f'--max-count={max_count}')
+	commits = []
+	for line in objects.git(*args, rev_range, '--').decode('utf-8', errors='replace').splitlines():
+		sha, tree, timestamp, author, subject = line.split('\x1f', 4)
+		commits.append({
+			'commit': sha,
+			'tree': tree,
+			'date': datetime.fromtimestamp(int(timestamp), timezone.utc).isoformat(),
+			'author': author,
+			'subject': subject,
+		})
+	if every > 1:
+		commits = [commit for i, commit in enumerate(commits) if i % every == 0 or i == len(commits) - 1]
+	return commits
+
+
+def commit_metrics(overview: Dict[str, Any], index: ProjectIndex) -> Dict[str, Any]:
+	"""
+	Сводит результаты анализа коммита в плоские метрики для временного ряда.
+	"""
+	components = {}
+	for component in overview['components']:
+		coupling = component.get('coupling_metrics') or {}
+		data_layer = component.get('check_data_layer') or []
+		components[component['path']] = {
+			'modules': coupling.get('modules', 0),
+			'import_edges': coupling.get('import_edges', 0),
+			'cycles': coupling.get('cycles', 0),
+			'max_transitive_dependencies': coupling.get('max_transitive_dependencies', 0),
+			'architecture_notes': sum(len(notes or []) for notes in component.get('architecture_notes', {}).values()),
+			'data_layer_files': len(data_layer),
+			'data_layer_issues': sum(len(analysis.get('issues') or []) for analysis in data_layer),
+		}
+	totals = {key: sum(c[key] for c in components.values()) for key in ('modules', 'import_edges', 'cycles', 'architecture_notes', 'data_layer_files', 'data_layer_issues')}
+	return {
+		'files': len(index.files),
+		'python_files': len(index.python_files_under('')),
+		'size_bytes': sum(index.sizes.values()),
+		'components': len(components),
+		**totals,
+		'max_transitive_dependencies': max((c['max_transitive_dependencies'] for c in components.values()), default=0),
+		'architecture_issues': len(overview.get('architecture_issues') or []),
+		'project_properties': overview.get('project_properties', {}),
+		'per_component': components,
+	}
+
+
+def _completed_commits(output_path: str) -> Set[str]:
+	"""
+	Возвращает коммиты, которые уже успешно проанализированы в предыдущих запусках.
+	"""
+	completed = set()
+	if not os.path.exists(output_path):
+		return completed
+	with open(output_path, 'r') as f:
+		for line in f:
+			try:
+				record = json.loads(line)
+			except json.JSONDecodeError:
+				# Последняя строка могла быть записана не полностью
+				continue
+			if record.get('status') == 'ok':
+				completed.add(record['commit'])
+	return completed
+
+
+def analyze_history(repo: str, rev_range: str, output_path: str, first_parent: bool = True, max_count: Optional[int] = None, every: int = 1, project_id: Optional[str] = None) -> None:
+	"""
+	Анализирует диапазон коммитов локального git-репозитория и дописывает метрики каждого коммита в JSONL.
+
+	Коммиты читаются из объектов git без checkout. Все коммиты анализируются инкрементально
+	с общим манифестом, а импорты кэшируются по хэшу blob-объекта, поэтому неизмененные файлы
+	не читаются и не разбираются повторно, а обзор, графы импортов и LLM-правила неизмененных
+	компонентов переиспользуются (промпты LLM для неизмененных файлов попадают в кэш LLM).
+	Коммит с тем же деревом, что и предыдущий, не анализируется - его метрики копируются.
+	При повторном запуске успешно проанализированные коммиты пропускаются.
+	"""
+	objects = GitObjects(repo)
+	name = os.path.basename(os.path.abspath(repo))
+	project_id = project_id or f'{name}@history'
+	completed = _completed_commits(output_path)
+	commits = [c for c in list_commits(objects, rev_range, first_parent, max_count, every) if c['commit'] not in completed]
+
+	started, ok, failed, same_tree = time.time(), 0, 0, 0
+	previous: Optional[Dict[str, Any]] = None
+	import_totals: Dict[str, int] = {}
+	try:
+		with open(output_path, 'a') as output:
+			for i, commit in enumerate(commits):
+				commit_started = time.time()
+				record = dict(commit)
+				try:
+					if previous is not None and previous['tree'] == commit['tree']:
+						record.update({key: previous[key] for key in previous if key not in commit and key not in ('seconds', 'analysis')})
+						record['same_tree_as'] = previous['commit']
+						same_tree += 1
+					else:
+						index = ProjectIndex.build(GitFS(repo, commit['commit'], name, objects))
+						overview = _raw_analytics(None, project_id, True, index)
+						record.update(commit_metrics(overview, index))
+						record['analysis'] = {
+							'imports': overview['analysis_stats']['imports'],
+							'reused': overview['analysis_stats']['incremental']['reused'],
+							'recomputed': overview['analysis_stats']['incremental']['recomputed'],
+						}
+						for key, value in overview['analysis_stats']['imports'].items():
+							import_totals[key] = import_totals.get(key, 0) + value
+					record['status'] = 'ok'
+					previous = record
+					ok += 1
+				except Exception as e:
+					record.update({'status': 'error', 'error': f"{type(e).__name__}: {e}"})
+					failed += 1
+				record['seconds'] = round(time.time() - commit_started, 3)
+				output.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+				output.flush()
+				print(f"[{i + 1}/{len(commits)}] {record['status']} {commit['commit'][:10]} {commit['subject'][:60]} ({record['seconds']}s)", file=sys.stderr)
+	finally:
+		objects.close()
+
+	elapsed = time.time() - started
+	print(f"Commits: {ok + failed} (ok: {ok}, failed: {failed}, same tree: {same_tree}, skipped as completed: {len(completed)}), imports: {json.dumps(import_totals)}, elapsed: {elapsed:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description='Analyze a range of commits of a local git repository and write a per-commit metrics series.')
+	parser.add_argument('repo', help='path to a local git repository')
+	parser.add_argument('range', nargs='?', default='HEAD', help="revision range, e.g. 'v1.0..main' (default: all history of HEAD)")
+	parser.add_argument('--output', default='history.jsonl', help='JSONL file the per-commit metrics are appended to (resumable)')
+	parser.add_argument('--max-count', type=int, help='analyze only the last N commits of the range')
+	parser.add_argument('--every', type=int, default=1, help='analyze every N-th commit (the last one is always included)')
+	parser.add_argument('--all-parents', action='store_true', help='follow all parents instead of the first-parent line')
+	parser.add_argument('--project-id', help='manifest id shared by the commits (default: <repo name>@history)')
+	args = parser.parse_args()
+
+	try:
+		analyze_history(args.repo, args.range, args.output, not args.all_parents, args.max_count, args.every, args.project_id)
+	except subprocess.CalledProcessError as e:
+		print(f"git failed: {e.stderr.decode('utf-8', errors='replace').strip()}", file=sys.stderr)
+		sys.exit(1)
+	from llm_cache import llm_cache
+
+	print(f"LLM cache: {json.dumps(llm_cache.stats())}", file=sys.stderr)
+	if llm_stats() is not None:
+		print(f"LLM endpoints: {json.dumps(llm_stats())}", file=sys.stderr)
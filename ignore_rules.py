@@ -0,0 +1,181 @@
+import os
+import re
+import posixpath
+from dataclasses import dataclass, asdict
+from typing import List, Dict, Optional, Tuple, Any, Callable
+
+
+# Встроенные правила для каталогов окружений, зависимостей, VCS и сгенерированного кода
+ANALYZER_IGNORE_BUILTIN = os.getenv('ANALYZER_IGNORE_BUILTIN', '1') == '1'
+# Учитывать .gitignore проекта (корневой и вложенные)
+ANALYZER_IGNORE_GITIGNORE = os.getenv('ANALYZER_IGNORE_GITIGNORE', '1') == '1'
+# Пользовательские шаблоны в синтаксисе .gitignore через запятую, например 'docs/,*.ipynb,!vendor/'.
+# Применяются последними, поэтому '!шаблон' возвращает то, что исключили остальные правила.
+# cli.py --ignore дописывает шаблоны в этот список
+IGNORE_PATTERNS = [pattern.strip() for pattern in os.getenv('ANALYZER_IGNORE', '').split(',') if pattern.strip()]
+# Сколько самых больших пропущенных путей показывать в отчете
+IGNORE_REPORT_TOP = int(os.getenv('IGNORE_REPORT_TOP', '20'))
+
+BUILTIN_PATTERNS = {
+	'vcs': ['.git/', '.hg/', '.svn/'],
+	'virtualenv': ['.venv/', 'venv/', '.virtualenv/', 'virtualenv/', '.conda/'],
+	# build, dist и vendor - только в корне проекта: во вложенных каталогах так часто называют пакеты с кодом
+	'vendor': ['site-packages/', 'dist-packages/', 'node_modules/', 'bower_components/', '/vendor/', '.eggs/'],
+	'generated': [
+		'__pycache__/', '*.egg-info/', '/build/', '/dist/', 'htmlcov/',
+		'.tox/', '.nox/', '.mypy_cache/', '.pytest_cache/', '.ruff_cache/',
+		'*.pyc', '*.pyo', '*_pb2.py', '*_pb2_grpc.py', '*.min.js', '*.min.css',
+	],
+}
+# Каталог с этими файлами - виртуальное окружение, как бы он ни назывался
+VIRTUALENV_MARKERS = ('pyvenv.cfg', 'conda-meta')
+
+
+@dataclass
+class IgnoreRule:
+	pattern: str
+	regex: Any
+	# Каталог, относительно которого задан шаблон ('' - корень проекта)
+	base: str
+	negate: bool
+	dir_only: bool
+	reason: str
+
+	def matches(self, rel_path: str, is_dir: bool) -> bool:
+		if self.dir_only and not is_dir:
+			return False
+		if self.base:
+			if not rel_path.startswith(self.base + '/'):
+				return False
+			rel_path = rel_path[len(self.base) + 1:]
+		return self.regex.fullmatch(rel_path) is not None
+
+
+def _translate(pattern: str) -> str:
+	"""
+	Переводит шаблон .gitignore (без '!' и завершающего '/') в регулярное выражение для пути от базового каталога.
+	"""
+	anchored = '/' in pattern
+	pattern = pattern.lstrip('/')
+	regex, i = '', 0
+	while i < len(pattern):
+		if pattern.startswith('**/', i):
+			regex += '(?:.*/)?'
+			i += 3
+		elif pattern.startswith('**', i):
+			regex += '.*'
+			i += 2
+		elif pattern[i] == '*':
+			regex += '[^/]*'
+			i += 1
+		elif pattern[i] == '?':
+			regex += '[^/]'
+			i += 1
+		elif pattern[i] == '[' and ']' in pattern[i + 1:]:
+			end = pattern.index(']', i + 1)
+			body = pattern[i + 1:end]
+			regex += '[' + ('^' + body[1:] if body.startswith('!') else body) + ']'
+			i = end + 1
+		elif pattern[i] == '\\' and i + 1 < len(pattern):
+			regex += re.escape(pattern[i + 1])
+			i += 2
+		else:
+			regex += re.escape(pattern[i])
+			i += 1
+	# Шаблон без '/' в середине совпадает с именем на любой глубине
+	return regex if anchored else '(?:.*/)?' + regex
+
+
+def parse_patterns(lines: List[str], base: str, reason: str) -> List[IgnoreRule]:
+	"""
+	Разбирает строки в синтаксисе .gitignore. base - каталог, относительно которого заданы шаблоны.
+	"""
+	rules = []
+	for line in lines:
+		line = line.rstrip('\n').rstrip()
+		if not line or line.startswith('#'):
+			continue
+		negate = line.startswith('!')
+		if negate or line.startswith('\\!') or line.startswith('\\#'):
+			line = line[1:]
+		dir_only = line.endswith('/')
+		pattern = line.rstrip('/')
+		if not pattern:
+			continue
+		rules.append(IgnoreRule(line, re.compile(_translate(pattern)), base, negate, dir_only, reason))
+	return rules
+
+
+@dataclass
+class SkippedEntry:
+	path: str
+	reason: str
+	is_dir: bool
+	# Для каталогов на диске размер неизвестен: в них не заходим
+	files: Optional[int] = None
+	bytes: Optional[int] = None
+	python_files: Optional[int] = None
+
+
+class IgnoreRules:
+	"""
+	Правила пропуска файлов и каталогов при обходе проекта.
+
+	Порядок правил как в git: встроенные, затем .gitignore от корня к вложенным каталогам,
+	затем пользовательские шаблоны; решает последнее совпавшее правило ('!' - не пропускать).
+	Каталог, ни с одним правилом не совпавший, пропускается как виртуальное окружение,
+	если в нем есть pyvenv.cfg или conda-meta.
+	"""
+
+	def __init__(self, builtin: bool = ANALYZER_IGNORE_BUILTIN, gitignore: bool = ANALYZER_IGNORE_GITIGNORE, patterns: Optional[List[str]] = None):
+		self.builtin = builtin
+		self.gitignore = gitignore
+		self.builtin_rules = [rule for reason, lines in BUILTIN_PATTERNS.items() for rule in parse_patterns(lines, '', reason)] if builtin else []
+		self.user_rules = parse_patterns(IGNORE_PATTERNS if patterns is None else patterns, '', 'user')
+
+	def enter(self, read_text: Callable[[str], str], rel_dir: str, names: List[str], gitignores: Tuple[IgnoreRule, ...]) -> Tuple[IgnoreRule, ...]:
+		"""
+		Возвращает правила .gitignore, действующие внутри каталога rel_dir (с учетом его собственного .gitignore).
+		"""
+		if not self.gitignore or '.gitignore' not in names:
+			return gitignores
+		path = posixpath.join(rel_dir, '.gitignore') if rel_dir else '.gitignore'
+		try:
+			lines = read_text(path).splitlines()
+		except OSError:
+			return gitignores
+		return gitignores + tuple(parse_patterns(lines, rel_dir, path))
+
+	def match(self, rel_path: str, is_dir: bool, gitignores: Tuple[IgnoreRule, ...] = ()) -> Optional[IgnoreRule]:
+		"""
+		Возвращает последнее совпавшее с путем правило или None.
+		"""
+		matched = None
+		for rules in (self.builtin_rules, gitignores, self.user_rules):
+			for rule in rules:
+				if rule.matches(rel_path, is_dir):
+					matched = rule
+		return matched
+
+	def virtualenv(self, names: List[str]) -> bool:
+		return self.builtin and any(marker in names for marker in VIRTUALENV_MARKERS)
+
+
+def summarize(skipped: List[SkippedEntry], top: int = IGNORE_REPORT_TOP) -> Dict[str, Any]:
+	"""
+	Сводка пропущенного для отчета: итоги, количество по причинам и самые большие пути.
+	"""
+	by_reason: Dict[str, int] = {}
+	for entry in skipped:
+		kind = 'gitignore' if entry.reason.endswith('.gitignore') else entry.reason
+		by_reason[kind] = by_reason.get(kind, 0) + 1
+	largest = sorted(skipped, key=lambda entry: (entry.bytes is None, -(entry.bytes or 0)))[:top]
+	return {
+		'dirs': sum(entry.is_dir for entry in skipped),
+		'files': sum(entry.files or 0 for entry in skipped),
+		'bytes': sum(entry.bytes or 0 for entry in skipped),
+		'python_files': sum(entry.python_files or 0 for entry in skipped),
+		'unknown_size_dirs': sum(entry.files is None for entry in skipped),
+		'by_reason': by_reason,
+		'largest': [asdict(entry) for entry in largest],
+	}
@@ -0,0 +1,136 @@
+import os
+import sys
+import ast
+import json
+import hashlib
+import threading
+from dataclasses import dataclass, asdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Tuple, Optional, Callable
+
+from sqlite_store import SqliteStore, CACHE_DIR
+from metrics import metrics
+
+
+IMPORT_CACHE_PATH = os.getenv('IMPORT_CACHE_PATH', os.path.join(CACHE_DIR, 'imports.sqlite'))
+IMPORT_WORKERS = int(os.getenv('IMPORT_WORKERS', os.cpu_count() or 1))
+# Меньше этого количества файлов разбираем в текущем процессе - пул не окупается
+IMPORT_PARALLEL_THRESHOLD = int(os.getenv('IMPORT_PARALLEL_THRESHOLD', '32'))
+# Версия разбора импортов: увеличивается при изменении parse_imports, чтобы не использовать старые результаты из кэша
+IMPORT_EXTRACTOR_VERSION = 1
+# Грамматика ast зависит от версии Python: кэш разных версий не смешивается
+_CACHE_KEY_PREFIX = f'{IMPORT_EXTRACTOR_VERSION}:py{sys.version_info[0]}.{sys.version_info[1]}:'
+
+
+@dataclass
+class ImportStats:
+	parsed: int = 0
+	cached: int = 0
+	failed: int = 0
+
+	def as_dict(self) -> Dict[str, int]:
+		return asdict(self)
+
+
+def parse_imports(source: bytes, filename: str = '<unknown>') -> Tuple[List[str], Optional[str]]:
+	"""
+	Извлекает импорты из исходного кода модуля. Возвращает (импорты, ошибка разбора).
+	"""
+	try:
+		tree = ast.parse(source, filename=filename)
+	except Exception as e:
+		return [], f"{type(e).__name__}: {e}"
+	imports = []
+	for node in ast.walk(tree):
+		if isinstance(node, ast.Import):
+			for alias in node.names:
+				imports.append(alias.name)
+		elif isinstance(node, ast.ImportFrom):
+			if node.module:
+				imports.append(node.module)
+	return imports, None
+
+
+def _parse_job(job: Tuple[str, bytes]) -> Tuple[List[str], Optional[str]]:
+	filename, source = job
+	return parse_imports(source, filename)
+
+
+_store: Optional[SqliteStore] = None
+_pool: Optional[ProcessPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def _get_store() -> SqliteStore:
+	global _store
+	with _lock:
+		if _store is None:
+			_store = SqliteStore(IMPORT_CACHE_PATH, table='imports', max_entries=1_000_000)
+		return _store
+
+
+def _get_pool() -> ProcessPoolExecutor:
+	global _pool
+	with _lock:
+		if _pool is None:
+			_pool = ProcessPoolExecutor(max_workers=IMPORT_WORKERS)
+			metrics.watch_pool('imports', _pool)
+		return _pool
+
+
+def content_key(source: bytes) -> str:
+	return hashlib.sha256(source).hexdigest()
+
+
+def extract_imports(files: List[str], read: Callable[[str], bytes], stats: Optional[ImportStats] = None, content_id: Optional[Callable[[str], Optional[str]]] = None) -> Dict[str, List[str]]:
+	"""
+	Извлекает импорты из списка файлов.
+
+	Результат разбора кэшируется на диске по хэшу содержимого файла (вместе с версией разбора
+	и версией Python), поэтому неизмененные файлы не разбираются повторно ни в других компонентах,
+	ни в следующих запусках.
+	Если content_id возвращает идентификатор содержимого (хэш объекта git), ключом служит он,
+	и файл при попадании в кэш не читается вовсе.
+	Промахи кэша разбираются в пуле процессов. Возвращает { 'путь': ['импорт', ...] }.
+	"""
+	stats = stats if stats is not None else ImportStats()
+	store = _get_store()
+
+	result = {}
+	misses = []
+	for file_path in files:
+		key = content_id(file_path) if content_id is not None else None
+		source = None
+		if key is None:
+			source = read(file_path)
+			key = content_key(source)
+		key = _CACHE_KEY_PREFIX + key
+		cached = store.get(key)
+		if cached is not None:
+			entry = json.loads(cached)
+			result[file_path] = entry['imports']
+			stats.cached += 1
+			if entry['error']:
+				stats.failed += 1
+			continue
+		misses.append((file_path, key, source if source is not None else read(file_path)))
+
+	jobs = [(file_path, source) for file_path, _, source in misses]
+	parallel = len(jobs) >= IMPORT_PARALLEL_THRESHOLD and IMPORT_WORKERS > 1
+	with metrics.span('ast_parse', parallel=parallel):
+		if parallel:
+			chunksize = max(1, len(jobs) // (IMPORT_WORKERS * 4))
+			parsed = list(_get_pool().map(_parse_job, jobs, chunksize=chunksize))
+		else:
+			parsed = [_parse_job(job) for job in jobs]
+
+	for (file_path, key, _), (imports, error) in zip(misses, parsed):
+		if error:
+			print(f"Error parsing file {file_path}: {error}", file=sys.stderr)
+			stats.failed += 1
+		stats.parsed += 1
+		store.set(key, json.dumps({'imports': imports, 'error': error}).encode('utf-8'))
+		result[file_path] = imports
+
+	# Сохраняем порядок входного списка файлов
+	return {file_path: result[file_path] for file_path in files}
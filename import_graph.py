@@ -0,0 +1,181 @@
+import sys
+import threading
+from array import array
+from concurrent.futures import Future
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class ImportGraph(Mapping):
+	"""
+	Компактный неизменяемый граф импортов.
+
+	Имена модулей интернируются (sys.intern) и нумеруются; первыми идут модули-источники
+	(ключи исходного словаря), за ними - только импортируемые модули. Смежность хранится
+	в CSR-виде: offsets[i]:offsets[i + 1] - срез массива targets с номерами соседей узла i.
+	Обратная смежность (предшественники) строится лениво тем же способом.
+
+	Для совместимости граф является Mapping[str, List[str]] с теми же ключами, что и словарь
+	из _build_module_dependencies, а to_dict() возвращает обычный словарь.
+
+	Память: 4 * (N + 1) + 4 * E байт на прямую смежность и столько же на обратную, плюс
+	словарь имя -> номер (около 100 байт на узел); строки имен общие для всех графов
+	и потребителей. Граф на 50 000 модулей и 500 000 ребер вместе с обратной смежностью занимает
+	около 10 МБ, тогда как словарь списков строк из разбора AST - около 45 МБ на каждую копию
+	(в основном дублирующиеся строки, заголовки списков и указатели).
+	"""
+
+	__slots__ = ('_names', '_ids', '_sources', '_offsets', '_targets', '_rev_offsets', '_rev_targets', '_memo', '_memo_lock')
+
+	def __init__(self, names: List[str], sources: int, offsets: array, targets: array):
+		self._names = names
+		self._ids = {name: i for i, name in enumerate(names)}
+		self._sources = sources
+		self._offsets = offsets
+		self._targets = targets
+		self._rev_offsets: Optional[array] = None
+		self._rev_targets: Optional[array] = None
+		self._memo: Dict[Any, Future] = {}
+		self._memo_lock = threading.Lock()
+
+	def __reduce__(self):
+		# Кэш производных данных и блокировка не копируются и не сериализуются
+		return type(self), (self._names, self._sources, self._offsets, self._targets)
+
+	@classmethod
+	def from_edges(cls, sources: Iterable[str], edges: Iterable[Tuple[str, str]]) -> 'ImportGraph':
+		"""
+		Строит граф по списку модулей-источников и ребер (модуль, импортируемый модуль).
+		"""
+		ids: Dict[str, int] = {}
+		names: List[str] = []
+
+		def intern(name: str) -> int:
+			node = ids.get(name)
+			if node is None:
+				node = ids[name] = len(names)
+				names.append(sys.intern(name))
+			return node
+
+		for source in sources:
+			intern(source)
+		n_sources = len(names)
+		adjacency: Dict[int, set] = {}
+		for source, target in edges:
+			adjacency.setdefault(intern(source), set()).add(intern(target))
+
+		offsets, targets = array('I', [0]), array('I')
+		for node in range(len(names)):
+			targets.extend(sorted(adjacency.get(node, ())))
+			offsets.append(len(targets))
+		return cls(names, n_sources, offsets, targets)
+
+	@classmethod
+	def from_dict(cls, graph: Mapping) -> 'ImportGraph':
+		if isinstance(graph, ImportGraph):
+			return graph
+		return cls.from_edges(graph.keys(), ((module, dep) for module, deps in graph.items() for dep in deps))
+
+	# Mapping[str, List[str]]
+
+	def __getitem__(self, module: str) -> List[str]:
+		node = self._ids.get(module)
+		if node is None or node >= self._sources:
+			raise KeyError(module)
+		return self._names_of(self._targets[self._offsets[node]:self._offsets[node + 1]])
+
+	def __iter__(self) -> Iterator[str]:
+		return iter(self._names[:self._sources])
+
+	def __len__(self) -> int:
+		return self._sources
+
+	def __repr__(self) -> str:
+		# Совпадает с представлением словаря: граф подставляется в промпты как есть
+		return repr(self.to_dict())
+
+	def to_dict(self) -> Dict[str, List[str]]:
+		return {module: self[module] for module in self}
+
+	# Доступ по номерам узлов
+
+	def _names_of(self, nodes: Iterable[int]) -> List[str]:
+		return [self._names[node] for node in nodes]
+
+	@property
+	def node_count(self) -> int:
+		return len(self._names)
+
+	@property
+	def edge_count(self) -> int:
+		return len(self._targets)
+
+	def node_id(self, module: str) -> Optional[int]:
+		return self._ids.get(module)
+
+	def node_name(self, node: int) -> str:
+		return self._names[node]
+
+	def successor_ids(self, node: int) -> array:
+		return self._targets[self._offsets[node]:self._offsets[node + 1]]
+
+	def predecessor_ids(self, node: int) -> array:
+		self._build_reverse()
+		return self._rev_targets[self._rev_offsets[node]:self._rev_offsets[node + 1]]
+
+	def successors(self, module: str) -> List[str]:
+		node = self._ids.get(module)
+		return [] if node is None else self._names_of(self.successor_ids(node))
+
+	def predecessors(self, module: str) -> List[str]:
+		node = self._ids.get(module)
+		return [] if node is None else self._names_of(self.predecessor_ids(node))
+
+	def _build_reverse(self) -> None:
+		if self._rev_offsets is not None:
+			return
+		# Сортировка подсчетом по целевому узлу: O(N + E)
+		n = len(self._names)
+		counts = array('I', bytes(4 * (n + 1)))
+		for target in self._targets:
+			counts[target + 1] += 1
+		for i in range(n):
+			counts[i + 1] += counts[i]
+		rev_targets = array('I', bytes(4 * len(self._targets)))
+		fill = array('I', counts)
+		for source in range(n):
+			for target in self._targets[self._offsets[source]:self._offsets[source + 1]]:
+				rev_targets[fill[target]] = source
+				fill[target] += 1
+		self._rev_offsets, self._rev_targets = counts, rev_targets
+
+	def memo(self, key: Any, factory: Callable[[], Any]) -> Any:
+		"""
+		Кэширует производные данные графа (например, результаты анализа), общие для нескольких правил.
+
+		Правила выполняются в пуле потоков: factory вызывает первый поток, остальные ждут его результата.
+		"""
+		with self._memo_lock:
+			future = self._memo.get(key)
+			owner = future is None
+			if owner:
+				future = self._memo[key] = Future()
+		if owner:
+			try:
+				future.set_result(factory())
+			except BaseException as e:
+				# Ошибку получат ожидающие потоки, следующий вызов попробует вычислить заново
+				with self._memo_lock:
+					del self._memo[key]
+				future.set_exception(e)
+		return future.result()
+
+	def memory_footprint(self) -> int:
+		"""
+		Примерный размер графа в байтах без учета самих строк (они интернированы и общие).
+		"""
+		size = sys.getsizeof(self._names) + sys.getsizeof(self._ids)
+		for arr in (self._offsets, self._targets, self._rev_offsets, self._rev_targets):
+			if arr is not None:
+				size += arr.itemsize * len(arr)
+		return size
@@ -0,0 +1,112 @@
+import os
+import copy
+import json
+import hashlib
+import threading
+from collections.abc import Mapping
+from typing import Optional, Dict, Any, List, Callable
+
+from sqlite_store import SqliteStore, CACHE_DIR
+
+
+MANIFEST_PATH = os.getenv('MANIFEST_PATH', os.path.join(CACHE_DIR, 'manifests.sqlite'))
+MANIFEST_VERSION = 1
+# Включает инкрементальный анализ по умолчанию
+ANALYZER_INCREMENTAL = os.getenv('ANALYZER_INCREMENTAL', '0') == '1'
+
+
+_store: Optional[SqliteStore] = None
+_lock = threading.Lock()
+
+
+def _get_store() -> SqliteStore:
+	global _store
+	with _lock:
+		if _store is None:
+			_store = SqliteStore(MANIFEST_PATH, table='manifests')
+		return _store
+
+
+def _sha256(data: bytes) -> str:
+	return hashlib.sha256(data).hexdigest()
+
+
+class IncrementalRun:
+	"""
+	Инкрементальный анализ проекта, который уже анализировался ранее.
+
+	Манифест проекта хранит хэши .py файлов, ответ LLM об обзоре проекта, список компонентов,
+	графы импортов компонентов и результаты правил. Обзор переиспользуется, если не изменились
+	дерево файлов и README. Граф импортов и результаты LLM-правил компонента переиспользуются,
+	если не изменились его .py файлы; дешевые статические правила пересчитываются всегда,
+	так как зависят от всего дерева проекта.
+	"""
+
+	def __init__(self, project_id: str, file_tree: str, readmes: str, file_hashes: Dict[str, str]):
+		self.project_id = project_id
+		self.file_hashes = file_hashes
+		self.overview_digest = _sha256((file_tree + '\0' + readmes).encode('utf-8'))
+		self.previous = self._load()
+		self.manifest = {
+			'version': MANIFEST_VERSION,
+			'overview_digest': self.overview_digest,
+			'overview': None,
+			'file_hashes': file_hashes,
+			'components': {},
+		}
+		self.reused = []
+		self.recomputed = []
+
+	def _load(self) -> Dict[str, Any]:
+		value = _get_store().get(self.project_id)
+		if value is None:
+			return {}
+		manifest = json.loads(value)
+		return manifest if manifest.get('version') == MANIFEST_VERSION else {}
+
+	def save(self) -> None:
+		_get_store().set(self.project_id, json.dumps(self.manifest, ensure_ascii=False, default=_json_default).encode('utf-8'))
+
+	def overview(self, compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+		"""
+		Возвращает ответ LLM об обзоре проекта - из манифеста или вычисленный заново.
+		"""
+		if self.previous.get('overview_digest') == self.overview_digest and self.previous.get('overview') is not None:
+			answer = self.previous['overview']
+			self.reused.append('overview')
+		else:
+			answer = compute()
+			self.recomputed.append('overview')
+		self.manifest['overview'] = answer
+		return copy.deepcopy(answer)
+
+	def component_digest(self, component_path: str, files: List[str]) -> str:
+		return _sha256(json.dumps([component_path] + [[f, self.file_hashes.get(f)] for f in sorted(files)]).encode('utf-8'))
+
+	def cached_component(self, component_path: str, files: List[str]) -> Optional[Dict[str, Any]]:
+		"""
+		Возвращает сохраненные результаты компонента, если его файлы не изменились.
+		"""
+		cached = self.previous.get('components', {}).get(component_path)
+		if cached and cached['digest'] == self.component_digest(component_path, files):
+			return cached
+		return None
+
+	def record_component(self, component_path: str, files: List[str], import_graph: Dict[str, List[str]], rules: Dict[str, Any], reused: bool) -> None:
+		self.manifest['components'][component_path] = {
+			'digest': self.component_digest(component_path, files),
+			'import_graph': import_graph,
+			'rules': rules,
+		}
+		(self.reused if reused else self.recomputed).append(component_path)
+
+	def summary(self) -> Dict[str, List[str]]:
+		return {'reused': list(self.reused), 'recomputed': list(self.recomputed)}
+
+
+def _json_default(value: Any) -> Any:
+	if isinstance(value, set):
+		return sorted(value)
+	if isinstance(value, Mapping):
+		return dict(value)
+	raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
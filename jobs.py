@@ -0,0 +1,93 @@
+import time
+import threading
+import traceback
+from uuid import uuid4
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Any
+
+
+@dataclass
+class Job:
+	id: str
+	name: str
+	status: str = 'queued'  # queued | running | done | failed
+	stage: Optional[str] = None
+	stages_done: List[str] = field(default_factory=list)
+	submitted_at: float = field(default_factory=time.time)
+	started_at: Optional[float] = None
+	finished_at: Optional[float] = None
+	result: Any = None
+	error: Optional[str] = None
+	# Частично готовый отчет и время его первого появления
+	content: Optional[str] = None
+	content_at: Optional[float] = None
+
+	def progress(self, stage: str) -> None:
+		"""
+		Колбэк для apply_analytics: отмечает начало очередной стадии анализа.
+		"""
+		if self.stage is not None:
+			self.stages_done.append(self.stage)
+		self.stage = stage
+
+	def update_content(self, content: str) -> None:
+		"""
+		Колбэк для apply_analytics_streaming: сохраняет частично отрендеренный отчет.
+		"""
+		if self.content_at is None:
+			self.content_at = time.time()
+		self.content = content
+
+
+class JobManager:
+	"""
+	Выполняет анализы в фоновом пуле потоков.
+
+	Задания идентифицируются по ID и живут в менеджере дольше, чем скрипт Streamlit,
+	поэтому результат переживает перезапуски скрипта и обновление страницы.
+	"""
+
+	def __init__(self, max_workers: int = 4, ttl: float = 24 * 3600):
+		self.ttl = ttl
+		self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analysis-job')
+		self._jobs: Dict[str, Job] = {}
+		self._lock = threading.Lock()
+
+	def submit(self, name: str, func: Callable[[Callable[[str], None], Callable[[str], None]], Any], job_id: Optional[str] = None) -> str:
+		"""
+		Ставит в очередь func(progress, update_content) и возвращает ID задания.
+		"""
+		job = Job(id=job_id or uuid4().hex, name=name)
+		with self._lock:
+			self._forget_expired()
+			self._jobs[job.id] = job
+		self._executor.submit(self._run, job, func)
+		return job.id
+
+	def _run(self, job: Job, func: Callable[[Callable[[str], None], Callable[[str], None]], Any]) -> None:
+		job.status, job.started_at = 'running', time.time()
+		try:
+			job.result = func(job.progress, job.update_content)
+			if job.stage is not None:
+				job.stages_done.append(job.stage)
+			job.stage, job.status = None, 'done'
+		except Exception as e:
+			traceback.print_exc()
+			job.error, job.status = f"{type(e).__name__}: {e}", 'failed'
+		finally:
+			job.finished_at = time.time()
+
+	def get(self, job_id: str) -> Optional[Job]:
+		with self._lock:
+			return self._jobs.get(job_id)
+
+	def jobs(self) -> List[Job]:
+		with self._lock:
+			return list(self._jobs.values())
+
+	def _forget_expired(self) -> None:
+		now = time.time()
+		for job_id, job in list(self._jobs.items()):
+			if job.finished_at is not None and now - job.finished_at > self.ttl:
+				del self._jobs[job_id]
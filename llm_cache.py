@@ -0,0 +1,66 @@
+import os
+import json
+import hashlib
+import threading
+from typing import Optional, Dict, Any, Sequence
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import Generation
+
+from sqlite_store import SqliteStore, CACHE_DIR
+
+
+# on - читать и писать кэш, refresh - только писать (обход чтения), off - не использовать кэш
+LLM_CACHE_MODE = os.getenv('LLM_CACHE_MODE', 'on')
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', os.path.join(CACHE_DIR, 'llm.sqlite'))
+LLM_CACHE_MAX_AGE = float(os.getenv('LLM_CACHE_MAX_AGE', 30 * 24 * 3600))
+LLM_CACHE_MAX_BYTES = int(os.getenv('LLM_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+
+class LLMCache(BaseCache):
+	"""
+	Персистентный кэш ответов LLM, общий для всех цепочек `prompt | llm | parser`.
+
+	LangChain передает в кэш отрендеренный промпт (шаблон + входные данные) и строку
+	параметров модели (имя модели, температура и т.д.), ключом записи является хэш от них.
+	"""
+
+	def __init__(self, path: str = LLM_CACHE_PATH, mode: str = LLM_CACHE_MODE, max_age: Optional[float] = LLM_CACHE_MAX_AGE, max_bytes: Optional[int] = LLM_CACHE_MAX_BYTES, max_entries: Optional[int] = None):
+		self.mode = mode
+		self.store = SqliteStore(path, table='llm_cache', max_entries=max_entries, max_bytes=max_bytes, max_age=max_age)
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+		self.writes = 0
+
+	@staticmethod
+	def _key(prompt: str, llm_string: str) -> str:
+		return hashlib.sha256((llm_string + '\0' + prompt).encode('utf-8')).hexdigest()
+
+	def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+		if self.mode != 'on':
+			return None
+		value = self.store.get(self._key(prompt, llm_string))
+		with self._lock:
+			if value is None:
+				self.misses += 1
+				return None
+			self.hits += 1
+		return [loads(g) for g in json.loads(value)]
+
+	def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+		if self.mode == 'off':
+			return
+		value = json.dumps([dumps(g) for g in return_val]).encode('utf-8')
+		self.store.set(self._key(prompt, llm_string), value)
+		with self._lock:
+			self.writes += 1
+
+	def clear(self, **kwargs: Any) -> None:
+		self.store.clear()
+
+	def stats(self) -> Dict[str, Any]:
+		return {'mode': self.mode, 'hits': self.hits, 'misses': self.misses, 'writes': self.writes, **self.store.stats()}
+
+
+llm_cache = LLMCache()
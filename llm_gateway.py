@@ -0,0 +1,367 @@
+import os
+import copy
+import json
+import math
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import openai
+from pydantic import PrivateAttr
+from langchain_core.load import dumps
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatResult
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_openai import ChatOpenAI
+
+from metrics import metrics
+
+
+# Ограничения эндпоинта по умолчанию: запросов в минуту (0 - без ограничения) и одновременных запросов
+LLM_ENDPOINT_RPM = int(os.getenv('LLM_ENDPOINT_RPM', '0'))
+LLM_ENDPOINT_CONCURRENCY = int(os.getenv('LLM_ENDPOINT_CONCURRENCY', '8'))
+# Количество попыток запроса (на любых эндпоинтах), не меньше одной
+LLM_GATEWAY_ATTEMPTS = max(1, int(os.getenv('LLM_GATEWAY_ATTEMPTS', '4')))
+# Начальная и максимальная пауза эндпоинта после ошибки в секундах, пауза растет экспоненциально
+LLM_GATEWAY_BACKOFF = float(os.getenv('LLM_GATEWAY_BACKOFF', '1'))
+LLM_GATEWAY_MAX_BACKOFF = float(os.getenv('LLM_GATEWAY_MAX_BACKOFF', '60'))
+
+# Ошибки эндпоинта, после которых запрос повторяется, возможно, на другом эндпоинте
+RETRIABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+# Оценка задержки эндпоинта до первого ответа и вес нового измерения в скользящем среднем
+_INITIAL_LATENCY = 1.0
+_LATENCY_ALPHA = 0.3
+
+
+@dataclass
+class Endpoint:
+	url: str
+	rpm: int = LLM_ENDPOINT_RPM
+	concurrency: int = LLM_ENDPOINT_CONCURRENCY
+	client: Any = None
+	in_flight: int = 0
+	# Скользящее среднее задержки успешных ответов в секундах
+	latency: float = _INITIAL_LATENCY
+	# Ошибки подряд: определяют длительность паузы
+	failures: int = 0
+	# Момент (time.monotonic), до которого эндпоинт на паузе после ошибки
+	available_at: float = 0.0
+	requests: int = 0
+	errors: int = 0
+	rate_limited: int = 0
+	# Время отправки запросов за последнюю минуту (для rpm)
+	sent: deque = field(default_factory=deque)
+
+	def wait_time(self, now: float) -> float:
+		"""
+		Возвращает 0, если запрос можно отправить сейчас, иначе примерное время ожидания в секундах
+		(math.inf, если все места заняты - эндпоинт освободится по завершении запроса).
+		"""
+		if self.in_flight >= self.concurrency:
+			return math.inf
+		wait = max(0.0, self.available_at - now)
+		if self.rpm:
+			while self.sent and now - self.sent[0] >= 60:
+				self.sent.popleft()
+			if len(self.sent) >= self.rpm:
+				wait = max(wait, 60 - (now - self.sent[0]))
+		return wait
+
+	def score(self) -> float:
+		# Ожидаемое время ответа с учетом уже выполняющихся запросов
+		return (self.in_flight + 1) * self.latency
+
+	def stats(self) -> Dict[str, Any]:
+		return {
+			'url': self.url,
+			'requests': self.requests,
+			'errors': self.errors,
+			'rate_limited': self.rate_limited,
+			'in_flight': self.in_flight,
+			'latency_seconds': round(self.latency, 3),
+		}
+
+
+def parse_endpoints(spec: str) -> List[Endpoint]:
+	"""
+	Разбирает список эндпоинтов через запятую: URL[|rpm=N][|concurrency=N], например
+	'http://gpu1:8000/v1|rpm=120,http://gpu2:8000/v1|concurrency=4'.
+	"""
+	endpoints = []
+	for item in filter(None, (part.strip() for part in spec.split(','))):
+		url, *options = item.split('|')
+		endpoint = Endpoint(url.strip())
+		for option in options:
+			name, _, value = option.partition('=')
+			if name.strip() not in ('rpm', 'concurrency'):
+				raise ValueError(f"Unknown LLM endpoint option: {option}")
+			setattr(endpoint, name.strip(), int(value))
+		endpoints.append(endpoint)
+	if not endpoints:
+		raise ValueError("No LLM endpoints configured")
+	return endpoints
+
+
+def _retry_after(error: BaseException) -> float:
+	response = getattr(error, 'response', None)
+	value = response.headers.get('retry-after') if response is not None else None
+	try:
+		return float(value) if value else 0.0
+	except ValueError:
+		return 0.0
+
+
+def _wake(waiter: asyncio.Future) -> None:
+	if not waiter.done():
+		waiter.set_result(None)
+
+
+def _zero_usage(usage: Any) -> Any:
+	if isinstance(usage, dict):
+		return {key: _zero_usage(value) for key, value in usage.items()}
+	return 0 if isinstance(usage, (int, float)) else usage
+
+
+def _follower_result(result: ChatResult) -> ChatResult:
+	"""
+	Копия ответа лидера для присоединившегося запроса. LangChain дописывает метаданные в ответ,
+	поэтому каждый получает свою копию; токены потрачены один раз, и расход в копии обнулен,
+	чтобы не учитываться в суммах токенов повторно.
+	"""
+	result = copy.deepcopy(result)
+	if result.llm_output and 'token_usage' in result.llm_output:
+		result.llm_output['token_usage'] = _zero_usage(result.llm_output['token_usage'])
+	for generation in result.generations:
+		message = getattr(generation, 'message', None)
+		if message is None:
+			continue
+		if 'token_usage' in message.response_metadata:
+			message.response_metadata['token_usage'] = _zero_usage(message.response_metadata['token_usage'])
+		if getattr(message, 'usage_metadata', None):
+			message.usage_metadata = _zero_usage(message.usage_metadata)
+	return result
+
+
+class LLMGateway(BaseChatModel):
+	"""
+	Модель LangChain, распределяющая запросы по нескольким OpenAI-совместимым эндпоинтам.
+
+	Запрос уходит на свободный эндпоинт с наименьшим ожидаемым временем ответа (задержка
+	с учетом выполняющихся запросов). Для каждого эндпоинта соблюдаются лимиты запросов
+	в минуту и одновременных запросов; после 429, ошибок соединения и 5xx эндпоинт уходит
+	на паузу (Retry-After или экспоненциальная), а запрос повторяется на другом. Если свободных
+	эндпоинтов нет, запрос ждет завершения другого запроса или конца паузы, не опрашивая
+	эндпоинты. Одинаковые запросы, выполняющиеся одновременно, объединяются в один.
+
+	В ключ кэша LLM попадают только параметры модели, а не адреса эндпоинтов.
+	"""
+
+	model_name: str
+	temperature: float = 0
+	max_tokens: Optional[int] = None
+
+	_endpoints: List[Endpoint] = PrivateAttr(default_factory=list)
+	_lock: Any = PrivateAttr(default_factory=threading.Lock)
+	# Синхронные запросы ждут свободный эндпоинт на условии, асинхронные - на future своего цикла событий
+	_available: Any = PrivateAttr(default=None)
+	_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = PrivateAttr(default_factory=list)
+	_pending: Dict[str, Future] = PrivateAttr(default_factory=dict)
+	_coalesced: int = PrivateAttr(default=0)
+
+	def __init__(self, endpoints: List[Endpoint], api_key: Optional[str], model: str, temperature: float = 0, max_tokens: Optional[int] = None, request_timeout: float = 120, **kwargs: Any):
+		super().__init__(model_name=model, temperature=temperature, max_tokens=max_tokens, **kwargs)
+		for endpoint in endpoints:
+			# Повторы выполняет шлюз, чтобы повторный запрос мог уйти на другой эндпоинт
+			endpoint.client = ChatOpenAI(
+				openai_api_key=api_key,
+				model=model,
+				temperature=temperature,
+				openai_api_base=endpoint.url,
+				max_retries=0,
+				request_timeout=request_timeout,
+				max_tokens=max_tokens,
+			)
+		self._endpoints = endpoints
+		self._available = threading.Condition(self._lock)
+
+	@property
+	def _llm_type(self) -> str:
+		return 'llm-gateway'
+
+	@property
+	def _identifying_params(self) -> Dict[str, Any]:
+		return {'model_name': self.model_name, 'temperature': self.temperature, 'max_tokens': self.max_tokens}
+
+	def _try_acquire(self) -> Tuple[Optional[Endpoint], float]:
+		"""
+		Занимает свободный эндпоинт. Вызывается под self._lock. Возвращает (эндпоинт или None,
+		время до освобождения эндпоинта по паузе или rpm, math.inf - до завершения запроса).
+		"""
+		now = time.monotonic()
+		waits = [(endpoint.wait_time(now), endpoint) for endpoint in self._endpoints]
+		free = [endpoint for wait, endpoint in waits if wait == 0]
+		if not free:
+			return None, min(wait for wait, _ in waits)
+		endpoint = min(free, key=Endpoint.score)
+		endpoint.in_flight += 1
+		endpoint.requests += 1
+		if endpoint.rpm:
+			endpoint.sent.append(now)
+		return endpoint, 0.0
+
+	def _acquire(self) -> Endpoint:
+		with self._available:
+			while True:
+				endpoint, wait = self._try_acquire()
+				if endpoint is not None:
+					return endpoint
+				self._available.wait(None if wait == math.inf else wait)
+
+	async def _aacquire(self) -> Endpoint:
+		loop = asyncio.get_running_loop()
+		while True:
+			waiter = loop.create_future()
+			# Ожидание регистрируется под той же блокировкой, что и проверка: освобождение не потеряется
+			with self._lock:
+				endpoint, wait = self._try_acquire()
+				if endpoint is not None:
+					return endpoint
+				self._waiters.append((loop, waiter))
+			try:
+				await asyncio.wait_for(waiter, None if wait == math.inf else wait)
+			except asyncio.TimeoutError:
+				pass
+			finally:
+				with self._lock:
+					if (loop, waiter) in self._waiters:
+						self._waiters.remove((loop, waiter))
+
+	def _release(self, endpoint: Endpoint, seconds: Optional[float], error: Optional[BaseException] = None) -> None:
+		"""
+		Освобождает место на эндпоинте и учитывает результат вызова. seconds=None - вызов прерван
+		(отмена задачи, KeyboardInterrupt): это ничего не говорит об эндпоинте, место только освобождается.
+		"""
+		with self._lock:
+			endpoint.in_flight -= 1
+			if seconds is None:
+				pass
+			elif error is None:
+				endpoint.failures = 0
+				endpoint.latency += _LATENCY_ALPHA * (seconds - endpoint.latency)
+			else:
+				endpoint.errors += 1
+				if isinstance(error, RETRIABLE_ERRORS):
+					endpoint.failures += 1
+					backoff = min(LLM_GATEWAY_MAX_BACKOFF, LLM_GATEWAY_BACKOFF * 2 ** (endpoint.failures - 1)) * random.uniform(0.5, 1)
+					endpoint.available_at = time.monotonic() + max(backoff, _retry_after(error))
+				if isinstance(error, openai.RateLimitError):
+					endpoint.rate_limited += 1
+			self._available.notify_all()
+			waiters, self._waiters = self._waiters, []
+		for loop, waiter in waiters:
+			loop.call_soon_threadsafe(_wake, waiter)
+		if seconds is None:
+			return
+		if error is None:
+			metrics.observe('llm_endpoint_call', seconds, endpoint=endpoint.url)
+		else:
+			metrics.inc('llm_endpoint_errors', endpoint=endpoint.url, error=type(error).__name__)
+
+	def _should_retry(self, error: BaseException, attempt: int) -> bool:
+		return isinstance(error, RETRIABLE_ERRORS) and attempt < LLM_GATEWAY_ATTEMPTS - 1
+
+	def _call(self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: Dict[str, Any]) -> ChatResult:
+		for attempt in range(LLM_GATEWAY_ATTEMPTS):
+			endpoint = self._acquire()
+			started = time.perf_counter()
+			seconds: Optional[float] = None
+			error: Optional[Exception] = None
+			try:
+				result = endpoint.client._generate(messages, stop=stop, **kwargs)
+				seconds = time.perf_counter() - started
+			except Exception as e:
+				seconds, error = time.perf_counter() - started, e
+			finally:
+				self._release(endpoint, seconds, error)
+			if error is None:
+				return result
+			if not self._should_retry(error, attempt):
+				raise error
+			metrics.inc('llm_retries')
+
+	async def _acall(self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: Dict[str, Any]) -> ChatResult:
+		for attempt in range(LLM_GATEWAY_ATTEMPTS):
+			endpoint = await self._aacquire()
+			started = time.perf_counter()
+			seconds: Optional[float] = None
+			error: Optional[Exception] = None
+			try:
+				result = await endpoint.client._agenerate(messages, stop=stop, **kwargs)
+				seconds = time.perf_counter() - started
+			except Exception as e:
+				seconds, error = time.perf_counter() - started, e
+			finally:
+				self._release(endpoint, seconds, error)
+			if error is None:
+				return result
+			if not self._should_retry(error, attempt):
+				raise error
+			metrics.inc('llm_retries')
+
+	def _join(self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: Dict[str, Any]) -> Tuple[str, Future, bool]:
+		"""
+		Находит выполняющийся такой же запрос. Возвращает (ключ, future, True - запрос нужно выполнить).
+		"""
+		key = hashlib.sha256(json.dumps([dumps(messages), stop, kwargs], sort_keys=True, default=str).encode('utf-8')).hexdigest()
+		with self._lock:
+			future = self._pending.get(key)
+			if future is not None:
+				self._coalesced += 1
+				metrics.inc('llm_coalesced')
+				return key, future, False
+			future = self._pending[key] = Future()
+			return key, future, True
+
+	def _settle(self, key: str, future: Future, result: Optional[ChatResult] = None, error: Optional[BaseException] = None) -> None:
+		with self._lock:
+			del self._pending[key]
+		if error is not None:
+			future.set_exception(error)
+		else:
+			future.set_result(result)
+
+	def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+		key, future, leader = self._join(messages, stop, kwargs)
+		if not leader:
+			return _follower_result(future.result())
+		try:
+			result = self._call(messages, stop, kwargs)
+		except BaseException as e:
+			self._settle(key, future, error=e)
+			raise
+		# Ответ лидера LangChain изменит после возврата, ожидающие копируют нетронутый снимок
+		self._settle(key, future, copy.deepcopy(result))
+		return result
+
+	async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+		key, future, leader = self._join(messages, stop, kwargs)
+		if not leader:
+			return _follower_result(await asyncio.wrap_future(future))
+		try:
+			result = await self._acall(messages, stop, kwargs)
+		except BaseException as e:
+			self._settle(key, future, error=e)
+			raise
+		self._settle(key, future, copy.deepcopy(result))
+		return result
+
+	def stats(self) -> Dict[str, Any]:
+		with self._lock:
+			return {'coalesced': self._coalesced, 'endpoints': [endpoint.stats() for endpoint in self._endpoints]}
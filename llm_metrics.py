@@ -0,0 +1,60 @@
+import time
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from metrics import Metrics, metrics
+
+
+# Колбэки LangChain вынесены из metrics.py, чтобы сбор метрик не требовал импорта LangChain
+class MetricsCallbackHandler(BaseCallbackHandler):
+	"""
+	Собирает метрики вызовов LLM: задержку, токены промпта и ответа, повторы и ошибки.
+	"""
+
+	def __init__(self, metrics: Metrics):
+		self.metrics = metrics
+		self._started: Dict[Any, Tuple[float, str]] = {}
+		self._lock = threading.Lock()
+
+	def _start(self, serialized: Optional[Dict[str, Any]], run_id: Any, kwargs: Dict[str, Any]) -> None:
+		if not self.metrics.enabled:
+			return
+		params = kwargs.get('invocation_params') or {}
+		model = params.get('model_name') or params.get('model') or (serialized or {}).get('name', 'llm')
+		with self._lock:
+			self._started[run_id] = (time.perf_counter(), model)
+
+	def on_llm_start(self, serialized, prompts, *, run_id, **kwargs) -> None:
+		self._start(serialized, run_id, kwargs)
+
+	def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+		self._start(serialized, run_id, kwargs)
+
+	def _finish(self, run_id: Any) -> Optional[str]:
+		with self._lock:
+			started = self._started.pop(run_id, None)
+		if started is None:
+			return None
+		self.metrics.observe('llm_call', time.perf_counter() - started[0], model=started[1])
+		return started[1]
+
+	def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+		model = self._finish(run_id)
+		if model is None:
+			return
+		usage = (response.llm_output or {}).get('token_usage') or {}
+		self.metrics.inc('llm_prompt_tokens', usage.get('prompt_tokens', 0), model=model)
+		self.metrics.inc('llm_completion_tokens', usage.get('completion_tokens', 0), model=model)
+
+	def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+		model = self._finish(run_id)
+		if model is not None:
+			self.metrics.inc('llm_errors', model=model)
+
+	def on_retry(self, retry_state, *, run_id, **kwargs) -> None:
+		self.metrics.inc('llm_retries')
+
+
+metrics_callback = MetricsCallbackHandler(metrics)
@@ -0,0 +1,71 @@
+import os
+import sys
+import asyncio
+import threading
+from typing import List, Tuple, Dict, Any, Union, Optional
+
+
+# Максимальное количество одновременных запросов к LLM во всем процессе (1 - последовательное выполнение)
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '4'))
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+# Общий для всех вызовов invoke_all лимит; создается и используется только в потоке _loop
+_limiter: Optional[asyncio.Semaphore] = None
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+	"""
+	Возвращает общий event loop, работающий в фоновом потоке.
+
+	Асинхронный HTTP-клиент LLM создается один раз и держит пул соединений, привязанный
+	к event loop. Если создавать новый loop на каждый вызов (asyncio.run), соединения
+	из пула оказываются закрытыми, и запросы завершаются ошибками соединения и повторами.
+	"""
+	global _loop
+	with _loop_lock:
+		if _loop is None:
+			_loop = asyncio.new_event_loop()
+			threading.Thread(target=_loop.run_forever, name='llm-runner', daemon=True).start()
+		return _loop
+
+
+async def _ainvoke_all(calls: List[Tuple[Any, Dict[str, Any]]], max_concurrency: int) -> List[Union[Any, BaseException]]:
+	global _limiter
+	if _limiter is None:
+		_limiter = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+	semaphore = asyncio.Semaphore(max_concurrency)
+
+	async def _call(chain, inputs):
+		# Вызовы из разных потоков (правила компонентов, обзоры) делят общий лимит процесса
+		async with semaphore, _limiter:
+			return await chain.ainvoke(inputs)
+
+	return await asyncio.gather(*[_call(chain, inputs) for chain, inputs in calls], return_exceptions=True)
+
+
+def invoke_all(calls: List[Tuple[Any, Dict[str, Any]]], max_concurrency: Optional[int] = None) -> List[Union[Any, BaseException]]:
+	"""
+	Одновременно вызывает независимые цепочки LangChain через `ainvoke`.
+
+	Принимает список пар (цепочка, входные данные) и возвращает результаты в том же порядке.
+	Ошибка отдельного вызова не прерывает остальные: на ее месте в результате будет исключение.
+	max_concurrency ограничивает этот вызов, а одновременно во всем процессе выполняется
+	не больше LLM_MAX_CONCURRENCY запросов, сколько бы потоков ни вызывали invoke_all.
+	"""
+	if not calls:
+		return []
+	coro = _ainvoke_all(calls, max(1, max_concurrency or LLM_MAX_CONCURRENCY))
+	return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+
+def batch_invoke(chain: Any, inputs: List[Dict[str, Any]], max_concurrency: Optional[int] = None) -> List[Union[Any, BaseException]]:
+	"""
+	Вызывает одну цепочку на пачке входных данных с ограничением параллелизма.
+	"""
+	return invoke_all([(chain, i) for i in inputs], max_concurrency)
+
+
+def report_failure(what: str, error: BaseException) -> None:
+	print(f"LLM call failed ({what}): {error!r}", file=sys.stderr)
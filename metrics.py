@@ -0,0 +1,227 @@
+import os
+import json
+import time
+import logging
+import resource
+import threading
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import Executor
+from typing import Any, Dict, Iterator, List, Tuple
+
+
+# Сбор метрик выключен по умолчанию, включается ANALYZER_METRICS=1 или флагом cli.py --metrics
+ANALYZER_METRICS = os.getenv('ANALYZER_METRICS', '0') == '1'
+
+_Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class Metrics:
+	"""
+	Легковесный сборщик метрик анализа: длительности (спаны) и счетчики с метками.
+
+	Для длительностей хранятся количество, сумма и максимум, поэтому память не растет
+	с количеством анализов. Выключенный сборщик ничего не записывает, а span()
+	возвращает пустой контекстный менеджер.
+	"""
+
+	def __init__(self, enabled: bool = ANALYZER_METRICS):
+		self.enabled = enabled
+		self._lock = threading.Lock()
+		self._timings: Dict[_Key, List[float]] = {}
+		self._counters: Dict[_Key, float] = {}
+		# Пулы процессов, память которых попадает в снимок, и наибольшая замеченная память их процессов
+		self._pools: Dict[str, Executor] = {}
+		self._pool_peaks: Dict[str, int] = {}
+
+	@staticmethod
+	def _key(name: str, labels: Dict[str, Any]) -> _Key:
+		return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+	def observe(self, name: str, seconds: float, **labels: Any) -> None:
+		if not self.enabled:
+			return
+		key = self._key(name, labels)
+		with self._lock:
+			timing = self._timings.setdefault(key, [0, 0.0, 0.0])
+			timing[0] += 1
+			timing[1] += seconds
+			timing[2] = max(timing[2], seconds)
+
+	def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+		if not self.enabled:
+			return
+		key = self._key(name, labels)
+		with self._lock:
+			self._counters[key] = self._counters.get(key, 0) + value
+
+	def span(self, name: str, **labels: Any):
+		"""
+		Контекстный менеджер, измеряющий длительность блока кода.
+		"""
+		if not self.enabled:
+			return nullcontext()
+		return self._span(name, labels)
+
+	@contextmanager
+	def _span(self, name: str, labels: Dict[str, Any]) -> Iterator[None]:
+		started = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.observe(name, time.perf_counter() - started, **labels)
+
+	def watch_pool(self, name: str, pool: Executor) -> None:
+		"""
+		Добавляет в снимок метрик память рабочих процессов пула (пул с тем же именем заменяется).
+		"""
+		with self._lock:
+			self._pools[name] = pool
+
+	def _pool_memory(self) -> Dict[str, Dict[str, int]]:
+		"""
+		Читает текущую (VmRSS) и пиковую (VmHWM) память живых процессов каждого пула из /proc.
+
+		getrusage(RUSAGE_CHILDREN) здесь не подходит: он учитывает только завершенные и
+		дождавшиеся процессы, а рабочие процессы пулов живут до конца работы.
+		"""
+		with self._lock:
+			pools = dict(self._pools)
+		memory = {}
+		for name, pool in pools.items():
+			try:
+				processes = list((getattr(pool, '_processes', None) or {}).values())
+			except RuntimeError:
+				# Пул как раз запускает или завершает процесс
+				processes = []
+			rss, peak = 0, 0
+			for process in processes:
+				status = _process_status(process.pid)
+				rss += status.get('VmRSS', 0)
+				peak += status.get('VmHWM', 0)
+			with self._lock:
+				self._pool_peaks[name] = max(self._pool_peaks.get(name, 0), peak)
+				memory[name] = {'workers': len(processes), 'rss_bytes': rss, 'peak_rss_bytes': self._pool_peaks[name]}
+		return memory
+
+	def reset(self) -> None:
+		with self._lock:
+			self._timings.clear()
+			self._counters.clear()
+			self._pool_peaks.clear()
+
+	def snapshot(self) -> Dict[str, Any]:
+		"""
+		Возвращает все метрики в виде словаря, пригодного для JSON.
+		"""
+		with self._lock:
+			timings = [
+				{'name': name, 'labels': dict(labels), 'count': count, 'total_seconds': round(total, 6), 'max_seconds': round(maximum, 6)}
+				for (name, labels), (count, total, maximum) in sorted(self._timings.items())
+			]
+			counters = [
+				{'name': name, 'labels': dict(labels), 'value': value}
+				for (name, labels), value in sorted(self._counters.items())
+			]
+		pools = self._pool_memory()
+		# ru_maxrss в Linux - в килобайтах; рабочие процессы - пулы разбора импортов и рендеринга диаграмм
+		return {
+			'timings': timings,
+			'counters': counters,
+			'peak_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+			'workers_rss_bytes': sum(pool['rss_bytes'] for pool in pools.values()),
+			'workers_peak_rss_bytes': sum(pool['peak_rss_bytes'] for pool in pools.values()),
+			'pools': pools,
+		}
+
+	def write_json(self, path: str) -> None:
+		_write_atomic(path, json.dumps(self.snapshot(), indent=4, ensure_ascii=False))
+
+	def write_prometheus(self, path: str) -> None:
+		"""
+		Записывает метрики в формате textfile-коллектора Prometheus (node_exporter).
+		"""
+		snapshot = self.snapshot()
+		lines = []
+
+		def labels_text(labels: Dict[str, str]) -> str:
+			if not labels:
+				return ''
+			escaped = ','.join('{}="{}"'.format(label, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for label, value in labels.items())
+			return '{' + escaped + '}'
+
+		for timing in snapshot['timings']:
+			metric, labels = f"analyzer_{timing['name']}_seconds", labels_text(timing['labels'])
+			lines.append(f"{metric}_count{labels} {timing['count']}")
+			lines.append(f"{metric}_sum{labels} {timing['total_seconds']}")
+			lines.append(f"{metric}_max{labels} {timing['max_seconds']}")
+		for counter in snapshot['counters']:
+			lines.append(f"analyzer_{counter['name']}_total{labels_text(counter['labels'])} {counter['value']}")
+		lines.append(f"analyzer_peak_rss_bytes {snapshot['peak_rss_bytes']}")
+		for name, pool in snapshot['pools'].items():
+			labels = labels_text({'pool': name})
+			lines.append(f"analyzer_pool_workers{labels} {pool['workers']}")
+			lines.append(f"analyzer_pool_rss_bytes{labels} {pool['rss_bytes']}")
+			lines.append(f"analyzer_pool_peak_rss_bytes{labels} {pool['peak_rss_bytes']}")
+		_write_atomic(path, '\n'.join(lines) + '\n')
+
+	def summary(self, top: int = 10) -> List[Dict[str, Any]]:
+		"""
+		Возвращает самые долгие по суммарному времени спаны.
+		"""
+		timings = self.snapshot()['timings']
+		return sorted(timings, key=lambda timing: timing['total_seconds'], reverse=True)[:top]
+
+
+def _process_status(pid: int) -> Dict[str, int]:
+	"""
+	Возвращает поля памяти процесса из /proc/<pid>/status в байтах (пустой словарь, если процесса уже нет или /proc недоступен).
+	"""
+	status = {}
+	try:
+		with open(f'/proc/{pid}/status') as f:
+			for line in f:
+				if line.startswith('Vm'):
+					name, value = line.split(':', 1)
+					status[name] = int(value.split()[0]) * 1024
+	except (OSError, ValueError):
+		return {}
+	return status
+
+
+def _write_atomic(path: str, text: str) -> None:
+	# Коллектор не должен прочитать файл, записанный наполовину
+	if os.path.dirname(path):
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+	tmp_path = path + '.tmp'
+	with open(tmp_path, 'w') as f:
+		f.write(text)
+	os.replace(tmp_path, path)
+
+
+metrics = Metrics()
+
+
+class _RetryLogHandler(logging.Handler):
+	"""
+	Считает повторы HTTP-запросов клиента OpenAI: они выполняются внутри SDK и не видны колбэкам LangChain.
+	"""
+
+	def emit(self, record: logging.LogRecord) -> None:
+		if record.getMessage().startswith('Retrying request'):
+			metrics.inc('llm_retries')
+
+
+def enable() -> None:
+	"""
+	Включает сбор метрик в текущем процессе.
+	"""
+	metrics.enabled = True
+	logger = logging.getLogger('openai._base_client')
+	if not any(isinstance(handler, _RetryLogHandler) for handler in logger.handlers):
+		logger.addHandler(_RetryLogHandler(logging.INFO))
+		if logger.getEffectiveLevel() > logging.INFO:
+			logger.setLevel(logging.INFO)
+
+
+if ANALYZER_METRICS:
+	enable()
@@ -0,0 +1,77 @@
+import sys
+import queue
+import threading
+import traceback
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, List, Dict, Any
+
+
+@dataclass
+class Stage:
+	"""
+	Стадия конвейера: функция, которая принимает и возвращает задание (словарь), и число потоков.
+	"""
+	name: str
+	func: Callable[[Dict[str, Any]], Dict[str, Any]]
+	workers: int = 1
+
+
+_DONE = object()
+
+
+def run_pipeline(jobs: Iterable[Dict[str, Any]], stages: List[Stage], queue_size: int = 4) -> Iterator[Dict[str, Any]]:
+	"""
+	Прогоняет задания через стадии, у каждой из которых свой пул потоков.
+
+	Стадии связаны ограниченными очередями, поэтому разные задания одновременно находятся
+	на разных стадиях, а память ограничена размером очередей. Задания возвращаются по мере
+	завершения (порядок не сохраняется). Если стадия падает, задание получает ключи 'error'
+	и 'failed_stage' и проходит остальные стадии без обработки.
+	"""
+	queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+
+	def feed():
+		for job in jobs:
+			queues[0].put(job)
+		for _ in range(stages[0].workers):
+			queues[0].put(_DONE)
+
+	def work(stage_index: int, remaining: List[int], lock: threading.Lock):
+		stage = stages[stage_index]
+		source, target = queues[stage_index], queues[stage_index + 1]
+		while True:
+			job = source.get()
+			if job is _DONE:
+				break
+			if 'error' not in job:
+				try:
+					job = stage.func(job)
+				except Exception as e:
+					traceback.print_exc(file=sys.stderr)
+					job['error'] = f"{type(e).__name__}: {e}"
+					job['failed_stage'] = stage.name
+			target.put(job)
+		# Последний поток стадии сообщает следующей стадии о завершении
+		with lock:
+			remaining[0] -= 1
+			last = remaining[0] == 0
+		if last:
+			next_workers = stages[stage_index + 1].workers if stage_index + 1 < len(stages) else 1
+			for _ in range(next_workers):
+				target.put(_DONE)
+
+	threads = [threading.Thread(target=feed, daemon=True)]
+	for stage_index, stage in enumerate(stages):
+		remaining, lock = [stage.workers], threading.Lock()
+		threads.extend(threading.Thread(target=work, args=(stage_index, remaining, lock), daemon=True, name=f'{stage.name}-{i}') for i in range(stage.workers))
+	for thread in threads:
+		thread.start()
+
+	while True:
+		job = queues[-1].get()
+		if job is _DONE:
+			break
+		yield job
+
+	for thread in threads:
+		thread.join()
@@ -0,0 +1,108 @@
+import os
+import time
+from dataclasses import dataclass, field
+from typing import List, Dict, Union, Optional, Tuple
+
+from vfs import ProjectFS, FSEntry, GitFS, open_fs
+from ignore_rules import IgnoreRules, IgnoreRule, SkippedEntry
+
+
+@dataclass
+class ProjectIndex:
+	"""
+	Индекс проекта, построенный за один обход его файловой системы (каталога или архива).
+
+	Каталоги окружений, зависимостей, сгенерированного кода и пути из .gitignore и пользовательских
+	шаблонов (см. IgnoreRules) пропускаются целиком, без обхода, и попадают в skipped.
+	Все пути относительные (от корня проекта) и разделены '/'.
+	"""
+	fs: ProjectFS
+	name: str
+	files: List[str] = field(default_factory=list)
+	sizes: Dict[str, int] = field(default_factory=dict)
+	tree: str = ''
+	readmes: Dict[str, str] = field(default_factory=dict)
+	python_files: Dict[str, List[str]] = field(default_factory=dict)
+	# Пропущенные при обходе файлы и каталоги (см. ignore_rules.py)
+	skipped: List[SkippedEntry] = field(default_factory=list)
+	walk_seconds: float = 0.0
+	# Файловая система открыта индексом (а не передана готовой) и закрывается в close()
+	owns_fs: bool = False
+
+	@classmethod
+	def build(cls, source: Union[str, ProjectFS], ignore: Optional[IgnoreRules] = None) -> 'ProjectIndex':
+		fs = open_fs(source)
+		index = cls(fs=fs, name=fs.name, owns_fs=fs is not source)
+		started = time.perf_counter()
+		tree_lines = [f'$ {index.name}/']
+		if ignore is None:
+			# .gitignore относится к неотслеживаемым файлам, а в дереве коммита все файлы отслеживаются
+			ignore = IgnoreRules(gitignore=not isinstance(fs, GitFS))
+		index._walk('', '', tree_lines, ignore, (), fs.scandir(''))
+		index.tree = '\n'.join(tree_lines)
+		index.walk_seconds = time.perf_counter() - started
+		return index
+
+	def _walk(self, rel_dir: str, prefix: str, tree_lines: List[str], ignore: IgnoreRules, gitignores: Tuple[IgnoreRule, ...], entries: List[FSEntry]) -> None:
+		gitignores = ignore.enter(self.fs.read_text, rel_dir, [entry.name for entry in entries], gitignores)
+		# Пропускаемые каталоги не обходятся; содержимое остальных читается до вывода дерева,
+		# чтобы распознать виртуальные окружения с произвольными именами
+		kept = []
+		for entry in entries:
+			rel_path = rel_dir + '/' + entry.name if rel_dir else entry.name
+			rule = ignore.match(rel_path, entry.is_dir, gitignores)
+			reason = rule.reason if rule is not None and not rule.negate else None
+			children = None
+			if reason is None and entry.is_dir:
+				children = self.fs.scandir(rel_path)
+				if rule is None and ignore.virtualenv([child.name for child in children]):
+					reason = 'virtualenv'
+			if reason is not None:
+				self._skip(rel_path, entry, reason)
+				continue
+			kept.append((entry, rel_path, children))
+
+		for i, (entry, rel_path, children) in enumerate(kept):
+			last = i == len(kept) - 1
+			if entry.is_dir:
+				tree_lines.append(prefix + ('└── ' if last else '├── ') + entry.name + '/')
+				self._walk(rel_path, prefix + ('    ' if last else '│   '), tree_lines, ignore, gitignores, children)
+				continue
+			tree_lines.append(prefix + ('└── ' if last else '├── ') + entry.name)
+			self._add_file(rel_dir, rel_path, entry.size)
+
+	def _skip(self, rel_path: str, entry: FSEntry, reason: str) -> None:
+		if not entry.is_dir:
+			self.skipped.append(SkippedEntry(rel_path, reason, False, 1, entry.size, int(rel_path.endswith('.py'))))
+			return
+		stats = self.fs.subtree_stats(rel_path)
+		self.skipped.append(SkippedEntry(rel_path, reason, True, *(stats or (None, None, None))))
+
+	def _add_file(self, rel_dir: str, rel_path: str, size: int) -> None:
+		self.files.append(rel_path)
+		self.sizes[rel_path] = size
+		if rel_path.endswith('.py'):
+			self.python_files.setdefault(rel_dir, []).append(rel_path)
+		# README в корне проекта или в каталоге первого уровня
+		if os.path.basename(rel_path).startswith('README') and rel_dir.count('/') == 0:
+			self.readmes[rel_path] = self.fs.read_text(rel_path)
+
+	def read_bytes(self, rel_path: str) -> bytes:
+		return self.fs.read_bytes(rel_path)
+
+	def close(self) -> None:
+		if self.owns_fs:
+			self.fs.close()
+
+	def python_files_under(self, base_path: str) -> List[str]:
+		"""
+		Возвращает все .py файлы в каталоге base_path (рекурсивно).
+		"""
+		base = os.path.normpath(base_path or '.').strip('/')
+		if base == '.':
+			base = ''
+		files = []
+		for dir_path, dir_files in self.python_files.items():
+			if base == '' or dir_path == base or dir_path.startswith(base + '/'):
+				files.extend(dir_files)
+		return files
@@ -0,0 +1,282 @@
+import os
+import re
+import sys
+import json
+import hashlib
+from collections import Counter
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from import_graph import ImportGraph
+
+
+# Бюджет токенов на дерево файлов и README в промпте обзора проекта
+OVERVIEW_TOKEN_BUDGET = int(os.getenv('OVERVIEW_TOKEN_BUDGET', '16000'))
+# Бюджет токенов на JSON-описание проекта в промптах ревьюеров
+REVIEW_TOKEN_BUDGET = int(os.getenv('REVIEW_TOKEN_BUDGET', '16000'))
+PROMPT_TOKEN_ENCODING = os.getenv('PROMPT_TOKEN_ENCODING', 'cl100k_base')
+# Сколько файлов каталога показывать в сжатом дереве, остальные сводятся в одну строку
+TREE_MAX_FILES_PER_DIR = int(os.getenv('TREE_MAX_FILES_PER_DIR', '20'))
+# Ключи обзора, которые не нужны ревьюерам (список файлов заменяется сводкой, см. _files_summary)
+REVIEW_DROP_KEYS = ('analysis_stats',)
+# Сколько расширений показывать в сводке файлов проекта
+REVIEW_TOP_EXTENSIONS = int(os.getenv('REVIEW_TOP_EXTENSIONS', '15'))
+
+TRUNCATED = '\n[...]'
+
+
+@lru_cache(maxsize=None)
+def _encoding():
+	# tiktoken импортируется при первом подсчете токенов, а не при запуске
+	try:
+		import tiktoken
+	except ImportError:
+		return None
+	try:
+		return tiktoken.get_encoding(PROMPT_TOKEN_ENCODING)
+	except Exception as e:
+		# Словарь кодировки скачивается при первом использовании - без сети считаем приблизительно
+		print(f"Token counting falls back to an estimate: {type(e).__name__}: {e}", file=sys.stderr)
+		return None
+
+
+def count_tokens(text: str) -> int:
+	"""
+	Считает токены через tiktoken, без него - приблизительно (4 символа на токен).
+	"""
+	encoding = _encoding()
+	if encoding is None:
+		return (len(text) + 3) // 4
+	return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, budget: int) -> str:
+	if count_tokens(text) <= budget:
+		return text
+	encoding = _encoding()
+	if encoding is None:
+		return text[:budget * 4] + TRUNCATED
+	return encoding.decode(encoding.encode(text, disallowed_special=())[:budget]) + TRUNCATED
+
+
+def log_prompt_tokens(prompt: str, budget: int, **sections: str) -> Dict[str, int]:
+	"""
+	Печатает в stderr размер частей промпта в токенах и возвращает его.
+	"""
+	tokens = {name: count_tokens(text) for name, text in sections.items()}
+	details = ', '.join(f'{name}={count}' for name, count in tokens.items())
+	print(f"Prompt {prompt}: {details} tokens (budget {budget})", file=sys.stderr)
+	return tokens
+
+
+# Дерево файлов
+
+def _file_tree(files: List[str]) -> Dict[str, Any]:
+	root: Dict[str, Any] = {}
+	for path in files:
+		node = root
+		*dirs, name = path.split('/')
+		for dir_name in dirs:
+			node = node.setdefault(dir_name + '/', {})
+		node[name] = None
+	return root
+
+
+def _describe_files(names: List[str]) -> str:
+	suffixes = Counter(os.path.splitext(name)[1] or name for name in names)
+	return ', '.join(f'{suffix} {count}' for suffix, count in suffixes.most_common())
+
+
+def _all_files(node: Dict[str, Any]) -> List[str]:
+	files = []
+	for name, child in node.items():
+		files.extend(_all_files(child) if child is not None else [name])
+	return files
+
+
+def _render_tree(node: Dict[str, Any], prefix: str, depth: int, max_depth: int, lines: List[str]) -> None:
+	entries = sorted(node.items())
+	dirs = [(name, child) for name, child in entries if child is not None]
+	files = [name for name, child in entries if child is None]
+	shown: List[Tuple[str, Optional[Dict[str, Any]]]] = dirs + [(name, None) for name in files[:TREE_MAX_FILES_PER_DIR]]
+	hidden = files[TREE_MAX_FILES_PER_DIR:]
+	for i, (name, child) in enumerate(shown):
+		last = i == len(shown) - 1 and not hidden
+		branch = prefix + ('└── ' if last else '├── ')
+		if child is None:
+			lines.append(branch + name)
+		elif depth >= max_depth:
+			nested = _all_files(child)
+			lines.append(branch + f'{name} ({len(nested)} files: {_describe_files(nested)})')
+		else:
+			lines.append(branch + name)
+			_render_tree(child, prefix + ('    ' if last else '│   '), depth + 1, max_depth, lines)
+	if hidden:
+		lines.append(prefix + f'└── ... {len(hidden)} more files ({_describe_files(hidden)})')
+
+
+def summarize_tree(name: str, files: List[str], tree: str, budget: int) -> str:
+	"""
+	Возвращает дерево файлов, укладывающееся в budget токенов.
+
+	Полное дерево возвращается как есть. Иначе строится иерархическая сводка: в каждом
+	каталоге показываются первые TREE_MAX_FILES_PER_DIR файлов, а каталоги глубже
+	max_depth сворачиваются в строку с количеством файлов по расширениям. Глубина
+	уменьшается, пока сводка не уложится в бюджет.
+	"""
+	if count_tokens(tree) <= budget:
+		return tree
+	root = _file_tree(files)
+	max_depth = max((path.count('/') for path in files), default=0)
+	summary = tree
+	for depth in range(max_depth, -1, -1):
+		lines = [f'$ {name}/ ({len(files)} files, summarized)']
+		_render_tree(root, '', 0, depth, lines)
+		summary = '\n'.join(lines)
+		if count_tokens(summary) <= budget:
+			return summary
+	return truncate_tokens(summary, budget)
+
+
+# README
+
+_BADGE_RE = re.compile(r'^(\s*\[?!\[[^\]]*\]\([^)]*\)(\]\([^)]*\))?)+\s*$', re.MULTILINE)
+_HTML_COMMENT_RE = re.compile(r'<!--.*?-->', re.DOTALL)
+_BLANK_LINES_RE = re.compile(r'\n{3,}')
+
+
+def _clean_readme(text: str) -> str:
+	text = _HTML_COMMENT_RE.sub('', text)
+	text = _BADGE_RE.sub('', text)
+	return _BLANK_LINES_RE.sub('\n\n', text).strip()
+
+
+def compact_readmes(project_name: str, readmes: Dict[str, str], budget: int) -> str:
+	"""
+	Собирает README в пределах budget токенов.
+
+	Из README удаляются бейджи, HTML-комментарии и лишние пустые строки, одинаковые
+	README (например, копии в каталогах компонентов) включаются один раз. Бюджет делится
+	поровну: README меньше своей доли включаются целиком, а их остаток достается остальным.
+	"""
+	unique: Dict[str, str] = {}
+	seen = set()
+	for rel_path, text in readmes.items():
+		text = _clean_readme(text)
+		digest = hashlib.sha256(' '.join(text.split()).encode('utf-8')).hexdigest()
+		if digest in seen:
+			continue
+		seen.add(digest)
+		unique[rel_path] = text
+
+	sizes = {rel_path: count_tokens(text) for rel_path, text in unique.items()}
+	limits = {}
+	remaining = budget
+	for i, rel_path in enumerate(sorted(unique, key=sizes.get)):
+		limits[rel_path] = min(sizes[rel_path], remaining // (len(unique) - i))
+		remaining -= limits[rel_path]
+	return '\n\n\n'.join(
+		f'/{project_name}/{rel_path}:\n\n{truncate_tokens(text, limits[rel_path])}'
+		for rel_path, text in unique.items()
+	)
+
+
+def overview_inputs(project_name: str, files: List[str], tree: str, readmes: Dict[str, str], budget: int = OVERVIEW_TOKEN_BUDGET) -> Tuple[Dict[str, str], Dict[str, int]]:
+	"""
+	Готовит дерево файлов и README для промпта обзора проекта.
+
+	README получают не больше половины бюджета, дерево - все остальное.
+	Возвращает (переменные промпта, размер каждой в токенах).
+	"""
+	readme_text = compact_readmes(project_name, readmes, budget // 2)
+	file_tree = summarize_tree(project_name, files, tree, budget - count_tokens(readme_text))
+	inputs = {'file_tree': file_tree, 'readmes': readme_text}
+	return inputs, log_prompt_tokens('overview', budget, **inputs)
+
+
+# Описание проекта для ревьюеров
+
+def _internal_graph(graph: Mapping) -> Dict[str, Any]:
+	graph = ImportGraph.from_dict(graph)
+	modules = set(graph)
+	external = sorted({name.split('.')[0] for module in graph for name in graph[module] if name not in modules})
+	return {
+		'imports': {module: [name for name in graph[module] if name in modules] for module in graph},
+		'external_packages': external,
+	}
+
+
+def _graph_summary(graph: Mapping) -> Dict[str, Any]:
+	graph = ImportGraph.from_dict(graph)
+	internal = _internal_graph(graph)
+	return {
+		'modules': len(graph),
+		'internal_imports': sum(len(targets) for targets in internal['imports'].values()),
+		'external_packages': internal['external_packages'],
+	}
+
+
+# Уровни сжатия графов импортов компонентов: как есть, только внутренние импорты, сводка
+_GRAPH_LEVELS: Tuple[Callable[[Mapping], Any], ...] = (lambda graph: graph, _internal_graph, _graph_summary)
+
+
+def _files_summary(files: List[str]) -> Dict[str, Any]:
+	extensions = Counter(os.path.splitext(path)[1] or os.path.basename(path) for path in files)
+	return {'count': len(files), 'by_extension': dict(extensions.most_common(REVIEW_TOP_EXTENSIONS))}
+
+
+def review_description(overview: Dict[str, Any], default: Callable[[Any], Any], budget: int = REVIEW_TOKEN_BUDGET) -> Tuple[str, int]:
+	"""
+	Сериализует обзор проекта в компактный JSON для промптов ревьюеров.
+
+	Служебные ключи (REVIEW_DROP_KEYS) удаляются, список файлов заменяется сводкой по
+	расширениям, графы импортов компонентов сжимаются по уровням _GRAPH_LEVELS. Если
+	описание все еще не укладывается в budget токенов, из него целиком убираются самые
+	большие компоненты (их количество записывается в omitted_components), а затем самые
+	большие из остальных ключей (omitted_keys) - JSON никогда не обрезается посередине.
+	Возвращает (JSON, размер в токенах).
+	"""
+	def dumps(value: Any) -> str:
+		return json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=default)
+
+	description = {key: value for key, value in overview.items() if key not in REVIEW_DROP_KEYS}
+	if 'project_files' in description:
+		description['project_files'] = _files_summary(description['project_files'])
+	for level in _GRAPH_LEVELS:
+		description['components'] = [
+			{**component, 'import_dependencies_graph': level(component['import_dependencies_graph'])}
+			if 'import_dependencies_graph' in component else component
+			for component in overview.get('components', [])
+		]
+		text = dumps(description)
+		if count_tokens(text) <= budget:
+			break
+
+	components = description['components']
+	if count_tokens(text) > budget and components:
+		# Убираем самые большие компоненты, пока оценка превышения не станет нулевой, затем проверяем точно
+		sizes = [count_tokens(dumps(component)) for component in components]
+		excess = count_tokens(text) - budget
+		omitted = set()
+		for i in sorted(range(len(components)), key=lambda i: -sizes[i]):
+			if excess <= 0 and count_tokens(text) <= budget:
+				break
+			omitted.add(i)
+			excess -= sizes[i]
+			description['components'] = [component for j, component in enumerate(components) if j not in omitted]
+			description['omitted_components'] = len(omitted)
+			if excess <= 0:
+				text = dumps(description)
+		text = dumps(description)
+
+	protected = {'project_name', 'components', 'omitted_components', 'omitted_keys'}
+	while count_tokens(text) > budget:
+		keys = [key for key in description if key not in protected]
+		if not keys:
+			break
+		largest = max(keys, key=lambda key: len(dumps(description[key])))
+		del description[largest]
+		description.setdefault('omitted_keys', []).append(largest)
+		text = dumps(description)
+	return text, log_prompt_tokens('review', budget, json_description=text)['json_description']
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Хранилище отчетов с адресацией по содержимому.
+
+	python report_store.py [--port 9000] [--path static/reports.sqlite]
+
+Диаграммы, встроенные в отчет как data URI, выносятся в отдельные ресурсы по хэшу
+содержимого и переиспользуются всеми отчетами. Отчеты хранятся сжатыми gzip и отдаются
+без повторного сжатия, с ETag и кэшированием навсегда (содержимое по адресу не меняется).
+Индекс хранит, какой отчет когда построен для какого проекта; старые записи удаляются
+по времени жизни и по квоте размера, вместе с ресурсами, на которые больше никто не ссылается.
+
+HTTP:
+	GET /reports/<hash>.html          отчет
+	GET /assets/<hash>.<ext>          диаграмма
+	GET /reports[?project=NAME]       индекс отчетов (JSON), новые первыми
+"""
+
+import os
+import re
+import sys
+import gzip
+import json
+import time
+import base64
+import sqlite3
+import hashlib
+import argparse
+import threading
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from typing import Any, Dict, List, Optional, Tuple
+
+
+REPORT_STORE_PATH = os.getenv('REPORT_STORE_PATH', os.path.join('static', 'reports.sqlite'))
+# Время жизни записи индекса в секундах (по умолчанию 30 дней) и квота на размер хранилища
+REPORT_STORE_TTL = float(os.getenv('REPORT_STORE_TTL', str(30 * 24 * 3600)))
+REPORT_STORE_MAX_BYTES = int(os.getenv('REPORT_STORE_MAX_BYTES', str(1024 * 1024 * 1024)))
+# Адрес сервера хранилища для ссылок на отчеты в UI
+REPORT_BASE_URL = os.getenv('REPORT_BASE_URL', 'http://localhost:9000')
+
+ASSET_EXTENSIONS = {'image/png': 'png', 'image/svg+xml': 'svg', 'image/jpeg': 'jpg', 'image/gif': 'gif'}
+# Уже сжатые форматы хранятся как есть
+_COMPRESSED_MIME_TYPES = {'image/png', 'image/jpeg', 'image/gif'}
+_DATA_URI_RE = re.compile(r'data:(image/[\w.+-]+);base64,([A-Za-z0-9+/=\s]+)')
+_BLOB_PATH_RE = re.compile(r'^/(reports|assets)/([0-9a-f]{64})\.(\w+)$')
+# Части отчета, зависящие от запуска, а не от проекта (время, попадания в кэш): хранятся в отчете,
+# но не входят в его хэш, иначе отчеты одинакового содержимого различались бы и не дедуплицировались
+_VOLATILE_RE = re.compile(r'<!-- volatile -->.*?<!-- /volatile -->', re.DOTALL)
+
+
+@dataclass
+class StoredReport:
+	# Хэш HTML отчета (после выноса диаграмм, без частей, зависящих от запуска)
+	id: str
+	url: str
+	project: str
+	html_bytes: int
+	stored_bytes: int
+	assets: int
+	# Отчет или ресурсы уже были в хранилище
+	deduplicated_report: bool
+	deduplicated_assets: int
+
+
+class ReportStore:
+	"""
+	Хранилище отчетов и диаграмм в SQLite. Можно использовать из нескольких потоков и процессов.
+	"""
+
+	def __init__(self, path: str = REPORT_STORE_PATH, ttl: Optional[float] = REPORT_STORE_TTL, max_bytes: Optional[int] = REPORT_STORE_MAX_BYTES):
+		if os.path.dirname(path):
+			os.makedirs(os.path.dirname(path), exist_ok=True)
+		self.path = path
+		self.ttl = ttl
+		self.max_bytes = max_bytes
+		self._lock = threading.Lock()
+		self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+		self._conn.execute('PRAGMA journal_mode=WAL')
+		self._conn.execute('PRAGMA synchronous=NORMAL')
+		self._conn.executescript('''
+			CREATE TABLE IF NOT EXISTS blobs (
+				hash TEXT PRIMARY KEY,
+				kind TEXT NOT NULL,
+				mime TEXT NOT NULL,
+				encoding TEXT NOT NULL,
+				data BLOB NOT NULL,
+				size INTEGER NOT NULL,
+				raw_size INTEGER NOT NULL,
+				created_at REAL NOT NULL
+			);
+			CREATE TABLE IF NOT EXISTS report_assets (
+				report TEXT NOT NULL,
+				asset TEXT NOT NULL,
+				PRIMARY KEY (report, asset)
+			);
+			CREATE INDEX IF NOT EXISTS report_assets_asset ON report_assets (asset);
+			CREATE TABLE IF NOT EXISTS reports (
+				id INTEGER PRIMARY KEY AUTOINCREMENT,
+				project TEXT NOT NULL,
+				report TEXT NOT NULL,
+				created_at REAL NOT NULL
+			);
+			CREATE INDEX IF NOT EXISTS reports_project ON reports (project, created_at);
+			CREATE INDEX IF NOT EXISTS reports_report ON reports (report);
+		''')
+
+	def _insert_blob(self, digest: str, kind: str, mime: str, raw: bytes, now: float) -> bool:
+		"""
+		Сохраняет блоб, если его еще нет. Возвращает True, если блоб уже был в хранилище.
+		"""
+		if self._conn.execute('SELECT 1 FROM blobs WHERE hash = ?', (digest,)).fetchone():
+			return True
+		if mime in _COMPRESSED_MIME_TYPES:
+			data, encoding = raw, ''
+		else:
+			# mtime=0: одинаковое содержимое сжимается в одинаковые байты
+			data, encoding = gzip.compress(raw, compresslevel=6, mtime=0), 'gzip'
+		self._conn.execute(
+			'INSERT INTO blobs (hash, kind, mime, encoding, data, size, raw_size, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+			(digest, kind, mime, encoding, data, len(data), len(raw), now),
+		)
+		return False
+
+	def put(self, project: str, html: str) -> StoredReport:
+		"""
+		Сохраняет отчет проекта: выносит встроенные диаграммы в ресурсы и добавляет запись в индекс.
+		Адрес отчета - хэш HTML без частей, зависящих от запуска (<!-- volatile -->); если отчет
+		с таким хэшем уже есть, остается сохраненный ранее (вместе с его статистикой запуска).
+		"""
+		assets: Dict[str, Tuple[str, bytes]] = {}
+
+		def extract(match: re.Match) -> str:
+			mime = match.group(1)
+			data = base64.b64decode(match.group(2))
+			digest = hashlib.sha256(data).hexdigest()
+			assets[digest] = (mime, data)
+			return f'../assets/{digest}.{ASSET_EXTENSIONS.get(mime, "bin")}'
+
+		html = _DATA_URI_RE.sub(extract, html)
+		html_data = html.encode('utf-8')
+		report = hashlib.sha256(_VOLATILE_RE.sub('', html).encode('utf-8')).hexdigest()
+		now = time.time()
+		with self._lock:
+			self._conn.execute('BEGIN IMMEDIATE')
+			try:
+				deduplicated_assets = sum(self._insert_blob(digest, 'asset', mime, data, now) for digest, (mime, data) in assets.items())
+				deduplicated_report = self._insert_blob(report, 'report', 'text/html; charset=utf-8', html_data, now)
+				self._conn.executemany('INSERT OR IGNORE INTO report_assets (report, asset) VALUES (?, ?)', [(report, digest) for digest in assets])
+				entry = self._conn.execute('INSERT INTO reports (project, report, created_at) VALUES (?, ?, ?)', (project, report, now)).lastrowid
+				stored_bytes = self._conn.execute('SELECT size FROM blobs WHERE hash = ?', (report,)).fetchone()[0]
+				self._conn.execute('COMMIT')
+			except BaseException:
+				self._conn.execute('ROLLBACK')
+				raise
+		self.evict(keep=entry)
+		return StoredReport(
+			id=report,
+			url=f'/reports/{report}.html',
+			project=project,
+			html_bytes=len(html_data),
+			stored_bytes=stored_bytes,
+			assets=len(assets),
+			deduplicated_report=deduplicated_report,
+			deduplicated_assets=deduplicated_assets,
+		)
+
+	def get(self, digest: str) -> Optional[Tuple[bytes, str, str]]:
+		"""
+		Возвращает (данные, MIME-тип, кодировка: 'gzip' или '') отчета или ресурса.
+		"""
+		with self._lock:
+			row = self._conn.execute('SELECT data, mime, encoding FROM blobs WHERE hash = ?', (digest,)).fetchone()
+		return (bytes(row[0]), row[1], row[2]) if row is not None else None
+
+	def index(self, project: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+		"""
+		Возвращает записи индекса, новые первыми.
+		"""
+		query = 'SELECT r.project, r.report, r.created_at, b.raw_size FROM reports r JOIN blobs b ON b.hash = r.report'
+		params: List[Any] = []
+		if project is not None:
+			query += ' WHERE r.project = ?'
+			params.append(project)
+		query += ' ORDER BY r.created_at DESC LIMIT ?'
+		params.append(limit)
+		with self._lock:
+			rows = self._conn.execute(query, params).fetchall()
+		return [
+			{'project': project, 'report': report, 'url': f'/reports/{report}.html', 'created_at': created_at, 'html_bytes': size}
+			for project, report, created_at, size in rows
+		]
+
+	def _collect_garbage(self) -> int:
+		removed = self._conn.execute("DELETE FROM blobs WHERE kind = 'report' AND hash NOT IN (SELECT report FROM reports)").rowcount
+		self._conn.execute("DELETE FROM report_assets WHERE report NOT IN (SELECT hash FROM blobs WHERE kind = 'report')")
+		removed += self._conn.execute("DELETE FROM blobs WHERE kind = 'asset' AND hash NOT IN (SELECT asset FROM report_assets)").rowcount
+		return removed
+
+	def evict(self, keep: Optional[int] = None) -> int:
+		"""
+		Удаляет записи индекса старше ttl, затем самые старые записи сверх квоты размера,
+		и блобы, на которые больше нет ссылок. Запись keep (только что сохраненный отчет)
+		не удаляется, даже если один этот отчет больше квоты. Возвращает количество удаленных блобов.
+		"""
+		removed = 0
+		with self._lock:
+			self._conn.execute('BEGIN IMMEDIATE')
+			try:
+				if self.ttl is not None:
+					self._conn.execute('DELETE FROM reports WHERE created_at < ?', (time.time() - self.ttl,))
+				removed += self._collect_garbage()
+				if self.max_bytes is not None:
+					while self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM blobs').fetchone()[0] > self.max_bytes:
+						oldest = self._conn.execute('SELECT id FROM reports WHERE id IS NOT ? ORDER BY created_at ASC LIMIT 1', (keep,)).fetchone()
+						if oldest is None:
+							break
+						self._conn.execute('DELETE FROM reports WHERE id = ?', oldest)
+						removed += self._collect_garbage()
+				self._conn.execute('COMMIT')
+			except BaseException:
+				self._conn.execute('ROLLBACK')
+				raise
+		return removed
+
+	def stats(self) -> Dict[str, Any]:
+		with self._lock:
+			entries = self._conn.execute('SELECT COUNT(*) FROM reports').fetchone()[0]
+			blobs = {
+				kind: {'count': count, 'bytes': size, 'raw_bytes': raw_size}
+				for kind, count, size, raw_size in self._conn.execute('SELECT kind, COUNT(*), SUM(size), SUM(raw_size) FROM blobs GROUP BY kind')
+			}
+		return {'entries': entries, 'reports': blobs.get('report'), 'assets': blobs.get('asset')}
+
+
+_store: Optional[ReportStore] = None
+_lock = threading.Lock()
+
+
+def get_report_store() -> ReportStore:
+	global _store
+	with _lock:
+		if _store is None:
+			_store = ReportStore()
+		return _store
+
+
+def _accepts_gzip(handler: BaseHTTPRequestHandler) -> bool:
+	encodings = [part.strip() for part in handler.headers.get('Accept-Encoding', '').split(',')]
+	return any(encoding == 'gzip' or (encoding.startswith('gzip;') and not encoding.replace(' ', '').endswith('q=0')) for encoding in encodings)
+
+
+def send_blob(handler: BaseHTTPRequestHandler, store: ReportStore, digest: str) -> None:
+	"""
+	Отдает отчет или ресурс: сжатые данные без перекодирования, если клиент принимает gzip,
+	ответ 304 при совпадении ETag.
+	"""
+	blob = store.get(digest)
+	if blob is None:
+		_send(handler, 404, b'Not found', 'text/plain')
+		return
+	data, mime, encoding = blob
+	gzipped = encoding == 'gzip' and _accepts_gzip(handler)
+	if encoding == 'gzip' and not gzipped:
+		data = gzip.decompress(data)
+	# Разные представления (сжатое и нет) получают разные ETag
+	etag = f'"{digest}.gz"' if gzipped else f'"{digest}"'
+	headers = {
+		'ETag': etag,
+		# Содержимое по адресу с хэшем никогда не меняется
+		'Cache-Control': 'public, max-age=31536000, immutable',
+		'Vary': 'Accept-Encoding',
+	}
+	if etag in [tag.strip() for tag in handler.headers.get('If-None-Match', '').split(',')]:
+		_send(handler, 304, b'', mime, headers)
+		return
+	if gzipped:
+		headers['Content-Encoding'] = 'gzip'
+	_send(handler, 200, data, mime, headers)
+
+
+def handle_store_request(handler: BaseHTTPRequestHandler, store: ReportStore) -> bool:
+	"""
+	Обрабатывает GET-запрос к хранилищу. Возвращает False, если путь не относится к хранилищу.
+	"""
+	url = urlparse(handler.path)
+	match = _BLOB_PATH_RE.match(url.path)
+	if match is not None:
+		send_blob(handler, store, match.group(2))
+		return True
+	if url.path.rstrip('/') == '/reports':
+		query = parse_qs(url.query)
+		project = query.get('project', [None])[0]
+		limit = int(query.get('limit', ['100'])[0])
+		_send(handler, 200, json.dumps({'reports': store.index(project, limit)}, ensure_ascii=False).encode('utf-8'), 'application/json', {'Cache-Control': 'no-cache'})
+		return True
+	return False
+
+
+def _send(handler: BaseHTTPRequestHandler, status: int, data: bytes, content_type: str, headers: Optional[Dict[str, str]] = None) -> None:
+	handler.send_response(status)
+	handler.send_header('Content-Type', content_type)
+	for name, value in (headers or {}).items():
+		handler.send_header(name, value)
+	if status != 304:
+		handler.send_header('Content-Length', str(len(data)))
+	handler.end_headers()
+	if status != 304:
+		handler.wfile.write(data)
+
+
+class ReportStoreHandler(BaseHTTPRequestHandler):
+	store: ReportStore
+	protocol_version = 'HTTP/1.1'
+
+	def do_GET(self) -> None:
+		if not handle_store_request(self, self.store):
+			_send(self, 404, b'Not found', 'text/plain')
+
+	def log_message(self, format: str, *args: Any) -> None:
+		print(f"{self.address_string()} {format % args}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Serve stored analysis reports with precompressed bodies and ETags.')
+	parser.add_argument('--host', default='127.0.0.1')
+	parser.add_argument('--port', type=int, default=9000)
+	parser.add_argument('--path', default=REPORT_STORE_PATH, help='report store database')
+	parser.add_argument('--stats', action='store_true', help='print store statistics and exit')
+	args = parser.parse_args()
+
+	store = ReportStore(args.path)
+	if args.stats:
+		print(json.dumps(store.stats(), indent=4))
+		sys.exit(0)
+	server = ThreadingHTTPServer((args.host, args.port), type('Handler', (ReportStoreHandler,), {'store': store}))
+	server.daemon_threads = True
+	print(f"Report store: http://{args.host}:{server.server_address[1]}/reports", file=sys.stderr)
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Фоновый сервис анализа с HTTP API (для CI и скриптов).
+
+	python service.py [--host 127.0.0.1] [--port 8080] [--workers 2]
+
+	curl --data-binary @project.zip 'http://127.0.0.1:8080/jobs?name=project.zip'
+	curl 'http://127.0.0.1:8080/jobs/<id>?wait=600'
+	curl -L -o report.html 'http://127.0.0.1:8080/jobs/<id>/report'
+
+Архивы анализируются в пуле заранее запущенных процессов: LangChain, клиент LLM, правила
+и шаблон отчета загружаются один раз при старте процесса, а дисковые кэши (.cache) общие
+для всех процессов. Отчет пишется потоково и отдается этим же сервером, в том числе
+частично готовый, пока задание выполняется; готовый отчет сохраняется в хранилище отчетов
+(report_store.py).
+
+API:
+	POST /jobs?name=NAME[&incremental=1]  тело - ZIP-архив; ответ 202 с ID задания
+	GET  /jobs                            список заданий
+	GET  /jobs/<id>[?wait=SECONDS]        состояние задания (wait - дождаться завершения)
+	GET  /jobs/<id>/report                частично готовый отчет или перенаправление в хранилище
+	GET  /reports, /reports/<hash>.html, /assets/<hash>.<ext>  хранилище отчетов
+	GET  /health                          количество процессов и заданий по состояниям
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import zipfile
+import argparse
+import threading
+import multiprocessing
+from uuid import uuid4
+from dataclasses import asdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from typing import Any, Dict, Optional, Set
+
+from jobs import Job, JobManager
+from report_store import get_report_store, handle_store_request
+from incremental import ANALYZER_INCREMENTAL
+
+
+SERVICE_HOST = os.getenv('SERVICE_HOST', '127.0.0.1')
+SERVICE_PORT = int(os.getenv('SERVICE_PORT', '8080'))
+# Количество процессов анализа
+SERVICE_WORKERS = int(os.getenv('SERVICE_WORKERS', '2'))
+# Каталог для загруженных архивов и отчетов
+SERVICE_DATA_DIR = os.getenv('SERVICE_DATA_DIR', '.service')
+SERVICE_MAX_UPLOAD_BYTES = int(os.getenv('SERVICE_MAX_UPLOAD_BYTES', str(512 * 1024 * 1024)))
+# Сколько секунд хранить завершенные задания (отчеты живут в хранилище отчетов)
+SERVICE_JOB_TTL = float(os.getenv('SERVICE_JOB_TTL', str(24 * 3600)))
+# Максимальное ожидание в GET /jobs/<id>?wait=...
+SERVICE_MAX_WAIT = float(os.getenv('SERVICE_MAX_WAIT', '3600'))
+# Сколько секунд ждать завершения процессов пула после SIGTERM, прежде чем убить их
+SERVICE_TERMINATE_TIMEOUT = float(os.getenv('SERVICE_TERMINATE_TIMEOUT', '5'))
+
+
+# Очередь стадий анализа из процессов пула: (ID задания, стадия); (None, PID) - процесс готов
+_progress_queue: Optional[multiprocessing.Queue] = None
+
+
+def _init_worker(progress_queue: multiprocessing.Queue) -> None:
+	"""
+	Инициализирует процесс пула: загружает тяжелые зависимости до первого задания.
+	"""
+	global _progress_queue
+	_progress_queue = progress_queue
+	import analytics
+
+	analytics.get_llm()
+	analytics._report_template()
+	analytics._get_rules('./feature_extractors')
+	progress_queue.put((None, os.getpid()))
+
+
+def _noop() -> None:
+	pass
+
+
+def _analyze(job_id: str, archive_path: str, name: str, report_path: str, incremental: bool) -> Dict[str, Any]:
+	"""
+	Анализирует архив в процессе пула, потоково пишет отчет в report_path и сохраняет готовый
+	отчет в хранилище. Возвращает время до первых разделов и до готового отчета и адрес отчета.
+	"""
+	from vfs import ZipFS
+	from analytics import apply_analytics_streaming
+
+	def progress(stage: str) -> None:
+		_progress_queue.put((job_id, stage))
+
+	try:
+		with ZipFS(archive_path, name=name) as fs:
+			timings = apply_analytics_streaming(fs, report_path, name, incremental, progress)
+	finally:
+		os.remove(archive_path)
+	with open(report_path) as f:
+		stored = get_report_store().put(name, f.read())
+	os.remove(report_path)
+	return {**timings, 'report': stored.id, 'report_url': stored.url, 'report_deduplicated': stored.deduplicated_report}
+
+
+class AnalysisService:
+	"""
+	Очередь заданий анализа поверх пула процессов.
+
+	Задания и их состояние хранятся в JobManager (как в UI); каждый поток менеджера передает
+	задание в пул процессов и ждет результата, стадии анализа приходят из процессов через очередь.
+	"""
+
+	def __init__(self, data_dir: str = SERVICE_DATA_DIR, workers: int = SERVICE_WORKERS, ttl: float = SERVICE_JOB_TTL):
+		self.uploads_dir = os.path.join(data_dir, 'uploads')
+		self.reports_dir = os.path.join(data_dir, 'reports')
+		# Архивы и недописанные отчеты прерванных заданий прошлого запуска больше не нужны
+		for path in (self.uploads_dir, self.reports_dir):
+			shutil.rmtree(path, ignore_errors=True)
+			os.makedirs(path)
+		self.workers = workers
+		self.jobs = JobManager(max_workers=workers, ttl=ttl)
+		# spawn: процессы не наследуют потоки HTTP-сервера и пула
+		self._context = multiprocessing.get_context('spawn')
+		self._progress_queue = self._context.Queue()
+		self._ready = threading.Semaphore(0)
+		self._pool_lock = threading.Lock()
+		self._pool = self._new_pool()
+		# Пулы из одного процесса для повтора заданий после падения процесса пула
+		self._isolated: Set[ProcessPoolExecutor] = set()
+		self._closed = False
+		threading.Thread(target=self._forward_progress, name='service-progress', daemon=True).start()
+
+	def _new_pool(self) -> ProcessPoolExecutor:
+		return ProcessPoolExecutor(max_workers=self.workers, mp_context=self._context, initializer=_init_worker, initargs=(self._progress_queue,))
+
+	def _run_in_pool(self, *args: Any) -> Dict[str, Any]:
+		with self._pool_lock:
+			# Пул мог сломаться, когда в нем не было заданий: замечаем это до отправки
+			if self._pool._broken:
+				self._pool = self._new_pool()
+			pool = self._pool
+		try:
+			return pool.submit(_analyze, *args).result()
+		except BrokenProcessPool:
+			# Процесс пула аварийно завершился (например, из-за нехватки памяти): следующие задания пойдут в новый пул
+			with self._pool_lock:
+				if self._closed:
+					raise
+				if self._pool is pool:
+					self._pool = self._new_pool()
+		# Сломанный пул отменяет все свои задания, а какое из них виновато, неизвестно. Каждое
+		# повторяется один раз в отдельном процессе: повторное падение затронет только виновника
+		print(f"Pool worker crashed, retrying job {args[0]} in a separate process", file=sys.stderr)
+		with self._pool_lock:
+			if self._closed:
+				raise RuntimeError('Analysis service is shutting down')
+			isolated = ProcessPoolExecutor(max_workers=1, mp_context=self._context, initializer=_init_worker, initargs=(self._progress_queue,))
+			self._isolated.add(isolated)
+		try:
+			return isolated.submit(_analyze, *args).result()
+		finally:
+			with self._pool_lock:
+				self._isolated.discard(isolated)
+			isolated.shutdown()
+
+	def warm_up(self) -> None:
+		"""
+		Запускает все процессы пула и ждет окончания их инициализации.
+		"""
+		# Каждая отправка в пул без свободных процессов запускает новый процесс
+		for future in [self._pool.submit(_noop) for _ in range(self.workers)]:
+			future.result()
+		for _ in range(self.workers):
+			self._ready.acquire()
+		print(f"Warm workers: {self.workers}", file=sys.stderr)
+
+	def _forward_progress(self) -> None:
+		while True:
+			job_id, stage = self._progress_queue.get()
+			if job_id is None:
+				self._ready.release()
+				continue
+			job = self.jobs.get(job_id)
+			if job is not None:
+				job.progress(stage)
+
+	def report_path(self, job_id: str) -> str:
+		return os.path.join(self.reports_dir, f'{job_id}.html')
+
+	def submit(self, name: str, data: bytes, incremental: bool) -> str:
+		"""
+		Сохраняет архив и ставит его анализ в очередь. Возвращает ID задания.
+		"""
+		job_id = uuid4().hex
+		archive_path = os.path.join(self.uploads_dir, f'{job_id}.zip')
+		with open(archive_path, 'wb') as f:
+			f.write(data)
+
+		def run(progress, update_content) -> Dict[str, Any]:
+			return self._run_in_pool(job_id, archive_path, name, self.report_path(job_id), incremental)
+
+		return self.jobs.submit(name, run, job_id)
+
+	def shutdown(self) -> None:
+		"""
+		Отменяет задания в очереди и завершает процессы пула, не дожидаясь текущих анализов.
+		"""
+		with self._pool_lock:
+			self._closed = True
+			pools = [self._pool, *self._isolated]
+		# shutdown(wait=False) не останавливает выполняющиеся задания, поэтому процессы завершаются явно
+		processes = [process for pool in pools for process in (pool._processes or {}).values()]
+		for pool in pools:
+			pool.shutdown(wait=False, cancel_futures=True)
+		for process in processes:
+			process.terminate()
+		deadline = time.monotonic() + SERVICE_TERMINATE_TIMEOUT
+		for process in processes:
+			process.join(max(0.0, deadline - time.monotonic()))
+			if process.is_alive():
+				process.kill()
+
+
+def job_info(job: Job) -> Dict[str, Any]:
+	info = asdict(job)
+	del info['content']
+	info['report_url'] = f'/jobs/{job.id}/report'
+	return info
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+	service: AnalysisService
+	protocol_version = 'HTTP/1.1'
+
+	def do_POST(self) -> None:
+		url = urlparse(self.path)
+		if url.path.rstrip('/') != '/jobs':
+			self._send_json(404, {'error': f'Unknown path {url.path}'})
+			return
+		query = parse_qs(url.query)
+		length = int(self.headers.get('Content-Length') or 0)
+		if not length:
+			self._send_json(411, {'error': 'Content-Length with the ZIP archive is required'})
+			return
+		if length > SERVICE_MAX_UPLOAD_BYTES:
+			self._send_json(413, {'error': f'Archive is larger than {SERVICE_MAX_UPLOAD_BYTES} bytes'})
+			return
+		data = self.rfile.read(length)
+		if not zipfile.is_zipfile(io.BytesIO(data)):
+			self._send_json(400, {'error': 'Request body is not a ZIP archive'})
+			return
+		# Имя попадает в промпты и ключи кэшей, поэтому берется из запроса, а не генерируется
+		name = os.path.basename(query.get('name', ['project.zip'])[0]) or 'project.zip'
+		incremental = query.get('incremental', ['1' if ANALYZER_INCREMENTAL else '0'])[0] in ('1', 'true')
+		job_id = self.service.submit(name, data, incremental)
+		self._send_json(202, {'id': job_id, 'status': 'queued', 'status_url': f'/jobs/{job_id}', 'report_url': f'/jobs/{job_id}/report'})
+
+	def do_GET(self) -> None:
+		if handle_store_request(self, get_report_store()):
+			return
+		url = urlparse(self.path)
+		parts = [part for part in url.path.split('/') if part]
+		if parts == ['health']:
+			statuses: Dict[str, int] = {}
+			for job in self.service.jobs.jobs():
+				statuses[job.status] = statuses.get(job.status, 0) + 1
+			self._send_json(200, {'status': 'ok', 'workers': self.service.workers, 'jobs': statuses})
+		elif parts == ['jobs']:
+			self._send_json(200, {'jobs': [job_info(job) for job in self.service.jobs.jobs()]})
+		elif len(parts) in (2, 3) and parts[0] == 'jobs':
+			job = self.service.jobs.get(parts[1])
+			if job is None:
+				self._send_json(404, {'error': f'Unknown job {parts[1]}'})
+			elif len(parts) == 2:
+				try:
+					wait = min(float(parse_qs(url.query).get('wait', ['0'])[0]), SERVICE_MAX_WAIT)
+				except ValueError:
+					self._send_json(400, {'error': 'wait must be a number of seconds'})
+					return
+				deadline = time.monotonic() + wait
+				while job.status in ('queued', 'running') and time.monotonic() < deadline:
+					time.sleep(0.2)
+				self._send_json(200, job_info(job))
+			elif parts[2] == 'report':
+				self._send_report(job)
+			else:
+				self._send_json(404, {'error': f'Unknown path {url.path}'})
+		else:
+			self._send_json(404, {'error': f'Unknown path {url.path}'})
+
+	def _send_report(self, job: Job) -> None:
+		if job.status == 'done':
+			# Готовый отчет отдается хранилищем: сжатый, с ETag, диаграммы - отдельными ресурсами
+			self._send(303, b'', 'text/html', {'Location': job.result['report_url']})
+			return
+		try:
+			with open(self.service.report_path(job.id), 'rb') as f:
+				data = f.read()
+		except FileNotFoundError:
+			self._send_json(404, {'error': f'Report of job {job.id} is not ready', 'status': job.status})
+			return
+		# Пока задание выполняется, отдается частично готовый отчет
+		self._send(200, data, 'text/html; charset=utf-8', {'X-Job-Status': job.status})
+
+	def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+		self._send(status, json.dumps(payload, ensure_ascii=False).encode('utf-8'), 'application/json')
+
+	def _send(self, status: int, data: bytes, content_type: str, headers: Optional[Dict[str, str]] = None) -> None:
+		self.send_response(status)
+		self.send_header('Content-Type', content_type)
+		self.send_header('Content-Length', str(len(data)))
+		for name, value in (headers or {}).items():
+			self.send_header(name, value)
+		self.end_headers()
+		self.wfile.write(data)
+
+	def log_message(self, format: str, *args: Any) -> None:
+		print(f"{self.address_string()} {format % args}", file=sys.stderr)
+
+
+def serve(host: str = SERVICE_HOST, port: int = SERVICE_PORT, workers: int = SERVICE_WORKERS, data_dir: str = SERVICE_DATA_DIR) -> None:
+	service = AnalysisService(data_dir, workers)
+	service.warm_up()
+	handler = type('Handler', (ServiceHandler,), {'service': service})
+	server = ThreadingHTTPServer((host, port), handler)
+	server.daemon_threads = True
+	print(f"Analysis service: http://{host}:{server.server_address[1]}", file=sys.stderr)
+	# Без обработчика SIGTERM завершает только этот процесс, а процессы пула остаются работать
+	signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.server_close()
+		service.shutdown()
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Headless analysis service: HTTP API over a pool of warm analysis processes.')
+	parser.add_argument('--host', default=SERVICE_HOST)
+	parser.add_argument('--port', type=int, default=SERVICE_PORT)
+	parser.add_argument('--workers', type=int, default=SERVICE_WORKERS, help='number of analysis processes')
+	parser.add_argument('--data-dir', default=SERVICE_DATA_DIR, help='directory for uploaded archives and reports')
+	args = parser.parse_args()
+	serve(args.host, args.port, args.workers, args.data_dir)
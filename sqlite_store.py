@@ -0,0 +1,112 @@
+import os
+import time
+import sqlite3
+import threading
+from typing import Optional, Dict, Any
+
+
+CACHE_DIR = os.getenv('ANALYZER_CACHE_DIR', '.cache')
+
+
+class SqliteStore:
+	"""
+	Простое персистентное key-value хранилище поверх SQLite.
+
+	Поддерживает вытеснение по возрасту записи (max_age, секунды), по количеству
+	записей (max_entries) и по суммарному размеру (max_bytes). При вытеснении по
+	количеству и размеру первыми удаляются давно не читавшиеся записи (LRU).
+	Хранилище можно использовать из нескольких потоков и процессов.
+	"""
+
+	# Как часто (в записях) запускать вытеснение при записи
+	EVICT_EVERY = 64
+
+	def __init__(self, path: str, table: str = 'kv', max_entries: Optional[int] = None, max_bytes: Optional[int] = None, max_age: Optional[float] = None):
+		if os.path.dirname(path):
+			os.makedirs(os.path.dirname(path), exist_ok=True)
+		self.path = path
+		self.table = table
+		self.max_entries = max_entries
+		self.max_bytes = max_bytes
+		self.max_age = max_age
+		self._lock = threading.Lock()
+		self._writes = 0
+		self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+		self._conn.execute('PRAGMA journal_mode=WAL')
+		self._conn.execute('PRAGMA synchronous=NORMAL')
+		self._conn.execute(f'''
+			CREATE TABLE IF NOT EXISTS {table} (
+				key TEXT PRIMARY KEY,
+				value BLOB NOT NULL,
+				size INTEGER NOT NULL,
+				created_at REAL NOT NULL,
+				accessed_at REAL NOT NULL
+			)
+		''')
+		self._conn.execute(f'CREATE INDEX IF NOT EXISTS {table}_accessed_at ON {table} (accessed_at)')
+		self.evict()
+
+	def get(self, key: str) -> Optional[bytes]:
+		now = time.time()
+		with self._lock:
+			row = self._conn.execute(f'SELECT value, created_at FROM {self.table} WHERE key = ?', (key,)).fetchone()
+			if row is None:
+				return None
+			value, created_at = row
+			if self.max_age is not None and now - created_at > self.max_age:
+				self._conn.execute(f'DELETE FROM {self.table} WHERE key = ?', (key,))
+				return None
+			self._conn.execute(f'UPDATE {self.table} SET accessed_at = ? WHERE key = ?', (now, key))
+		return bytes(value)
+
+	def set(self, key: str, value: bytes) -> None:
+		now = time.time()
+		with self._lock:
+			self._conn.execute(
+				f'INSERT OR REPLACE INTO {self.table} (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)',
+				(key, value, len(value), now, now),
+			)
+			self._writes += 1
+			need_evict = self._writes % self.EVICT_EVERY == 0
+		if need_evict:
+			self.evict()
+
+	def delete(self, key: str) -> None:
+		with self._lock:
+			self._conn.execute(f'DELETE FROM {self.table} WHERE key = ?', (key,))
+
+	def evict(self) -> int:
+		"""
+		Удаляет устаревшие записи и записи сверх лимитов. Возвращает количество удаленных записей.
+		"""
+		removed = 0
+		with self._lock:
+			if self.max_age is not None:
+				removed += self._conn.execute(f'DELETE FROM {self.table} WHERE created_at < ?', (time.time() - self.max_age,)).rowcount
+			if self.max_entries is not None:
+				removed += self._conn.execute(f'''
+					DELETE FROM {self.table} WHERE key IN (
+						SELECT key FROM {self.table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+					)
+				''', (self.max_entries,)).rowcount
+			if self.max_bytes is not None:
+				total = self._conn.execute(f'SELECT COALESCE(SUM(size), 0) FROM {self.table}').fetchone()[0]
+				if total > self.max_bytes:
+					victims = []
+					for key, size in self._conn.execute(f'SELECT key, size FROM {self.table} ORDER BY accessed_at ASC'):
+						if total <= self.max_bytes:
+							break
+						victims.append((key,))
+						total -= size
+					self._conn.executemany(f'DELETE FROM {self.table} WHERE key = ?', victims)
+					removed += len(victims)
+		return removed
+
+	def clear(self) -> None:
+		with self._lock:
+			self._conn.execute(f'DELETE FROM {self.table}')
+
+	def stats(self) -> Dict[str, Any]:
+		with self._lock:
+			entries, size = self._conn.execute(f'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}').fetchone()
+		return {'entries': entries, 'bytes': size}
@@ -0,0 +1,118 @@
+"""
+Проверка ImportGraph (CSR) и analyze_graph (итеративный Тарьян, битовые множества достижимости)
+сравнением с прямым перебором на случайных графах.
+
+	python -m pytest tests
+"""
+
+import os
+import sys
+import random
+import threading
+import unittest
+from typing import Dict, List, Set
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from import_graph import ImportGraph
+from graph_analytics import analyze_graph
+
+
+def random_graph(rng: random.Random) -> Dict[str, List[str]]:
+	"""
+	Случайный граф: модули m<i>, импорты других модулей (в том числе себя) и внешних библиотек ext<i>.
+	"""
+	n = rng.randint(1, 30)
+	density = rng.random() * 0.3
+	graph = {}
+	for i in range(n):
+		deps = [f'm{j}' for j in range(n) if rng.random() < density]
+		deps += [f'ext{j}' for j in range(rng.randint(0, 3))]
+		graph[f'm{i}'] = deps
+	return graph
+
+
+def reachable(graph: Dict[str, List[str]], start: str) -> Set[str]:
+	seen, stack = set(), [start]
+	while stack:
+		for target in graph.get(stack.pop(), []):
+			if target not in seen:
+				seen.add(target)
+				stack.append(target)
+	return seen
+
+
+class ImportGraphTest(unittest.TestCase):
+	def test_csr_round_trip(self):
+		rng = random.Random(1)
+		for _ in range(200):
+			graph = random_graph(rng)
+			imports = ImportGraph.from_dict(graph)
+			# Соседи упорядочены по номерам узлов, а не по именам
+			self.assertEqual({module: sorted(deps) for module, deps in imports.to_dict().items()}, {module: sorted(set(deps)) for module, deps in graph.items()})
+			self.assertEqual(imports.edge_count, sum(len(set(deps)) for deps in graph.values()))
+			for node in range(imports.node_count):
+				name = imports.node_name(node)
+				expected = sorted(source for source, deps in graph.items() if name in deps)
+				self.assertEqual(sorted(imports.predecessors(name)), expected)
+
+	def test_memo_computes_once_across_threads(self):
+		graph = ImportGraph.from_dict({'a': ['b']})
+		calls = []
+		barrier = threading.Barrier(8)
+
+		def compute():
+			calls.append(1)
+			return len(calls)
+
+		def worker():
+			barrier.wait()
+			graph.memo('key', compute)
+
+		threads = [threading.Thread(target=worker) for _ in range(8)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		self.assertEqual(len(calls), 1)
+		self.assertEqual(graph.memo('key', compute), 1)
+
+
+class AnalyzeGraphTest(unittest.TestCase):
+	def test_matches_brute_force(self):
+		rng = random.Random(2)
+		for _ in range(300):
+			graph = random_graph(rng)
+			report = analyze_graph(graph)
+			imports = report.graph
+			reach = {imports.node_name(node): reachable(graph, imports.node_name(node)) for node in range(imports.node_count)}
+
+			# Циклы - SCC из нескольких узлов или узел с петлей
+			expected_cycles = set()
+			for module in reach:
+				scc = frozenset(other for other in reach if other in reach[module] and module in reach[other]) | {module}
+				if len(scc) > 1 or module in graph.get(module, []):
+					expected_cycles.add(scc)
+			self.assertEqual({frozenset(cycle) for cycle in report.cycle_names()}, expected_cycles)
+
+			for node in range(imports.node_count):
+				name = imports.node_name(node)
+				self.assertEqual(report.reach_count[node], len(reach[name] - {name}))
+				self.assertEqual(report.fan_out[node], len(set(graph.get(name, []))))
+				self.assertEqual(report.fan_in[node], sum(name in set(deps) for deps in graph.values()))
+
+	def test_layer_violations(self):
+		graph = {'domain.user': ['adapters.db', 'domain.base'], 'adapters.db': ['domain.user'], 'domain.base': []}
+		layers = {'domain.user': 'domain', 'domain.base': 'domain', 'adapters.db': 'adapters'}
+		report = analyze_graph(graph, layers, {'domain': {'adapters'}})
+		violations = [(report.graph.node_name(a), report.graph.node_name(b), la, lb) for a, b, la, lb in report.layer_violations]
+		self.assertEqual(violations, [('domain.user', 'adapters.db', 'domain', 'adapters')])
+
+	def test_without_reachability(self):
+		report = analyze_graph({'a': ['b'], 'b': ['a']}, reachability=False)
+		self.assertEqual(report.cycle_names(), [['a', 'b']])
+		self.assertEqual(list(report.reach_count), [0, 0])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,164 @@
+"""
+Проверка правил пропуска (ignore_rules.py): перевод шаблонов .gitignore в регулярные выражения,
+порядок правил и отсечение каталогов при обходе проекта (ProjectIndex.build).
+
+	python -m pytest tests
+"""
+
+import os
+import re
+import sys
+import shutil
+import tempfile
+import unittest
+import subprocess
+from typing import Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ignore_rules import IgnoreRules, parse_patterns, _translate
+from project_index import ProjectIndex
+from vfs import GitFS
+
+
+def write_tree(root: str, files: Dict[str, str]) -> None:
+	for rel_path, text in files.items():
+		path = os.path.join(root, rel_path)
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		with open(path, 'w') as f:
+			f.write(text)
+
+
+class TranslateTest(unittest.TestCase):
+
+	def assertMatches(self, pattern: str, matching, other):
+		regex = re.compile(_translate(pattern))
+		for path in matching:
+			self.assertIsNotNone(regex.fullmatch(path), f'{pattern!r} should match {path!r}')
+		for path in other:
+			self.assertIsNone(regex.fullmatch(path), f'{pattern!r} should not match {path!r}')
+
+	def test_name_matches_at_any_depth(self):
+		self.assertMatches('*.pyc', ['a.pyc', 'pkg/sub/a.pyc'], ['a.py', 'a.pyc/b'])
+
+	def test_slash_anchors_to_base(self):
+		self.assertMatches('/build', ['build'], ['src/build'])
+		self.assertMatches('docs/api', ['docs/api'], ['x/docs/api'])
+
+	def test_single_star_does_not_cross_directories(self):
+		self.assertMatches('src/*.py', ['src/a.py'], ['src/pkg/a.py'])
+
+	def test_double_star(self):
+		self.assertMatches('**/gen', ['gen', 'a/b/gen'], ['a/gen/x'])
+		self.assertMatches('out/**', ['out/a', 'out/a/b'], ['out', 'x/out/a'])
+		self.assertMatches('a/**/b', ['a/b', 'a/x/b', 'a/x/y/b'], ['b', 'x/a/b'])
+
+	def test_question_mark_and_classes(self):
+		self.assertMatches('file?.txt', ['file1.txt'], ['file.txt', 'file12.txt', 'file/.txt'])
+		self.assertMatches('[ab].py', ['a.py', 'b.py'], ['c.py'])
+		self.assertMatches('[!ab].py', ['c.py'], ['a.py'])
+
+	def test_escapes_and_literals(self):
+		self.assertMatches('\\*.md', ['*.md'], ['a.md'])
+		self.assertMatches('a+b.py', ['a+b.py'], ['aab.py'])
+
+
+class IgnoreRulesTest(unittest.TestCase):
+
+	def test_parse_patterns(self):
+		rules = parse_patterns(['# comment', '', 'logs/', '!keep.log', '\\!bang', '\\#hash', '/'], '', 'test')
+		self.assertEqual([(rule.pattern, rule.negate, rule.dir_only) for rule in rules], [
+			('logs/', False, True), ('keep.log', True, False), ('!bang', False, False), ('#hash', False, False),
+		])
+
+	def test_directory_only_rules(self):
+		ignore = IgnoreRules(builtin=False, gitignore=False, patterns=['logs/'])
+		self.assertIsNotNone(ignore.match('logs', True))
+		self.assertIsNone(ignore.match('logs', False))
+
+	def test_last_match_wins(self):
+		ignore = IgnoreRules(builtin=True, gitignore=False, patterns=['!node_modules/'])
+		self.assertTrue(ignore.match('node_modules', True).negate)
+		gitignores = tuple(parse_patterns(['*.log', '!important.log'], '', '.gitignore'))
+		ignore = IgnoreRules(builtin=False, gitignore=True, patterns=[])
+		self.assertFalse(ignore.match('a.log', False, gitignores).negate)
+		self.assertTrue(ignore.match('important.log', False, gitignores).negate)
+
+	def test_nested_gitignore_is_relative_to_its_directory(self):
+		gitignores = tuple(parse_patterns(['/generated/'], 'pkg', 'pkg/.gitignore'))
+		ignore = IgnoreRules(builtin=False, gitignore=True, patterns=[])
+		self.assertIsNotNone(ignore.match('pkg/generated', True, gitignores))
+		self.assertIsNone(ignore.match('generated', True, gitignores))
+		self.assertIsNone(ignore.match('other/pkg/generated', True, gitignores))
+
+	def test_build_dist_vendor_only_at_root(self):
+		ignore = IgnoreRules(builtin=True, gitignore=False, patterns=[])
+		for name in ('build', 'dist', 'vendor'):
+			self.assertIsNotNone(ignore.match(name, True), name)
+			self.assertIsNone(ignore.match(f'src/{name}', True), name)
+		self.assertIsNotNone(ignore.match('pkg/node_modules', True))
+
+
+class PruningTest(unittest.TestCase):
+
+	def setUp(self):
+		self.root = tempfile.mkdtemp()
+		write_tree(self.root, {
+			'app/main.py': 'import app.build.steps\n',
+			'app/build/steps.py': '',
+			'build/lib/app/main.py': '',
+			'node_modules/pkg/index.js': '',
+			'env/pyvenv.cfg': '',
+			'env/lib/site.py': '',
+			'.gitignore': 'secret/\n*.log\n',
+			'secret/key.py': '',
+			'debug.log': '',
+			'pkg/.gitignore': '/out/\n',
+			'pkg/out/gen.py': '',
+			'pkg/mod.py': '',
+			'pkg/sub/out/kept.py': '',
+		})
+
+	def tearDown(self):
+		shutil.rmtree(self.root)
+
+	def test_skipped_directories_are_not_walked(self):
+		index = ProjectIndex.build(self.root, IgnoreRules(patterns=[]))
+		self.assertEqual(sorted(index.files), [
+			'.gitignore', 'app/build/steps.py', 'app/main.py', 'pkg/.gitignore', 'pkg/mod.py', 'pkg/sub/out/kept.py',
+		])
+		reasons = {entry.path: entry.reason for entry in index.skipped}
+		self.assertEqual(reasons, {
+			'build': 'generated',
+			'node_modules': 'vendor',
+			'env': 'virtualenv',
+			'secret': '.gitignore',
+			'debug.log': '.gitignore',
+			'pkg/out': 'pkg/.gitignore',
+		})
+		self.assertNotIn('node_modules', index.tree)
+		# Размер пропущенного каталога на диске известен, хотя при обходе проекта его содержимое не индексируется
+		node_modules = next(entry for entry in index.skipped if entry.path == 'node_modules')
+		self.assertEqual((node_modules.files, node_modules.python_files), (1, 0))
+		env = next(entry for entry in index.skipped if entry.path == 'env')
+		self.assertEqual((env.files, env.python_files), (2, 1))
+
+	def test_user_patterns_come_last(self):
+		index = ProjectIndex.build(self.root, IgnoreRules(patterns=['!build/', 'pkg/']))
+		self.assertIn('build/lib/app/main.py', index.files)
+		self.assertFalse(any(path.startswith('pkg/') for path in index.files))
+
+	def test_gitignore_is_not_applied_to_commits(self):
+		subprocess.run(['git', 'init', '-q', self.root], check=True)
+		subprocess.run(['git', '-C', self.root, 'add', '-f', '.'], check=True)
+		subprocess.run(['git', '-C', self.root, '-c', 'user.name=test', '-c', 'user.email=test@example.com', 'commit', '-q', '-m', 'init'], check=True)
+		with GitFS(self.root, 'HEAD', 'project') as fs:
+			index = ProjectIndex.build(fs)
+		# Отслеживаемые файлы, совпадающие с .gitignore, входят в коммит и анализируются
+		self.assertIn('secret/key.py', index.files)
+		self.assertIn('pkg/out/gen.py', index.files)
+		self.assertNotIn('node_modules/pkg/index.js', index.files)
+
+
+if __name__ == '__main__':
+	unittest.main()
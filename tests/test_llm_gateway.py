@@ -0,0 +1,190 @@
+"""
+Проверка LLMGateway на локальных фейковых OpenAI-совместимых серверах (benchmarks/fake_llm_server.py):
+распределение запросов, пауза эндпоинта после 429 и объединение одинаковых запросов.
+
+	python -m pytest tests
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from langchain_core.messages import HumanMessage
+
+from fake_llm_server import start_server
+from llm_gateway import LLMGateway, parse_endpoints
+from metrics import metrics
+
+
+def make_gateway(spec: str) -> LLMGateway:
+	return LLMGateway(parse_endpoints(spec), 'fake', 'fake-model', request_timeout=10)
+
+
+def ask(gateway: LLMGateway, text: str) -> str:
+	return gateway._generate([HumanMessage(content=text)]).generations[0].message.content
+
+
+def track_in_flight(gateway: LLMGateway) -> List[int]:
+	"""
+	Оборачивает клиентов эндпоинтов и возвращает список наибольшего числа одновременных запросов к каждому.
+	"""
+	peaks = [0] * len(gateway._endpoints)
+	current = [0] * len(gateway._endpoints)
+	lock = threading.Lock()
+	for i, endpoint in enumerate(gateway._endpoints):
+		generate = endpoint.client._generate
+
+		def tracked(*args, i=i, generate=generate, **kwargs):
+			with lock:
+				current[i] += 1
+				peaks[i] = max(peaks[i], current[i])
+			try:
+				return generate(*args, **kwargs)
+			finally:
+				with lock:
+					current[i] -= 1
+
+		# Клиент - модель pydantic, поэтому метод подменяется в обход валидации
+		object.__setattr__(endpoint.client, '_generate', tracked)
+	return peaks
+
+
+class GatewayTest(unittest.TestCase):
+
+	def setUp(self):
+		self.servers = []
+
+	def tearDown(self):
+		for server in self.servers:
+			server.shutdown()
+			server.server_close()
+
+	def server(self, **options) -> str:
+		server, url = start_server(**options)
+		self.servers.append(server)
+		return url
+
+	def test_balancing_respects_concurrency(self):
+		fast, slow = self.server(latency=0.05), self.server(latency=0.3)
+		gateway = make_gateway(f'{fast}|concurrency=2,{slow}|concurrency=2')
+		peaks = track_in_flight(gateway)
+		with ThreadPoolExecutor(max_workers=8) as executor:
+			answers = list(executor.map(lambda i: ask(gateway, f'request {i}'), range(16)))
+		self.assertEqual(len(answers), 16)
+		fast_stats, slow_stats = gateway.stats()['endpoints']
+		self.assertEqual(fast_stats['requests'] + slow_stats['requests'], 16)
+		# Быстрый эндпоинт освобождается чаще и получает больше запросов
+		self.assertGreater(fast_stats['requests'], slow_stats['requests'])
+		self.assertLessEqual(max(peaks), 2)
+		self.assertEqual(fast_stats['in_flight'] + slow_stats['in_flight'], 0)
+
+	def test_waiting_for_a_busy_endpoint(self):
+		url = self.server(latency=0.1)
+		gateway = make_gateway(f'{url}|concurrency=1')
+		peaks = track_in_flight(gateway)
+		started = time.perf_counter()
+		with ThreadPoolExecutor(max_workers=4) as executor:
+			list(executor.map(lambda i: ask(gateway, f'request {i}'), range(4)))
+		self.assertEqual(peaks, [1])
+		self.assertGreaterEqual(time.perf_counter() - started, 0.4)
+
+	def test_async_waiting_for_a_busy_endpoint(self):
+		url = self.server(latency=0.1)
+		gateway = make_gateway(f'{url}|concurrency=1')
+
+		async def run():
+			return await asyncio.gather(*[gateway._agenerate([HumanMessage(content=f'request {i}')]) for i in range(4)])
+
+		results = asyncio.run(run())
+		self.assertEqual(len(results), 4)
+		self.assertEqual(gateway.stats()['endpoints'][0]['requests'], 4)
+		self.assertEqual(gateway.stats()['endpoints'][0]['in_flight'], 0)
+
+	def test_rate_limited_endpoint_backs_off(self):
+		limited, healthy = self.server(rpm=1), self.server(latency=0.05)
+		gateway = make_gateway(f'{limited},{healthy}')
+		# Первый запрос к ограниченному эндпоинту проходит, второй получает 429 и уходит на другой
+		limited_endpoint, healthy_endpoint = gateway._endpoints
+		healthy_endpoint.latency = 100.0
+		enabled, metrics.enabled = metrics.enabled, True
+		retries = metrics._counters.get(('llm_retries', ()), 0)
+		try:
+			for i in range(3):
+				ask(gateway, f'request {i}')
+		finally:
+			metrics.enabled = enabled
+		# Повтор после 429 выполняет шлюз, а не SDK клиента, и считает его сам
+		self.assertEqual(metrics._counters.get(('llm_retries', ()), 0) - retries, 1)
+		self.assertEqual(limited_endpoint.rate_limited, 1)
+		self.assertEqual(limited_endpoint.requests, 2)
+		self.assertEqual(healthy_endpoint.requests, 2)
+		# Пауза не короче Retry-After сервера
+		self.assertGreater(limited_endpoint.available_at - time.monotonic(), 30)
+
+	def test_identical_requests_are_coalesced(self):
+		url = self.server(latency=0.3)
+		gateway = make_gateway(url)
+		barrier = threading.Barrier(4)
+
+		def call(_):
+			barrier.wait()
+			return gateway._generate([HumanMessage(content='same prompt')])
+
+		with ThreadPoolExecutor(max_workers=4) as executor:
+			results = list(executor.map(call, range(4)))
+		self.assertEqual(gateway.stats()['coalesced'], 3)
+		self.assertEqual(gateway.stats()['endpoints'][0]['requests'], 1)
+		messages = [result.generations[0].message for result in results]
+		self.assertEqual(len({id(message) for message in messages}), 4)
+		self.assertEqual(len({message.content for message in messages}), 1)
+		# Токены потрачены одним запросом и учитываются один раз
+		usages = [result.llm_output['token_usage']['total_tokens'] for result in results]
+		self.assertEqual(sorted(usages)[:3], [0, 0, 0])
+		self.assertGreater(max(usages), 0)
+
+	def test_cancelled_call_releases_the_endpoint(self):
+		url = self.server(latency=0.5)
+		gateway = make_gateway(f'{url}|concurrency=1')
+
+		async def run():
+			task = asyncio.ensure_future(gateway._agenerate([HumanMessage(content='cancelled')]))
+			await asyncio.sleep(0.1)
+			task.cancel()
+			with self.assertRaises(asyncio.CancelledError):
+				await task
+			return await asyncio.wait_for(gateway._agenerate([HumanMessage(content='next')]), 5)
+
+		asyncio.run(run())
+		endpoint = gateway._endpoints[0]
+		self.assertEqual(endpoint.in_flight, 0)
+		self.assertEqual(endpoint.errors, 0)
+
+	def test_followers_get_a_snapshot_of_the_leader_result(self):
+		url = self.server(latency=0.05)
+		gateway = make_gateway(url)
+		settled = []
+		settle = gateway._settle
+
+		def capture(key, future, result=None, error=None):
+			settled.append(result)
+			settle(key, future, result, error)
+
+		object.__setattr__(gateway, '_settle', capture)
+		result = gateway._generate([HumanMessage(content='same prompt')])
+		# LangChain дописывает метаданные в ответ лидера после возврата из _generate, ожидающие этого видеть не должны
+		self.assertIsNot(settled[0], result)
+		self.assertIsNot(settled[0].generations[0].message, result.generations[0].message)
+		self.assertEqual(settled[0].generations[0].message.content, result.generations[0].message.content)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -1,23 +1,73 @@
 #!/usr/bin/env python3
 
 import streamlit as st
+import streamlit.components.v1 as components
+import io
 import time
+from functools import partial
 import zipfile
 import os
-import shutil
-from pathlib import Path
-from analytics import apply_analytics
-from uuid import uuid4
+from analytics import apply_analytics_streaming, ANALYSIS_STAGES
+from jobs import JobManager
+from incremental import ANALYZER_INCREMENTAL
+from vfs import ZipFS
+from metrics import metrics
+from report_store import get_report_store, REPORT_BASE_URL
 import tempfile
-from zipfile import ZipFile 
-from xhtml2pdf import pisa
 
 
-def convert_html_to_pdf(html_string, pdf_path):
-    with open(pdf_path, "wb") as pdf_file:
-        pisa_status = pisa.CreatePDF(html_string, dest=pdf_file)
-        
-    return not pisa_status.err
+UI_MAX_JOBS = int(os.getenv('UI_MAX_JOBS', '4'))
+
+STAGE_TITLES = {
+	'overview': 'Project overview',
+	'imports': 'Import graphs',
+	'rules': 'Rules',
+	'data_layer': 'Data layer analysis',
+	'reviews': 'Architect and developer reviews',
+	'rendering': 'Rendering the report',
+}
+
+
+@st.cache_resource
+def _job_manager() -> JobManager:
+	# Один менеджер на процесс Streamlit: общий для всех сессий и перезапусков скрипта
+	return JobManager(max_workers=UI_MAX_JOBS)
+
+def _analyze_upload(name: str, data: bytes, incremental: bool, progress, update_content) -> str:
+	# Отчет пишется во временный файл и показывается на странице по мере готовности разделов,
+	# готовый отчет сохраняется в хранилище отчетов
+	with tempfile.TemporaryDirectory() as temp_dir:
+		report_path = os.path.join(temp_dir, 'report.html')
+		with ZipFS(io.BytesIO(data), name=name) as fs:
+			apply_analytics_streaming(fs, report_path, name, incremental, progress, update_content)
+		with open(report_path) as f:
+			stored = get_report_store().put(name, f.read())
+	return REPORT_BASE_URL + stored.url
+
+@st.fragment(run_every=1)
+def _job_status(job_id: str):
+	job = _job_manager().get(job_id)
+	if job is None:
+		st.warning("The analysis job is not found (the server may have been restarted). Please upload the archive again.")
+		return
+
+	if job.status == 'queued':
+		st.info(f"{job.name}: waiting for a free worker...")
+	elif job.status == 'running':
+		done = len(job.stages_done)
+		st.progress(done / len(ANALYSIS_STAGES), text=f"{job.name}: {STAGE_TITLES.get(job.stage, job.stage or 'Starting')} ({done}/{len(ANALYSIS_STAGES)}, {time.time() - job.started_at:.0f}s)")
+		if job.content:
+			st.caption(f"Report preview: first sections ready after {job.content_at - job.started_at:.0f}s, the rest of the report is in progress")
+			components.html(job.content, height=800, scrolling=True)
+	elif job.status == 'done':
+		st.progress(1.0)
+		# Provide a link to the report
+		st.success(f"Analysis of {job.name} completed in {job.finished_at - job.started_at:.0f}s!")
+		if job.content_at is not None:
+			st.caption(f"First report sections were ready after {job.content_at - job.started_at:.0f}s")
+		st.link_button("Download your report", job.result)
+	else:
+		st.error(f"Analysis of {job.name} failed: {job.error}")
 
 # Streamlit App
 def main():
@@ -27,42 +77,36 @@ def main():
 	# File uploader
 	uploaded_file = st.file_uploader("Drag and drop your ZIP file here", type=["zip"])
 
-	if uploaded_file:
-		# Save uploaded file
-		#zip_path = temp_dir / uploaded_file.name
-		with tempfile.TemporaryDirectory() as temp_dir:
-			zip_path = os.path.join(temp_dir, uploaded_file.name)
-			with open(zip_path, "wb") as f:
-				f.write(uploaded_file.read())
-		
-			# Check if the uploaded file is a valid ZIP
-			if zipfile.is_zipfile(zip_path):
-				st.success("File uploaded successfully! Starting analysis...")
-				
-				# Show progress bar
-				progress_bar = st.progress(0)
-				progress_bar.progress(10)
-
-				source_path = temp_dir + "/" + uploaded_file.name + '.dir'
-				os.makedirs(source_path, exist_ok=True)
-				with ZipFile(zip_path, 'r') as zObject:
-					zObject.extractall(path=source_path)
-
-				# Perform analysis
-				report = apply_analytics(source_path)
-				report_path = f"static/{uuid4()}.html"
-
-				#if not convert_html_to_pdf(report, report_path):
-				#	st.error("Failed to convert HTML to PDF. Please try again.")
-				with open(report_path, "w") as report_file:
-					report_file.write(report)
-				progress_bar.progress(100)
-
-				# Provide a link to the report
-				st.success("Analysis completed!")
-				st.link_button("Download your report", f"http://localhost:9000/{report_path.replace('static/', '')}")
-			else:
-				st.error("The uploaded file is not a valid ZIP archive. Please try again.")
+	incremental = st.checkbox("Incremental analysis (reuse results of the previous upload)", value=ANALYZER_INCREMENTAL)
+
+	# Задания сессии: ID файла -> ID задания, чтобы перезапуск скрипта не ставил анализ повторно
+	submitted = st.session_state.setdefault('submitted_jobs', {})
+
+	if uploaded_file and uploaded_file.file_id not in submitted:
+		# Check if the uploaded file is a valid ZIP
+		if zipfile.is_zipfile(uploaded_file):
+			job_id = _job_manager().submit(uploaded_file.name, partial(_analyze_upload, uploaded_file.name, uploaded_file.getvalue(), incremental))
+			submitted[uploaded_file.file_id] = job_id
+			# ID задания в URL - отчет доступен и после обновления страницы
+			st.query_params['job'] = job_id
+			st.success("File uploaded successfully! Starting analysis...")
+		else:
+			st.error("The uploaded file is not a valid ZIP archive. Please try again.")
+
+	job_id = st.query_params.get('job')
+	if job_id:
+		_job_status(job_id)
+
+	# Метрики собираются при ANALYZER_METRICS=1 и общие для всех анализов процесса
+	if metrics.enabled:
+		with st.expander("Performance metrics"):
+			snapshot = metrics.snapshot()
+			st.write(f"Peak RSS: {snapshot['peak_rss_bytes'] / 2 ** 20:.0f} MB (worker processes: {snapshot['workers_rss_bytes'] / 2 ** 20:.0f} MB now, {snapshot['workers_peak_rss_bytes'] / 2 ** 20:.0f} MB peak)")
+			st.table([
+				{'span': timing['name'], 'labels': ', '.join(f'{k}={v}' for k, v in timing['labels'].items()), 'count': timing['count'], 'total, s': timing['total_seconds'], 'max, s': timing['max_seconds']}
+				for timing in metrics.summary(top=15)
+			])
+			st.table([{'counter': c['name'], 'labels': ', '.join(f'{k}={v}' for k, v in c['labels'].items()), 'value': c['value']} for c in snapshot['counters']])
 
 if __name__ == "__main__":
 	main()
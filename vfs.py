@@ -0,0 +1,392 @@
+import os
+import zipfile
+import posixpath
+import threading
+import subprocess
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import List, Dict, Optional, Union, Tuple, IO, Any
+
+
+# Члены 7z-архива не больше этого размера читаются в память за один проход при первом чтении
+SEVENZIP_PRELOAD_MAX_BYTES = int(os.getenv('SEVENZIP_PRELOAD_MAX_BYTES', str(1024 * 1024)))
+
+
+@dataclass
+class FSEntry:
+	name: str
+	is_dir: bool
+	size: int = 0
+
+
+class ProjectFS(ABC):
+	"""
+	Виртуальная файловая система проекта: каталог на диске или архив.
+
+	Все пути относительные (от корня проекта) и разделены '/'. Файловые системы поверх
+	архивов держат архив открытым до close() (или выхода из блока with).
+	"""
+	name: str = ''
+
+	@abstractmethod
+	def scandir(self, rel_dir: str = '') -> List[FSEntry]:
+		...
+
+	@abstractmethod
+	def read_bytes(self, rel_path: str) -> bytes:
+		...
+
+	@abstractmethod
+	def exists(self, rel_path: str) -> bool:
+		...
+
+	def close(self) -> None:
+		pass
+
+	def __enter__(self) -> 'ProjectFS':
+		return self
+
+	def __exit__(self, *exc_info: Any) -> None:
+		self.close()
+
+	def read_text(self, rel_path: str) -> str:
+		return self.read_bytes(rel_path).decode('utf-8', errors='replace')
+
+	def content_id(self, rel_path: str) -> Optional[str]:
+		"""
+		Идентификатор содержимого файла, известный без его чтения (например, хэш объекта git), или None.
+		"""
+		return None
+
+	def subtree_stats(self, rel_dir: str) -> Optional[Tuple[int, int, int]]:
+		"""
+		Количество файлов, их размер и количество .py файлов в каталоге (рекурсивно) или None,
+		если это неизвестно.
+		"""
+		return None
+
+	def display_path(self, rel_path: str) -> str:
+		"""
+		Путь для отчетов и промптов: не зависит от того, куда распакован проект.
+		"""
+		return posixpath.join(self.name, rel_path)
+
+	def sub(self, rel_dir: str) -> 'ProjectFS':
+		rel_dir = _normalize(rel_dir)
+		return SubFS(self, rel_dir) if rel_dir else self
+
+
+def _normalize(rel_path: str) -> str:
+	rel_path = posixpath.normpath(rel_path.replace('\\', '/')).strip('/')
+	return '' if rel_path == '.' else rel_path
+
+
+class LocalFS(ProjectFS):
+	def __init__(self, root: str, name: Optional[str] = None):
+		self.root = root.rstrip('/') or '/'
+		self.name = name or os.path.basename(self.root)
+
+	def _abs(self, rel_path: str) -> str:
+		return os.path.join(self.root, rel_path) if rel_path else self.root
+
+	def scandir(self, rel_dir: str = '') -> List[FSEntry]:
+		entries = []
+		try:
+			with os.scandir(self._abs(rel_dir)) as it:
+				for entry in it:
+					try:
+						if entry.is_dir(follow_symlinks=False):
+							entries.append(FSEntry(entry.name, True))
+						elif entry.is_file():
+							entries.append(FSEntry(entry.name, False, entry.stat().st_size))
+					except OSError:
+						continue
+		except OSError:
+			return []
+		return sorted(entries, key=lambda e: e.name)
+
+	def read_bytes(self, rel_path: str) -> bytes:
+		with open(self._abs(rel_path), 'rb') as f:
+			return f.read()
+
+	def exists(self, rel_path: str) -> bool:
+		return os.path.isfile(self._abs(rel_path))
+
+	def subtree_stats(self, rel_dir: str) -> Optional[Tuple[int, int, int]]:
+		# Только os.scandir и размеры из stat, без чтения файлов и без перехода по ссылкам на каталоги
+		files = size = python_files = 0
+		stack = [self._abs(rel_dir)]
+		while stack:
+			try:
+				with os.scandir(stack.pop()) as it:
+					for entry in it:
+						try:
+							if entry.is_dir(follow_symlinks=False):
+								stack.append(entry.path)
+							elif entry.is_file():
+								files += 1
+								size += entry.stat().st_size
+								python_files += entry.name.endswith('.py')
+						except OSError:
+							continue
+			except OSError:
+				continue
+		return files, size, python_files
+
+
+class _ArchiveFS(ProjectFS):
+	"""
+	Общая часть файловых систем поверх архивов: дерево каталогов строится по списку членов архива.
+	"""
+
+	def __init__(self, name: str):
+		self.name = name
+		self._lock = threading.Lock()
+		self._files: Dict[str, Any] = {}
+		self._sizes: Dict[str, int] = {}
+		self._children: Dict[str, Dict[str, bool]] = {'': {}}
+		self._subtree_stats: Optional[Dict[str, Tuple[int, int, int]]] = None
+
+	def _add_member(self, member_name: str, is_dir: bool, size: int, member: Any) -> None:
+		rel_path = _normalize(member_name)
+		# Пропускаем небезопасные пути ('../', абсолютные)
+		if not rel_path or rel_path.startswith('..'):
+			return
+		parts = rel_path.split('/')
+		for i in range(len(parts) - 1):
+			parent = '/'.join(parts[:i])
+			self._children.setdefault(parent, {})[parts[i]] = True
+			self._children.setdefault('/'.join(parts[:i + 1]), {})
+		parent = '/'.join(parts[:-1])
+		if is_dir:
+			self._children.setdefault(parent, {})[parts[-1]] = True
+			self._children.setdefault(rel_path, {})
+		else:
+			self._children.setdefault(parent, {})[parts[-1]] = False
+			self._files[rel_path] = member
+			self._sizes[rel_path] = size
+
+	def scandir(self, rel_dir: str = '') -> List[FSEntry]:
+		rel_dir = _normalize(rel_dir)
+		entries = []
+		for name, is_dir in self._children.get(rel_dir, {}).items():
+			rel_path = posixpath.join(rel_dir, name) if rel_dir else name
+			entries.append(FSEntry(name, is_dir, 0 if is_dir else self._sizes[rel_path]))
+		return sorted(entries, key=lambda e: e.name)
+
+	def exists(self, rel_path: str) -> bool:
+		return _normalize(rel_path) in self._files
+
+	def subtree_stats(self, rel_dir: str) -> Optional[Tuple[int, int, int]]:
+		# Итоги по всем каталогам считаются один раз, за один проход по списку файлов
+		with self._lock:
+			if self._subtree_stats is None:
+				totals: Dict[str, List[int]] = {}
+				for rel_path, size in self._sizes.items():
+					parts = rel_path.split('/')
+					for i in range(len(parts)):
+						counts = totals.setdefault('/'.join(parts[:i]), [0, 0, 0])
+						counts[0] += 1
+						counts[1] += size
+						counts[2] += rel_path.endswith('.py')
+				self._subtree_stats = {rel_dir: tuple(counts) for rel_dir, counts in totals.items()}
+		return self._subtree_stats.get(_normalize(rel_dir), (0, 0, 0))
+
+
+class ZipFS(_ArchiveFS):
+	"""
+	Чтение проекта прямо из ZIP-архива, без распаковки на диск.
+
+	В памяти хранится только список членов архива; содержимое файлов читается по одному.
+	"""
+
+	def __init__(self, source: Union[str, IO[bytes]], name: Optional[str] = None):
+		super().__init__(name or os.path.basename(getattr(source, 'name', None) or str(source)))
+		self._zip = zipfile.ZipFile(source, 'r')
+		for info in self._zip.infolist():
+			self._add_member(info.filename, info.is_dir(), info.file_size, info)
+
+	def read_bytes(self, rel_path: str) -> bytes:
+		rel_path = _normalize(rel_path)
+		if rel_path not in self._files:
+			raise FileNotFoundError(rel_path)
+		# ZipFile разделяет один файловый объект между потоками
+		with self._lock:
+			return self._zip.read(self._files[rel_path])
+
+	def close(self) -> None:
+		with self._lock:
+			self._zip.close()
+
+
+class SevenZipFS(_ArchiveFS):
+	"""
+	Чтение проекта из 7z-архива (требуется py7zr), без распаковки на диск.
+
+	В solid-архивах чтение отдельного файла распаковывает весь предшествующий ему блок,
+	поэтому при первом чтении все члены архива не больше SEVENZIP_PRELOAD_MAX_BYTES
+	(исходный код, конфигурация) читаются в память за один проход. Члены больше
+	этого размера читаются по одному при обращении и не сохраняются.
+	"""
+
+	def __init__(self, path: str, name: Optional[str] = None):
+		import py7zr
+		super().__init__(name or os.path.basename(path))
+		self._archive = py7zr.SevenZipFile(path, 'r')
+		self._contents: Optional[Dict[str, bytes]] = None
+		for info in self._archive.list():
+			self._add_member(info.filename, info.is_directory, info.uncompressed or 0, info.filename)
+
+	def _read_members(self, targets: List[str]) -> Dict[str, bytes]:
+		# read() читает архив с начала, после предыдущего чтения его нужно перемотать
+		self._archive.reset()
+		return {member: data.read() for member, data in (self._archive.read(targets=targets) or {}).items()}
+
+	def read_bytes(self, rel_path: str) -> bytes:
+		rel_path = _normalize(rel_path)
+		if rel_path not in self._files:
+			raise FileNotFoundError(rel_path)
+		member = self._files[rel_path]
+		with self._lock:
+			if self._contents is None:
+				# Читаем только члены архива с безопасными путями (см. _add_member)
+				self._contents = self._read_members([
+					member for path, member in self._files.items() if self._sizes[path] <= SEVENZIP_PRELOAD_MAX_BYTES
+				])
+			if member in self._contents:
+				return self._contents[member]
+			return self._read_members([member])[member]
+
+	def close(self) -> None:
+		with self._lock:
+			self._archive.close()
+			self._contents = None
+
+
+class GitObjects:
+	"""
+	Чтение объектов локального git-репозитория через один долгоживущий процесс `git cat-file --batch`.
+	"""
+
+	def __init__(self, repo: str):
+		self.repo = repo
+		self._lock = threading.Lock()
+		self._process: Optional[subprocess.Popen] = None
+
+	def git(self, *args: str) -> bytes:
+		return subprocess.run(['git', '-C', self.repo, *args], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE).stdout
+
+	def read(self, sha: str) -> bytes:
+		with self._lock:
+			if self._process is None:
+				self._process = subprocess.Popen(['git', '-C', self.repo, 'cat-file', '--batch'], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+			self._process.stdin.write(sha.encode('ascii') + b'\n')
+			self._process.stdin.flush()
+			header = self._process.stdout.readline().split()
+			if len(header) != 3:
+				raise FileNotFoundError(sha)
+			data = self._process.stdout.read(int(header[2]))
+			# После содержимого объекта идет перевод строки
+			self._process.stdout.read(1)
+			return data
+
+	def close(self) -> None:
+		with self._lock:
+			if self._process is not None:
+				self._process.stdin.close()
+				self._process.wait()
+				self._process = None
+
+
+class GitFS(_ArchiveFS):
+	"""
+	Дерево файлов коммита локального git-репозитория, без checkout.
+
+	Список файлов берется из `git ls-tree`, содержимое читается из объектов репозитория по одному файлу.
+	Идентификатор содержимого файла - хэш его blob-объекта, поэтому результаты, закэшированные
+	по содержимому, переиспользуются между коммитами без чтения неизмененных файлов.
+	Подмодули и символьные ссылки пропускаются.
+	"""
+
+	def __init__(self, repo: str, commit: str, name: Optional[str] = None, objects: Optional[GitObjects] = None):
+		# Имя не зависит от коммита: оно попадает в промпты и ключи кэшей
+		super().__init__(name or os.path.basename(os.path.abspath(repo)))
+		self.commit = commit
+		# Общий процесс git cat-file закрывает его владелец, а не каждый коммит
+		self._owns_objects = objects is None
+		self._objects = objects or GitObjects(repo)
+		listing = self._objects.git('ls-tree', '-r', '-l', '-z', commit)
+		for item in listing.split(b'\0'):
+			if not item:
+				continue
+			info, _, path = item.partition(b'\t')
+			mode, kind, sha, size = info.split()
+			if kind != b'blob' or mode == b'120000':
+				continue
+			self._add_member(path.decode('utf-8', errors='replace'), False, int(size), sha.decode('ascii'))
+
+	def read_bytes(self, rel_path: str) -> bytes:
+		rel_path = _normalize(rel_path)
+		if rel_path not in self._files:
+			raise FileNotFoundError(rel_path)
+		return self._objects.read(self._files[rel_path])
+
+	def content_id(self, rel_path: str) -> Optional[str]:
+		sha = self._files.get(_normalize(rel_path))
+		return f'git-blob:{sha}' if sha else None
+
+	def close(self) -> None:
+		if self._owns_objects:
+			self._objects.close()
+
+
+class SubFS(ProjectFS):
+	"""
+	Подкаталог другой файловой системы (например, компонент проекта).
+	"""
+
+	def __init__(self, parent: ProjectFS, prefix: str):
+		self.parent = parent
+		self.prefix = prefix
+		self.name = posixpath.join(parent.name, prefix)
+
+	def _full(self, rel_path: str) -> str:
+		return posixpath.join(self.prefix, _normalize(rel_path)) if _normalize(rel_path) else self.prefix
+
+	def scandir(self, rel_dir: str = '') -> List[FSEntry]:
+		return self.parent.scandir(self._full(rel_dir))
+
+	def read_bytes(self, rel_path: str) -> bytes:
+		return self.parent.read_bytes(self._full(rel_path))
+
+	def exists(self, rel_path: str) -> bool:
+		return self.parent.exists(self._full(rel_path))
+
+	def content_id(self, rel_path: str) -> Optional[str]:
+		return self.parent.content_id(self._full(rel_path))
+
+	def subtree_stats(self, rel_dir: str) -> Optional[Tuple[int, int, int]]:
+		return self.parent.subtree_stats(self._full(rel_dir))
+
+
+def is_7z_supported() -> bool:
+	try:
+		import py7zr
+	except ImportError:
+		return False
+	return True
+
+
+def open_fs(source: Union[str, IO[bytes], ProjectFS], name: Optional[str] = None) -> ProjectFS:
+	"""
+	Открывает проект: каталог, ZIP (путь или файловый объект) или 7z-архив.
+	"""
+	if isinstance(source, ProjectFS):
+		return source
+	if isinstance(source, str) and os.path.isdir(source):
+		return LocalFS(source, name)
+	if isinstance(source, str) and source.endswith('.7z'):
+		return SevenZipFS(source, name)
+	if zipfile.is_zipfile(source):
+		return ZipFS(source, name)
+	raise ValueError(f"Unsupported project source: {getattr(source, 'name', source)}")